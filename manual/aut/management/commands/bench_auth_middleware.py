@@ -0,0 +1,86 @@
+import time
+
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.sessions.backends.signed_cookies import SessionStore
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+
+from aut.models import ModelBackend, User, session_auth_hash
+
+
+class SessionUserBackend(ModelBackend):
+    # get_user() возвращает aut.User: HMAC сессии запоминается в его
+    # AbstractBaseUser, а не в django.contrib.auth.models.User.
+    def get_user(self, user_id):
+        try:
+            user = User._default_manager.get(pk=user_id)
+        except User.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+
+# Накладные расходы AuthenticationMiddleware на запрос: get_user() по сессии,
+# загрузка пользователя и проверка HMAC сессии. Сессия хранится в памяти
+# (signed_cookies), чтобы не измерять SESSION_ENGINE. Пользователь создается
+# в транзакции, которая в конце откатывается.
+class Command(BaseCommand):
+    help = 'Измеряет время AuthenticationMiddleware на один запрос.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=10000)
+        parser.add_argument('--fallbacks', type=int, default=3)
+
+    def handle(self, *args, requests, fallbacks, **options):
+        with transaction.atomic():
+            self.bench(requests, fallbacks)
+            transaction.set_rollback(True)
+
+    def bench(self, requests, fallbacks):
+        user = User.objects.create_user('bench-auth-middleware', password='bench')
+        backend = '%s.%s' % (SessionUserBackend.__module__, SessionUserBackend.__qualname__)
+        fallback_keys = ['fallback-%s' % i for i in range(fallbacks)]
+
+        # Сессия подписана последним резервным ключом: худший случай для get_user().
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = backend
+        session_hash = user._get_session_auth_hash(
+            secret=fallback_keys[-1] if fallback_keys else None
+        )
+        session[HASH_SESSION_KEY] = session_hash
+
+        middleware = AuthenticationMiddleware(lambda request: HttpResponse())
+        factory = RequestFactory()
+
+        def run(memo):
+            started = time.perf_counter()
+            for _ in range(requests):
+                if not memo:
+                    session_auth_hash.cache_clear()
+                request = factory.get('/')
+                request.session = session
+                middleware(request)
+                if request.user.pk != user.pk:
+                    raise RuntimeError('Сессия не прошла проверку HMAC.')
+                # get_user() переписывает хеш при проверке резервным ключом.
+                session[HASH_SESSION_KEY] = session_hash
+            return (time.perf_counter() - started) / requests * 1e6
+
+        # Только проверка HMAC сессии, без остальной работы get_user().
+        def run_hash(memo):
+            started = time.perf_counter()
+            for _ in range(requests):
+                if not memo:
+                    session_auth_hash.cache_clear()
+                user.get_session_auth_hash()
+                list(user.get_session_auth_fallback_hash())
+            return (time.perf_counter() - started) / requests * 1e6
+
+        with override_settings(AUTHENTICATION_BACKENDS=[backend], SECRET_KEY_FALLBACKS=fallback_keys):
+            for memo in (False, True):
+                self.stdout.write('%s: %.1f мкс/запрос, из них HMAC %.1f мкс' % (
+                    'с кэшем HMAC' if memo else 'без кэша HMAC', run(memo), run_hash(memo)
+                ))
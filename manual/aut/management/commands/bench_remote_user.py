@@ -0,0 +1,58 @@
+import time
+
+from django.contrib.auth.middleware import AuthenticationMiddleware, RemoteUserMiddleware
+from django.contrib.sessions.backends.signed_cookies import SessionStore
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+
+from aut.models import RemoteUserBackend
+
+
+# Запросы за SSO прокси: REMOTE_USER в каждом запросе, сессия каждый раз новая
+# (клиенты без cookie), поэтому RemoteUserBackend.authenticate() вызывается
+# на каждый запрос. Сравнивается кэш пользователей включенным и выключенным.
+# Пользователи создаются в транзакции, которая в конце откатывается.
+class Command(BaseCommand):
+    help = 'Измеряет req/s RemoteUserMiddleware с заголовком REMOTE_USER.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument('--users', type=int, default=100)
+
+    def handle(self, *args, requests, users, **options):
+        with transaction.atomic():
+            self.bench(requests, users)
+            transaction.set_rollback(True)
+
+    def bench(self, requests, users):
+        backend = '%s.%s' % (RemoteUserBackend.__module__, RemoteUserBackend.__qualname__)
+        factory = RequestFactory()
+
+        def handler(request):
+            return HttpResponse(request.user.get_username())
+
+        chain = AuthenticationMiddleware(RemoteUserMiddleware(handler))
+
+        def run(timeout):
+            RemoteUserBackend.user_cache_timeout = timeout
+            RemoteUserBackend.invalidate_cached_user()
+            started = time.perf_counter()
+            for i in range(requests):
+                request = factory.get('/', REMOTE_USER='sso-user-%s' % (i % users))
+                request.session = SessionStore()
+                chain(request)
+            return requests / (time.perf_counter() - started)
+
+        timeout = RemoteUserBackend.user_cache_timeout
+        try:
+            with override_settings(AUTHENTICATION_BACKENDS=[backend]):
+                # Первый проход создает пользователей.
+                run(0)
+                self.stdout.write('без кэша: %.0f req/s' % run(0))
+                self.stdout.write('с кэшем: %.0f req/s' % run(timeout or 30))
+        finally:
+            RemoteUserBackend.user_cache_timeout = timeout
+            # Закэшированные пользователи исчезнут при откате транзакции.
+            RemoteUserBackend.invalidate_cached_user()
@@ -0,0 +1,25 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from aut.models import UserEffectivePermission, refresh_effective_permissions
+
+
+class Command(BaseCommand):
+    # Строки пересчитываются пачками пользователей, таблица не очищается
+    # целиком, поэтому ответы with_perm() остаются доступными во время пересборки.
+    help = 'Полностью перестраивает таблицу UserEffectivePermission.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, batch_size, **options):
+        started = time.perf_counter()
+        user_ids = get_user_model()._default_manager.order_by('pk').values_list('pk', flat=True)
+        refresh_effective_permissions(user_ids.iterator(), batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            'Строк: %d, %.1f с.' % (
+                UserEffectivePermission.objects.count(), time.perf_counter() - started
+            )
+        ))
@@ -1,11 +1,22 @@
+import asyncio
+import copy
+import functools
+import logging
+import os
+import queue
+import threading
+import time
 import unicodedata
 import warnings
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
 
 from django.contrib import auth
 from django.apps import apps
 from django.utils.deprecation import RemovedInDjango51Warning
-from django.db import models
-from django.contrib.auth.hashers import make_password, check_password, is_password_usable
+from django.db import connections, models, transaction
+from django.contrib.auth.hashers import make_password, check_password, is_password_usable, get_hasher
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
@@ -25,6 +36,18 @@ from django.contrib.auth import get_user_model
 from django.db.models import OuterRef, Exists, Q
 from django.utils.inspect import func_supports_parameter
 from django.utils.deprecation import RemovedInDjango50Warning
+from django.core.cache import caches
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_shared_cache():
+    # Кэш, общий для всех процессов (CACHES['shared']): сигнал в одном
+    # процессе должен сбрасывать данные и в остальных.
+    return caches["shared"]
 
 
 """
@@ -68,6 +91,99 @@ class CustomPBKDF2PasswordHasher(PBKDF2PasswordHasher):
     iterations = PBKDF2PasswordHasher.iterations + 1000
 
 
+# Отложенное обновление хеша.
+# После повышения iterations check_password() пересчитывает хеш и сохраняет его
+# прямо в запросе входа (setter в AbstractBaseUser.check_password).
+# Если первый хешер в PASSWORD_HASHERS имеет defer_rehash = True, новый хеш
+# вычисляется в запросе (в acheck_password() - в пуле потоков), а UPDATE ставится
+# в ограниченную очередь и выполняется фоновым потоком. Пароль в открытом виде
+# в очередь не попадает.
+class BackgroundRehashPBKDF2PasswordHasher(CustomPBKDF2PasswordHasher):
+    defer_rehash = True
+
+
+def rehash_cache_key(user_pk):
+    return "password-rehash:%s" % user_pk
+
+
+class RehashQueue:
+    """
+    Очередь сохранения пересчитанных хешей с одним фоновым потоком. Если очередь
+    заполнена, задача отбрасывается: хеш будет обновлен при следующем входе.
+    """
+
+    # Сколько секунд сессии со старым хешем переводятся на новый (см.
+    # get_session_auth_fallback_hash()). Более старые сессии завершатся.
+    session_grace = 60 * 60 * 24
+
+    def __init__(self, maxsize=1000):
+        self.queue = queue.Queue(maxsize)
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def submit(self, user, new_encoded):
+        self.start()
+        try:
+            self.queue.put_nowait((type(user), user.pk, user.password, new_encoded))
+        except queue.Full:
+            return False
+        return True
+
+    def start(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(
+                    target=self.run, name="password-rehash", daemon=True
+                )
+                self.thread.start()
+
+    def run(self):
+        while True:
+            job = self.queue.get()
+            try:
+                self.rehash(*job)
+            except Exception:
+                logger.exception("Password rehash failed for user %s", job[1])
+            finally:
+                self.queue.task_done()
+                if self.queue.empty():
+                    connections.close_all()
+
+    def rehash(self, model, user_pk, encoded, new_encoded):
+        # Обновляется только если пароль не был изменен за время ожидания.
+        updated = model._default_manager.filter(pk=user_pk, password=encoded).update(
+            password=new_encoded
+        )
+        if updated:
+            # Сессии, созданные со старым хешем, не должны завершиться:
+            # get_session_auth_fallback_hash() принимает старый хеш, пока хеш
+            # пользователя равен new_encoded, и get_user() переводит сессию на новый.
+            # Запись в общем кэше, т.к. сессию проверяет любой процесс.
+            get_shared_cache().set(
+                rehash_cache_key(user_pk), {"old": encoded, "new": new_encoded},
+                self.session_grace,
+            )
+
+    def join(self):
+        self.queue.join()
+
+
+rehash_queue = RehashQueue()
+
+
+@functools.lru_cache(maxsize=None)
+def get_password_executor():
+    """
+    Пул потоков для проверки паролей из асинхронного кода. hashlib освобождает
+    GIL во время PBKDF2, поэтому потоки выполняются параллельно, а размер пула
+    (PASSWORD_HASHING_WORKERS) ограничивает нагрузку на CPU при массовом входе.
+    """
+    return ThreadPoolExecutor(
+        max_workers=getattr(settings, "PASSWORD_HASHING_WORKERS", os.cpu_count()),
+        thread_name_prefix="password-hash",
+    )
+
+
 """
 - По умолчанию Django использует PBKDF2 с хешем SHA256. для системы хранения паролей.
 - password = '<algotithm>$<iteraitions>$<salt>$<hash>' (алгоритм хеширования, 
@@ -183,12 +299,46 @@ class BaseBackend:
         }
 
     def has_perm(self, user_obj, perm, obj=None):
-        return perm in self.gettrtun_all_permissions(user_obj, obj=obj)
+        return perm in self.get_all_permissions(user_obj, obj=obj)
 
 
 UserModel = get_user_model()
 
 
+# Кэш разрешений между запросами.
+# Разрешения пользователя хранятся в общем кэше (get_shared_cache()) по его id
+# вместе с версией.
+# Изменение user_permissions или groups пользователя удаляет его запись,
+# изменения, затрагивающие многих пользователей (Group.permissions, удаление
+# Permission или Group, clear() с обратной стороны), увеличивают общую версию.
+PERMISSION_VERSION_KEY = "auth-perms-version"
+
+
+def permission_cache_key(user_id):
+    return "auth-perms:%s" % user_id
+
+
+def invalidate_permissions(user_ids=None):
+    """
+    Сбрасывает кэш разрешений пользователей user_ids или всех пользователей.
+    """
+    cache = get_shared_cache()
+    if user_ids is not None:
+        cache.delete_many([permission_cache_key(pk) for pk in user_ids])
+        return
+    try:
+        cache.incr(PERMISSION_VERSION_KEY)
+    except ValueError:
+        get_permission_version(cache)
+
+
+def get_permission_version(cache):
+    # Начальная версия - время в мс, чтобы после вытеснения ключа версия
+    # не совпала с версией старых записей.
+    cache.add(PERMISSION_VERSION_KEY, time.time_ns() // 1000000, None)
+    return cache.get(PERMISSION_VERSION_KEY)
+
+
 class ModelBackend(BaseBackend):
     """
     Механизм аутентификации по умолчанию. Аутентифицируется 
@@ -196,6 +346,9 @@ class ModelBackend(BaseBackend):
     Также обрабатывает модель разрешений по умолчанию для User и PermissionsMixin.
     """
 
+    # Время жизни разрешений пользователя в общем кэше.
+    permission_cache_timeout = 300
+
     def authenticate(self, request, username=None, password=None, **kwargs):
         """
         Пытается пройти аутентификацию username с password с помощью check_password().
@@ -228,6 +381,52 @@ class ModelBackend(BaseBackend):
         user_groups_query = "group__%s" % user_groups_field.related_query_name()
         return Permission.objects.filter(**{user_groups_query: user_obj})
 
+    def _get_cached_permissions(self, user_obj):
+        """
+        Возвращает разрешения user_obj из общего кэша: {"user": set, "group": set}.
+        Версия разрешений и запись пользователя читаются одним get_many().
+        Запись устарела, если версия или is_superuser отличаются от текущих.
+        """
+        cache = get_shared_cache()
+        key = permission_cache_key(user_obj.pk)
+        values = cache.get_many([PERMISSION_VERSION_KEY, key])
+        version = values.get(PERMISSION_VERSION_KEY)
+        if version is None:
+            version = get_permission_version(cache)
+        cached = values.get(key)
+        if (
+            cached is not None
+            and cached["version"] == version
+            and cached["superuser"] == user_obj.is_superuser
+        ):
+            return cached
+
+        cached = {"version": version, "superuser": user_obj.is_superuser}
+        if not user_obj.is_superuser and effective_permissions_enabled():
+            # Один запрос к UserEffectivePermission по индексу (user, permission).
+            perms = UserEffectivePermission.objects.filter(user=user_obj).values_list(
+                "permission__content_type__app_label", "permission__codename",
+                "from_user", "from_group",
+            )
+            cached["user"], cached["group"] = set(), set()
+            for ct, name, from_user, from_group in perms:
+                if from_user:
+                    cached["user"].add("%s.%s" % (ct, name))
+                if from_group:
+                    cached["group"].add("%s.%s" % (ct, name))
+            cache.set(key, cached, self.permission_cache_timeout)
+            return cached
+
+        for from_name in ("user", "group"):
+            if user_obj.is_superuser:
+                perms = Permission.objects.all()
+            else:
+                perms = getattr(self, "_get_%s_permissions" % from_name)(user_obj)
+            perms = perms.values_list("content_type__app_label", "codename").order_by()
+            cached[from_name] = {"%s.%s" % (ct, name) for ct, name in perms}
+        cache.set(key, cached, self.permission_cache_timeout)
+        return cached
+
     def _get_permissions(self, user_obj, obj, from_name):
         """
         Return the permissions of `user_obj` from `from_name`. `from_name` can
@@ -237,16 +436,13 @@ class ModelBackend(BaseBackend):
         if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
             return set()
 
+        # Первый уровень - атрибут экземпляра (в пределах запроса),
+        # второй - общий кэш (между запросами и процессами).
         perm_cache_name = "_%s_perm_cache" % from_name
         if not hasattr(user_obj, perm_cache_name):
-            if user_obj.is_superuser:
-                perms = Permission.objects.all()
-            else:
-                perms = getattr(self, "_get_%s_permissions" % from_name)(user_obj)
-            perms = perms.values_list("content_type__app_label", "codename").order_by()
-            setattr(
-                user_obj, perm_cache_name, {"%s.%s" % (ct, name) for ct, name in perms}
-            )
+            if not hasattr(user_obj, "_shared_perm_cache"):
+                user_obj._shared_perm_cache = self._get_cached_permissions(user_obj)
+            setattr(user_obj, perm_cache_name, user_obj._shared_perm_cache[from_name])
         return getattr(user_obj, perm_cache_name)
 
     def get_user_permissions(self, user_obj, obj=None):
@@ -306,13 +502,24 @@ class ModelBackend(BaseBackend):
         if obj is not None:
             return UserModel._default_manager.none()
 
-        permission_q = Q(group__user=OuterRef("pk")) | Q(user=OuterRef("pk"))
-        if isinstance(perm, Permission):
-            permission_q &= Q(pk=perm.pk)
+        if effective_permissions_enabled():
+            # Выборка по индексу (permission, user) вместо Exists() по группам.
+            if isinstance(perm, Permission):
+                effective = UserEffectivePermission.objects.filter(permission=perm)
+            else:
+                effective = UserEffectivePermission.objects.filter(
+                    permission__codename=codename,
+                    permission__content_type__app_label=app_label,
+                )
+            user_q = Q(pk__in=effective.values("user"))
         else:
-            permission_q &= Q(codename=codename, content_type__app_label=app_label)
+            permission_q = Q(group__user=OuterRef("pk")) | Q(user=OuterRef("pk"))
+            if isinstance(perm, Permission):
+                permission_q &= Q(pk=perm.pk)
+            else:
+                permission_q &= Q(codename=codename, content_type__app_label=app_label)
 
-        user_q = Exists(Permission.objects.filter(permission_q))
+            user_q = Exists(Permission.objects.filter(permission_q))
         if include_superusers:
             user_q |= Q(is_superuser=True)
         if is_active is not None:
@@ -331,6 +538,32 @@ class ModelBackend(BaseBackend):
         return user if self.user_can_authenticate(user) else None
 
 
+@receiver(m2m_changed, sender=UserModel.user_permissions.through)
+@receiver(m2m_changed, sender=UserModel.groups.through)
+def user_permissions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        invalidate_permissions([instance.pk])
+    elif action == "post_clear":
+        # Для clear() pk_set не передается, затронутые пользователи неизвестны.
+        invalidate_permissions()
+    else:
+        invalidate_permissions(pk_set)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def group_permissions_changed(sender, action, **kwargs):
+    if action.startswith("post_"):
+        invalidate_permissions()
+
+
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def permissions_deleted(sender, **kwargs):
+    invalidate_permissions()
+
+
 class AllowAllUsersModelBackend(ModelBackend):
     """
     Не отклоняет неактивных пользователей.
@@ -351,6 +584,48 @@ class RemoteUserBackend(ModelBackend):
     """
     create_unknown_user = True
 
+    # Кэш имя пользователя -> пользователь в памяти процесса.
+    # За SSO прокси REMOTE_USER приходит с каждым запросом, и без кэша каждый
+    # запрос выполняет get_or_create(). Записи живут user_cache_timeout секунд
+    # (0 отключает кэш) и удаляются сигналами post_save/post_delete пользователя.
+    # Хранится весь обьект, т.к. по одному id пришлось бы снова загружать его из БД.
+    user_cache_timeout = 30
+    user_cache_size = 10000
+    _user_cache = OrderedDict()
+    _user_cache_lock = threading.Lock()
+
+    @classmethod
+    def get_cached_user(cls, username):
+        with cls._user_cache_lock:
+            item = cls._user_cache.get(username)
+            if item is None or item[0] < time.monotonic():
+                cls._user_cache.pop(username, None)
+                return None
+            cls._user_cache.move_to_end(username)
+        # Копия, чтобы изменения в одном запросе (last_login) не попадали в другие.
+        return copy.copy(item[1])
+
+    @classmethod
+    def set_cached_user(cls, username, user):
+        if not cls.user_cache_timeout:
+            return
+        with cls._user_cache_lock:
+            cls._user_cache[username] = (time.monotonic() + cls.user_cache_timeout, copy.copy(user))
+            cls._user_cache.move_to_end(username)
+            while len(cls._user_cache) > cls.user_cache_size:
+                cls._user_cache.popitem(last=False)
+
+    @classmethod
+    def invalidate_cached_user(cls, user=None):
+        with cls._user_cache_lock:
+            if user is None:
+                cls._user_cache.clear()
+                return
+            # Поиск по pk, т.к. имя пользователя могло измениться.
+            for username, item in list(cls._user_cache.items()):
+                if item[1].pk == user.pk:
+                    del cls._user_cache[username]
+
     def authenticate(self, request, remote_user):
         """
         Имя пользователя remote_user - доверенное. 
@@ -364,6 +639,10 @@ class RemoteUserBackend(ModelBackend):
         user = None
         username = self.clean_username(remote_user)
 
+        user = self.get_cached_user(username)
+        if user is not None:
+            return user if self.user_can_authenticate(user) else None
+
         # Note that this could be accomplished in one try-except clause, but
         # instead we use get_or_create when creating unknown users since it has
         # built-in safeguards for multiple threads.
@@ -377,18 +656,21 @@ class RemoteUserBackend(ModelBackend):
             except UserModel.DoesNotExist:
                 pass
 
-        # RemovedInDjango50Warning: When the deprecation ends, replace with:
-        #   user = self.configure_user(request, user, created=created)
-        if func_supports_parameter(self.configure_user, "created"):
-            user = self.configure_user(request, user, created=created)
-        else:
-            warnings.warn(
-                f"`created=True` must be added to the signature of "
-                f"{self.__class__.__qualname__}.configure_user().",
-                category=RemovedInDjango50Warning,
-            )
-            if created:
+        # configure_user() вызывается только для созданного пользователя.
+        if created:
+            # RemovedInDjango50Warning: When the deprecation ends, replace with:
+            #   user = self.configure_user(request, user, created=created)
+            if func_supports_parameter(self.configure_user, "created"):
+                user = self.configure_user(request, user, created=created)
+            else:
+                warnings.warn(
+                    f"`created=True` must be added to the signature of "
+                    f"{self.__class__.__qualname__}.configure_user().",
+                    category=RemovedInDjango50Warning,
+                )
                 user = self.configure_user(request, user)
+        if user is not None:
+            self.set_cached_user(username, user)
         return user if self.user_can_authenticate(user) else None
 
     def clean_username(self, username):
@@ -399,11 +681,20 @@ class RemoteUserBackend(ModelBackend):
 
     def configure_user(self, request, user, created=True):
         """
-        Настраивает пользователя при каждой попытке аутентификации.
+        Настраивает пользователя после его создания.
         """
         return user
 
 
+@receiver(post_save, sender=UserModel)
+@receiver(post_delete, sender=UserModel)
+def remote_user_changed(sender, instance, update_fields=None, **kwargs):
+    # update_last_login() сохраняет last_login при каждом входе.
+    if update_fields == frozenset(["last_login"]):
+        return
+    RemoteUserBackend.invalidate_cached_user(instance)
+
+
 class AllowAllUsersRemoteUserBackend(RemoteUserBackend):
     """
     Не отклоняет неактивных пользователей.
@@ -453,6 +744,14 @@ class BaseUserManager(models.Manager):
         return self.get(**{self.model.USERNAME_FIELD: username})
 
 
+def _init_hashing_worker():
+    # Дочерним процессам, запущенным через spawn, нужны настройки Django.
+    import django
+
+    if not apps.ready:
+        django.setup()
+
+
 class UserManager(BaseUserManager):
     """
     Менеджер для модели User с полями: username, email, is_staff, is_active, 
@@ -480,6 +779,85 @@ class UserManager(BaseUserManager):
         user.save(using=self._db)
         return user
 
+    # Пачки меньше этого размера хешируются в текущем процессе: запуск пула
+    # процессов дороже, чем хеширование нескольких паролей.
+    parallel_hashing_min_batch = 32
+
+    def bulk_create_users(self, users, batch_size=1000, workers=None, progress=None):
+        """
+        Создает пользователей пачками по batch_size.
+        users - итерируемый обьект словарей с username, email, password, groups
+        (список Group или их pk) и остальными полями модели.
+        Пароли хешируются параллельно в workers процессах (небольшие пачки -
+        в текущем процессе), пользователи вставляются bulk_create(), членство
+        в группах - bulk_create() в промежуточную таблицу. После каждой пачки
+        вызывается progress(created, users_per_second) и пишется сообщение в лог.
+        Возвращает список созданных пользователей.
+        """
+        GlobalUserModel = apps.get_model(
+            self.model._meta.app_label, self.model._meta.object_name
+        )
+        Membership = self.model.groups.through
+        user_field = "%s_id" % self.model._meta.model_name
+        users = iter(users)
+        workers = workers or os.cpu_count()
+        created = []
+        started = time.perf_counter()
+        pool = None
+        try:
+            while batch := list(islice(users, batch_size)):
+                batch = [dict(fields) for fields in batch]
+                if not all(fields.get("username") for fields in batch):
+                    raise ValueError("The given username must be set")
+                raw_passwords = [fields.pop("password", None) for fields in batch]
+                if workers > 1 and len(batch) >= self.parallel_hashing_min_batch:
+                    if pool is None:
+                        pool = ProcessPoolExecutor(workers, initializer=_init_hashing_worker)
+                    passwords = pool.map(
+                        make_password, raw_passwords,
+                        chunksize=max(1, len(batch) // (4 * workers)),
+                    )
+                else:
+                    passwords = map(make_password, raw_passwords)
+                groups = [fields.pop("groups", ()) for fields in batch]
+                objs = [
+                    self.model(
+                        username=GlobalUserModel.normalize_username(fields.pop("username")),
+                        email=self.normalize_email(fields.pop("email", None)),
+                        password=password,
+                        **fields,
+                    )
+                    for fields, password in zip(batch, passwords)
+                ]
+                objs = self.bulk_create(objs, batch_size=batch_size)
+                if any(obj.pk is None for obj in objs):
+                    # БД не возвращает pk из bulk_create (MySQL, старый SQLite).
+                    pks = dict(
+                        self.filter(
+                            username__in=[obj.username for obj in objs]
+                        ).values_list("username", "pk")
+                    )
+                    for obj in objs:
+                        obj.pk = pks[obj.username]
+                Membership.objects.bulk_create(
+                    [
+                        Membership(**{user_field: obj.pk, "group_id": getattr(group, "pk", group)})
+                        for obj, user_groups in zip(objs, groups)
+                        for group in user_groups
+                    ],
+                    batch_size=batch_size,
+                    ignore_conflicts=True,
+                )
+                created.extend(objs)
+                rate = len(created) / (time.perf_counter() - started)
+                logger.info("bulk_create_users: %d users, %.0f users/s", len(created), rate)
+                if progress is not None:
+                    progress(len(created), rate)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        return created
+
     def create_user(self, username, email=None, password=None, **extra_fields):
         """
         Создает, сохраняет и возвращает User.
@@ -537,6 +915,38 @@ class UserManager(BaseUserManager):
         return self.none()
 
 
+# HMAC сессии вычисляется на каждый аутентифицированный запрос (в get_user()),
+# а с SECRET_KEY_FALLBACKS еще и для каждого резервного ключа.
+# Результат зависит только от хеша пароля и ключа, поэтому запоминается в LRU.
+SESSION_AUTH_HASH_CACHE_SIZE = 4096
+
+
+@functools.lru_cache(maxsize=SESSION_AUTH_HASH_CACHE_SIZE)
+def session_auth_hash(password, secret):
+    key_salt = "django.contrib.auth.models.AbstractBaseUser.get_session_auth_hash"
+    return salted_hmac(
+        key_salt,
+        password,
+        secret=secret,
+        algorithm="sha256",
+    ).hexdigest()
+
+
+def fallback_grace_until():
+    """
+    SECRET_KEY_FALLBACKS_GRACE_UNTIL в том же виде, что и timezone.now(): время
+    без часового пояса считается временем TIME_ZONE (при USE_TZ = True).
+    """
+    grace_until = getattr(settings, "SECRET_KEY_FALLBACKS_GRACE_UNTIL", None)
+    if grace_until is None:
+        return None
+    if settings.USE_TZ and timezone.is_naive(grace_until):
+        return timezone.make_aware(grace_until)
+    if not settings.USE_TZ and timezone.is_aware(grace_until):
+        return timezone.make_naive(grace_until)
+    return grace_until
+
+
 class AbstractBaseUser(models.Model):
     password = models.CharField(_("password"), max_length=128)
     last_login = models.DateTimeField(_("last login"), blank=True, null=True)
@@ -558,6 +968,8 @@ class AbstractBaseUser(models.Model):
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
         if self._password is not None:
+            # Пароль изменен, сессии со старым хешем больше не действительны.
+            get_shared_cache().delete(rehash_cache_key(self.pk))
             password_validation.password_changed(self._password, self)
             self._password = None
 
@@ -592,6 +1004,10 @@ class AbstractBaseUser(models.Model):
         """Возвращает True, если необработанная строка является корректным паролем."""
 
         def setter(raw_password):
+            if getattr(get_hasher(), "defer_rehash", False) and self.pk is not None:
+                # В очередь передается только новый хеш.
+                rehash_queue.submit(self, make_password(raw_password))
+                return
             self.set_password(raw_password)
             # Password hash upgrades shouldn't be considered password changes.
             self._password = None
@@ -602,6 +1018,13 @@ class AbstractBaseUser(models.Model):
         """
         return check_password(raw_password, self.password, setter)
 
+    async def acheck_password(self, raw_password):
+        """Асинхронный check_password(). Хеширование выполняется в пуле get_password_executor()."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            get_password_executor(), self.check_password, raw_password
+        )
+
     def set_unusable_password(self):
         """Помечает пользователя как не имеющего установленного пароля."""
         """
@@ -619,20 +1042,26 @@ class AbstractBaseUser(models.Model):
         return self._get_session_auth_hash()
 
     def get_session_auth_fallback_hash(self):
-        """Возвращает HMAC поля пароля используя SECRET_KEY_FALLBACKS. Используется в get_user()."""
+        """
+        Возвращает HMAC поля пароля используя SECRET_KEY_FALLBACKS. Используется в get_user().
+        После SECRET_KEY_FALLBACKS_GRACE_UNTIL (datetime) резервные ключи не проверяются:
+        к этому времени get_user() уже перевел активные сессии на новый ключ.
+        Также возвращает HMAC хеша пароля до фонового пересчета (RehashQueue).
+        """
+        rehashed = get_shared_cache().get(rehash_cache_key(self.pk))
+        if rehashed is not None and rehashed["new"] == self.password:
+            yield session_auth_hash(rehashed["old"], settings.SECRET_KEY)
+        grace_until = fallback_grace_until()
+        if grace_until is not None and timezone.now() >= grace_until:
+            return
         for fallback_secret in settings.SECRET_KEY_FALLBACKS:
             yield self._get_session_auth_hash(secret=fallback_secret)
 
     def _get_session_auth_hash(self, secret=None):
-        # TODO что это и зачем
-        """"""
-        key_salt = "django.contrib.auth.models.AbstractBaseUser.get_session_auth_hash"
-        return salted_hmac(
-            key_salt,
-            self.password,
-            secret=secret,
-            algorithm="sha256",
-        ).hexdigest()
+        """Возвращает HMAC хеша пароля с ключом secret (по умолчанию SECRET_KEY)."""
+        if secret is None:
+            secret = settings.SECRET_KEY
+        return session_auth_hash(self.password, secret)
 
     @classmethod
     def get_email_field_name(cls):
@@ -656,6 +1085,8 @@ class PermissionsMixin(models.Model):
     """
     Добавляет поля и методы необходимые для Group и Permission моделей,
     использующих ModelBackend.
+    В django.contrib.auth related_name="user_set", related_query_name="user".
+    Здесь имена другие, т.к. в проекте установлены обе модели User.
     """
 
     is_superuser = models.BooleanField(
@@ -674,16 +1105,16 @@ class PermissionsMixin(models.Model):
             "The groups this user belongs to. A user will get all permissions "
             "granted to each of their groups."
         ),
-        related_name="user_set",
-        related_query_name="user",
+        related_name="aut_user_set",
+        related_query_name="aut_user",
     )
     user_permissions = models.ManyToManyField(
         Permission,
         verbose_name=_("user permissions"),
         blank=True,
         help_text=_("Specific permissions for this user."),
-        related_name="user_set",
-        related_query_name="user",
+        related_name="aut_user_set",
+        related_query_name="aut_user",
     )
 
     class Meta:
@@ -827,3 +1258,122 @@ class User(AbstractUser):
     При изменении модели пользователя ее нужно обновить в ModelAdmin. 
     """
     pass
+
+
+def effective_permissions_enabled():
+    return getattr(settings, "AUTH_EFFECTIVE_PERMISSIONS", False)
+
+
+class UserEffectivePermission(models.Model):
+    """
+    Денормализованная таблица итоговых разрешений пользователя: разрешения
+    пользователя и всех его групп. Включается AUTH_EFFECTIVE_PERMISSIONS = True.
+    Поддерживается сигналами m2m_changed, полностью перестраивается командой
+    rebuild_effective_permissions. После включения на существующих данных
+    таблицу нужно заполнить этой командой.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+"
+    )
+    permission = models.ForeignKey(
+        Permission, on_delete=models.CASCADE, related_name="+"
+    )
+    # Источник разрешения: user_permissions и/или группы пользователя.
+    from_user = models.BooleanField(default=False)
+    from_group = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = [["user", "permission"]]
+        indexes = [models.Index(fields=["permission", "user"])]
+
+
+def refresh_effective_permissions(user_ids, batch_size=1000):
+    """
+    Пересчитывает строки UserEffectivePermission пользователей user_ids.
+    """
+    user_ids = list(user_ids)
+    user_field = UserModel._meta.model_name
+    groups_query = "group__%s" % UserModel._meta.get_field("groups").related_query_name()
+    for start in range(0, len(user_ids), batch_size):
+        chunk = user_ids[start:start + batch_size]
+        rows = {}
+        user_pairs = UserModel.user_permissions.through.objects.filter(
+            **{"%s_id__in" % user_field: chunk}
+        ).values_list("%s_id" % user_field, "permission_id")
+        for pair in user_pairs:
+            rows[pair] = UserEffectivePermission(
+                user_id=pair[0], permission_id=pair[1], from_user=True
+            )
+        group_pairs = Group.permissions.through.objects.filter(
+            **{"%s__in" % groups_query: chunk}
+        ).values_list(groups_query, "permission_id").distinct()
+        for pair in group_pairs:
+            row = rows.get(pair)
+            if row is None:
+                row = rows[pair] = UserEffectivePermission(
+                    user_id=pair[0], permission_id=pair[1]
+                )
+            row.from_group = True
+        with transaction.atomic():
+            UserEffectivePermission.objects.filter(user_id__in=chunk).delete()
+            UserEffectivePermission.objects.bulk_create(rows.values(), batch_size=batch_size)
+        invalidate_permissions(chunk)
+
+
+def group_member_ids(group_ids):
+    return UserModel.groups.through.objects.filter(
+        group_id__in=group_ids
+    ).values_list("%s_id" % UserModel._meta.model_name, flat=True).distinct()
+
+
+@receiver(m2m_changed, sender=UserModel.user_permissions.through)
+@receiver(m2m_changed, sender=UserModel.groups.through)
+def user_effective_permissions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not effective_permissions_enabled():
+        return
+    if not reverse:
+        if action.startswith("post_"):
+            refresh_effective_permissions([instance.pk])
+    elif action == "pre_clear":
+        # После clear() связанных пользователей уже не найти.
+        field = "groups" if sender is UserModel.groups.through else "user_permissions"
+        instance._effective_user_ids = list(
+            UserModel._default_manager.filter(**{field: instance}).values_list("pk", flat=True)
+        )
+    elif action == "post_clear":
+        refresh_effective_permissions(instance._effective_user_ids)
+    elif action.startswith("post_"):
+        refresh_effective_permissions(pk_set)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def group_effective_permissions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not effective_permissions_enabled():
+        return
+    if not reverse:
+        group_ids = [instance.pk]
+    elif action in ("pre_clear", "post_clear"):
+        if action == "pre_clear":
+            instance._effective_group_ids = list(
+                instance.group_set.values_list("pk", flat=True)
+            )
+            return
+        group_ids = instance._effective_group_ids
+    else:
+        group_ids = pk_set
+    if action.startswith("post_"):
+        refresh_effective_permissions(group_member_ids(group_ids))
+
+
+@receiver(pre_delete, sender=Group)
+def group_effective_permissions_deleting(sender, instance, **kwargs):
+    if effective_permissions_enabled():
+        # Строки связи с пользователями удаляются каскадно, без m2m_changed.
+        instance._effective_user_ids = list(group_member_ids([instance.pk]))
+
+
+@receiver(post_delete, sender=Group)
+def group_effective_permissions_deleted(sender, instance, **kwargs):
+    if effective_permissions_enabled():
+        refresh_effective_permissions(instance._effective_user_ids)
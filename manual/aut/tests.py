@@ -1,3 +1,394 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import io
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.contrib.auth.models import Group, Permission, User
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+
+from config.cache import SQLiteCache
+
+from . import models as aut_models
+from .models import ModelBackend, UserEffectivePermission, refresh_effective_permissions
+
+
+@override_settings(AUTHENTICATION_BACKENDS=['aut.models.ModelBackend'])
+class PermissionCacheTests(TestCase):
+    def setUp(self):
+        aut_models.get_shared_cache().clear()
+        self.user = User.objects.create_user('user', password='secret')
+        self.permission = Permission.objects.get(content_type__app_label='auth', codename='add_group')
+        self.group = Group.objects.create(name='group')
+
+    def fresh(self):
+        # Новый экземпляр, как в следующем запросе: кэш экземпляра пуст.
+        return User.objects.get(pk=self.user.pk)
+
+    def test_shared_cache(self):
+        self.assertFalse(self.fresh().has_perm('auth.add_group'))
+        user = self.fresh()
+        with self.assertNumQueries(0):
+            self.assertFalse(user.has_perm('auth.add_group'))
+            self.assertFalse(user.has_module_perms('auth'))
+
+    def test_other_process(self):
+        # Процесс со своим экземпляром общего кэша видит сброс, выполненный
+        # сигналами m2m_changed в этом процессе.
+        other_process = SQLiteCache(aut_models.get_shared_cache().path, {})
+        self.user.groups.add(self.group)
+        self.group.permissions.add(self.permission)
+        with mock.patch.object(aut_models, 'get_shared_cache', return_value=other_process):
+            self.assertTrue(self.fresh().has_perm('auth.add_group'))
+            user = self.fresh()
+            with self.assertNumQueries(0):
+                self.assertTrue(user.has_perm('auth.add_group'))
+        self.group.permissions.remove(self.permission)
+        with mock.patch.object(aut_models, 'get_shared_cache', return_value=other_process):
+            self.assertFalse(self.fresh().has_perm('auth.add_group'))
+        self.user.user_permissions.add(self.permission)
+        with mock.patch.object(aut_models, 'get_shared_cache', return_value=other_process):
+            self.assertTrue(self.fresh().has_perm('auth.add_group'))
+
+    def test_user_permission(self):
+        self.assertFalse(self.fresh().has_perm('auth.add_group'))
+        self.user.user_permissions.add(self.permission)
+        self.assertTrue(self.fresh().has_perm('auth.add_group'))
+        self.user.user_permissions.remove(self.permission)
+        self.assertFalse(self.fresh().has_perm('auth.add_group'))
+
+    def test_group_permission(self):
+        self.user.groups.add(self.group)
+        self.assertFalse(self.fresh().has_perm('auth.add_group'))
+        self.group.permissions.add(self.permission)
+        self.assertTrue(self.fresh().has_perm('auth.add_group'))
+        self.group.permissions.clear()
+        self.assertFalse(self.fresh().has_perm('auth.add_group'))
+        self.group.permissions.add(self.permission)
+        self.assertTrue(self.fresh().has_perm('auth.add_group'))
+        self.group.delete()
+        self.assertFalse(self.fresh().has_perm('auth.add_group'))
+
+    def test_reverse_and_superuser(self):
+        self.user.groups.add(self.group)
+        self.group.permissions.add(self.permission)
+        self.assertTrue(self.fresh().has_perm('auth.add_group'))
+        self.group.user_set.clear()
+        self.assertFalse(self.fresh().has_perm('auth.add_group'))
+        self.group.user_set.add(self.user)
+        self.assertTrue(self.fresh().has_perm('auth.add_group'))
+
+        self.user.is_superuser = True
+        self.user.save()
+        user = self.fresh()
+        self.assertEqual(len(user.get_all_permissions()), Permission.objects.count())
+
+
+@override_settings(
+    AUTH_EFFECTIVE_PERMISSIONS=True,
+    AUTHENTICATION_BACKENDS=['aut.models.ModelBackend'],
+)
+class UserEffectivePermissionTests(TestCase):
+    def setUp(self):
+        aut_models.get_shared_cache().clear()
+        self.user = User.objects.create_user('user', password='secret')
+        self.other = User.objects.create_user('other', password='secret')
+        self.add_group = Permission.objects.get(content_type__app_label='auth', codename='add_group')
+        self.change_group = Permission.objects.get(content_type__app_label='auth', codename='change_group')
+        self.group = Group.objects.create(name='group')
+
+    def rows(self):
+        return set(UserEffectivePermission.objects.values_list(
+            'user__username', 'permission__codename', 'from_user', 'from_group'
+        ))
+
+    def fresh(self, user=None):
+        return User.objects.get(pk=(user or self.user).pk)
+
+    def test_signals(self):
+        self.user.user_permissions.add(self.add_group)
+        self.assertEqual(self.rows(), {('user', 'add_group', True, False)})
+        self.user.groups.add(self.group)
+        self.group.permissions.add(self.add_group, self.change_group)
+        self.assertEqual(self.rows(), {
+            ('user', 'add_group', True, True), ('user', 'change_group', False, True),
+        })
+        self.group.user_set.add(self.other)
+        self.assertEqual(len(self.rows()), 4)
+        self.change_group.group_set.clear()
+        self.assertEqual(self.rows(), {
+            ('user', 'add_group', True, True), ('other', 'add_group', False, True),
+        })
+        self.group.user_set.clear()
+        self.assertEqual(self.rows(), {('user', 'add_group', True, False)})
+        # Строки связи удаляются каскадно, без m2m_changed.
+        self.group.user_set.add(self.other)
+        self.group.delete()
+        self.assertEqual(self.rows(), {('user', 'add_group', True, False)})
+        self.user.user_permissions.clear()
+        self.assertEqual(self.rows(), set())
+
+    def test_signals_invalidate_cache(self):
+        self.assertFalse(self.fresh().has_perm('auth.add_group'))
+        self.user.groups.add(self.group)
+        self.group.permissions.add(self.add_group)
+        self.assertTrue(self.fresh().has_perm('auth.add_group'))
+        self.group.permissions.remove(self.add_group)
+        self.assertFalse(self.fresh().has_perm('auth.add_group'))
+
+    def test_backend(self):
+        self.user.groups.add(self.group)
+        self.group.permissions.add(self.add_group)
+        self.other.user_permissions.add(self.change_group)
+        # Пользователь и одна выборка из UserEffectivePermission.
+        with self.assertNumQueries(2):
+            user = self.fresh()
+            self.assertTrue(user.has_perm('auth.add_group'))
+            self.assertEqual(user.get_group_permissions(), {'auth.add_group'})
+            self.assertEqual(user.get_user_permissions(), set())
+        self.assertEqual(list(User.objects.with_perm('auth.add_group')), [self.user])
+        self.assertEqual(
+            list(ModelBackend().with_perm(self.change_group, include_superusers=False)),
+            [self.other]
+        )
+
+    def test_refresh(self):
+        self.user.groups.add(self.group)
+        self.group.permissions.add(self.add_group)
+        self.other.user_permissions.add(self.change_group)
+        expected = self.rows()
+        UserEffectivePermission.objects.all().delete()
+        refresh_effective_permissions([self.user.pk, self.other.pk], batch_size=1)
+        self.assertEqual(self.rows(), expected)
+
+        UserEffectivePermission.objects.all().delete()
+        call_command('rebuild_effective_permissions', stdout=io.StringIO())
+        self.assertEqual(self.rows(), expected)
+
+
+class SessionAuthHashTests(TestCase):
+    def setUp(self):
+        aut_models.session_auth_hash.cache_clear()
+        self.user = aut_models.User(password='hash')
+
+    def test_memoized(self):
+        expected = salted_hmac(
+            'django.contrib.auth.models.AbstractBaseUser.get_session_auth_hash',
+            'hash', algorithm='sha256',
+        ).hexdigest()
+        self.assertEqual(self.user.get_session_auth_hash(), expected)
+        self.assertEqual(self.user.get_session_auth_hash(), expected)
+        self.assertEqual(aut_models.session_auth_hash.cache_info().hits, 1)
+
+    @override_settings(SECRET_KEY_FALLBACKS=['old-1', 'old-2'])
+    def test_grace_until(self):
+        self.assertEqual(len(list(self.user.get_session_auth_fallback_hash())), 2)
+        past = timezone.now() - datetime.timedelta(days=1)
+        future = timezone.now() + datetime.timedelta(days=1)
+        # Время без часового пояса считается временем TIME_ZONE.
+        for grace_until, count in (
+            (past, 0), (future, 2),
+            (timezone.make_naive(past), 0), (timezone.make_naive(future), 2),
+        ):
+            with self.subTest(grace_until=grace_until), \
+                    override_settings(SECRET_KEY_FALLBACKS_GRACE_UNTIL=grace_until):
+                self.assertEqual(len(list(self.user.get_session_auth_fallback_hash())), count)
+
+    def test_bench_command(self):
+        out = io.StringIO()
+        call_command('bench_auth_middleware', requests=20, fallbacks=2, stdout=out)
+        self.assertIn('с кэшем HMAC', out.getvalue())
+        self.assertFalse(aut_models.User.objects.exists())
+
+
+# Меньше итераций, чтобы тесты не тратили время на PBKDF2.
+class FastPBKDF2PasswordHasher(aut_models.CustomPBKDF2PasswordHasher):
+    iterations = 2000
+
+
+class FastBackgroundRehashPBKDF2PasswordHasher(FastPBKDF2PasswordHasher):
+    defer_rehash = True
+
+
+# Фоновый поток сохраняет хеш своим соединением, поэтому без транзакции теста.
+@override_settings(PASSWORD_HASHERS=['aut.tests.FastBackgroundRehashPBKDF2PasswordHasher'])
+class PasswordRehashTests(TransactionTestCase):
+    def setUp(self):
+        aut_models.get_shared_cache().clear()
+        user = aut_models.User.objects.create(
+            username='user', password=PBKDF2PasswordHasher().encode('secret', 'salt1234', 1000)
+        )
+        self.user = aut_models.User.objects.get(pk=user.pk)
+        self.old = self.user.password
+
+    def stored(self):
+        return aut_models.User.objects.get(pk=self.user.pk).password
+
+    @override_settings(PASSWORD_HASHERS=['aut.tests.FastPBKDF2PasswordHasher'])
+    def test_check_password(self):
+        self.assertFalse(self.user.check_password('wrong'))
+        self.assertEqual(self.stored(), self.old)
+        self.assertTrue(self.user.check_password('secret'))
+        self.assertIn('$2000$', self.stored())
+
+    def test_deferred_rehash(self):
+        jobs = []
+        submit = aut_models.rehash_queue.submit
+
+        def record(user, new_encoded):
+            jobs.append((user.pk, new_encoded))
+            return submit(user, new_encoded)
+
+        with mock.patch.object(aut_models.rehash_queue, 'submit', record):
+            self.assertTrue(self.user.check_password('secret'))
+        aut_models.rehash_queue.join()
+        # В очередь попадает новый хеш, а не пароль.
+        self.assertEqual(jobs, [(self.user.pk, self.stored())])
+        self.assertIn('$2000$', self.stored())
+        self.assertTrue(aut_models.User.objects.get(pk=self.user.pk).check_password('secret'))
+
+    def test_acheck_password(self):
+        async def check():
+            return await asyncio.gather(
+                self.user.acheck_password('secret'), self.user.acheck_password('wrong')
+            )
+
+        self.assertEqual(async_to_sync(check)(), [True, False])
+        aut_models.rehash_queue.join()
+        self.assertIn('$2000$', self.stored())
+
+    def test_session_after_rehash(self):
+        session_hash = self.user.get_session_auth_hash()
+        self.user.check_password('secret')
+        aut_models.rehash_queue.join()
+        user = aut_models.User.objects.get(pk=self.user.pk)
+        self.assertNotEqual(user.get_session_auth_hash(), session_hash)
+        self.assertIn(session_hash, list(user.get_session_auth_fallback_hash()))
+        # Сессию может проверять другой процесс со своим экземпляром кэша.
+        other_process = SQLiteCache(aut_models.get_shared_cache().path, {})
+        with mock.patch.object(aut_models, 'get_shared_cache', return_value=other_process):
+            self.assertIn(session_hash, list(user.get_session_auth_fallback_hash()))
+
+        # После смены пароля (в т.ч. через update()) старый хеш не принимается.
+        aut_models.User.objects.filter(pk=user.pk).update(password='other')
+        user.refresh_from_db()
+        self.assertEqual(list(user.get_session_auth_fallback_hash()), [])
+
+
+@override_settings(PASSWORD_HASHERS=['aut.tests.FastPBKDF2PasswordHasher'])
+class BulkCreateUsersTests(TestCase):
+    def setUp(self):
+        self.groups = [Group.objects.create(name='a'), Group.objects.create(name='b')]
+
+    def rows(self, count):
+        return (
+            {
+                'username': 'user%d' % i, 'email': 'User%d@EXAMPLE.com' % i,
+                'password': 'secret%d' % i, 'first_name': 'name',
+                'groups': [self.groups[0], self.groups[1].pk] if i % 2 else [],
+            }
+            for i in range(count)
+        )
+
+    def test_create(self):
+        progress = []
+        users = aut_models.User.objects.bulk_create_users(
+            self.rows(80), batch_size=32, workers=2,
+            progress=lambda created, rate: progress.append(created),
+        )
+        self.assertEqual(progress, [32, 64, 80])
+        self.assertEqual(len(users), 80)
+        for i, user in enumerate(users):
+            stored = aut_models.User.objects.get(pk=user.pk)
+            self.assertEqual(stored.username, 'user%d' % i)
+            self.assertTrue(stored.check_password('secret%d' % i))
+        user = aut_models.User.objects.get(username='user7')
+        self.assertEqual(user.email, 'User7@example.com')
+        self.assertEqual(set(user.groups.values_list('name', flat=True)), {'a', 'b'})
+        self.assertEqual(aut_models.User.groups.through.objects.count(), 80)
+
+    def test_small_batch_serial(self):
+        # Пул процессов не создается для пачек меньше parallel_hashing_min_batch.
+        with mock.patch.object(aut_models, 'ProcessPoolExecutor') as pool:
+            users = aut_models.User.objects.bulk_create_users(self.rows(5), workers=4)
+        pool.assert_not_called()
+        for i, user in enumerate(users):
+            self.assertTrue(aut_models.User.objects.get(pk=user.pk).check_password('secret%d' % i))
+
+    def test_username_required(self):
+        with self.assertRaises(ValueError):
+            aut_models.User.objects.bulk_create_users([{'username': ''}])
+
+
+class ConfiguringRemoteUserBackend(aut_models.RemoteUserBackend):
+    configured = []
+
+    def configure_user(self, request, user, created=True):
+        self.configured.append(user.get_username())
+        return user
+
+
+class RemoteUserBackendCacheTests(TestCase):
+    def setUp(self):
+        aut_models.RemoteUserBackend.invalidate_cached_user()
+        self.addCleanup(aut_models.RemoteUserBackend.invalidate_cached_user)
+        ConfiguringRemoteUserBackend.configured = []
+        self.backend = ConfiguringRemoteUserBackend()
+        self.request = RequestFactory().get('/')
+
+    def test_cache_hit(self):
+        user = self.backend.authenticate(self.request, 'alice')
+        with self.assertNumQueries(0):
+            cached = self.backend.authenticate(self.request, 'alice')
+        self.assertEqual(cached.pk, user.pk)
+        # Каждый запрос получает свою копию.
+        self.assertIsNot(cached, user)
+        self.assertIsNot(cached, self.backend.authenticate(self.request, 'alice'))
+
+    def test_configure_user_on_create(self):
+        User.objects.create_user('bob')
+        self.backend.authenticate(self.request, 'alice')
+        self.backend.authenticate(self.request, 'bob')
+        aut_models.RemoteUserBackend.invalidate_cached_user()
+        self.backend.authenticate(self.request, 'alice')
+        self.backend.authenticate(self.request, 'bob')
+        self.assertEqual(self.backend.configured, ['alice'])
+
+    def test_invalidate_on_save(self):
+        user = self.backend.authenticate(self.request, 'alice')
+        user.is_active = False
+        user.save()
+        self.assertIsNone(self.backend.authenticate(self.request, 'alice'))
+        user.delete()
+        self.backend.authenticate(self.request, 'alice')
+        self.assertEqual(self.backend.configured, ['alice', 'alice'])
+
+    def test_last_login_keeps_cache(self):
+        user = self.backend.authenticate(self.request, 'alice')
+        user.last_login = timezone.now()
+        user.save(update_fields=['last_login'])
+        with self.assertNumQueries(0):
+            self.backend.authenticate(self.request, 'alice')
+
+    def test_cache_size(self):
+        with mock.patch.object(aut_models.RemoteUserBackend, 'user_cache_size', 2):
+            for username in ('alice', 'bob', 'carol'):
+                self.backend.authenticate(self.request, username)
+            self.assertEqual(list(aut_models.RemoteUserBackend._user_cache), ['bob', 'carol'])
+
+    def test_cache_disabled(self):
+        with mock.patch.object(aut_models.RemoteUserBackend, 'user_cache_timeout', 0):
+            self.backend.authenticate(self.request, 'alice')
+            with self.assertNumQueries(1):
+                self.backend.authenticate(self.request, 'alice')
+
+    def test_bench_command(self):
+        out = io.StringIO()
+        call_command('bench_remote_user', requests=20, users=5, stdout=out)
+        self.assertIn('с кэшем', out.getvalue())
+        self.assertFalse(User.objects.filter(username__startswith='sso-user-').exists())
+        self.assertFalse(aut_models.RemoteUserBackend._user_cache)
@@ -42,3 +42,79 @@ class AsyncView(View):
     async def get(self, request, *args, **kwargs):
         await asyncio.sleep(10)
         return HttpResponse('Hello async world!')
+
+
+"""
+Параллельное выполнение независимых запросов.
+
+
+sync_to_async(thread_sensitive=True) выполняет весь синхронный код запроса в 
+одном потоке, поэтому несколько запросов к БД из асинхронного представления 
+идут последовательно, даже через asyncio.gather().
+
+gather_querysets() выполняет каждый запрос в отдельном потоке ограниченного 
+пула (ASYNC_QUERY_WORKERS, по умолчанию 4). У каждого потока свое соединение 
+с БД, которое остается открытым между запросами. Запросы выполняются вне 
+транзакции текущего запроса и не видят ее незафиксированных изменений.
+
+authors, stats, publishers = await gather_querysets(
+    Author.objects.order_by('name')[:10],                 # QuerySet -> list
+    lambda: Book.objects.aggregate(Avg('price')),         # функция без аргументов
+    lambda: Publisher.objects.count(),
+)
+"""
+
+
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connections
+from django.db.models import Avg, Count, Max, QuerySet
+from django.http import JsonResponse
+
+import functools
+
+
+@functools.lru_cache(maxsize=None)
+def get_query_executor():
+    return ThreadPoolExecutor(
+        max_workers=getattr(settings, 'ASYNC_QUERY_WORKERS', 4),
+        thread_name_prefix='async-query',
+    )
+
+
+def _run_query(query):
+    # Неработоспособное соединение потока (например, после перезапуска БД) закрывается.
+    for connection in connections.all(initialized_only=True):
+        if connection.errors_occurred and not connection.is_usable():
+            connection.close()
+    if isinstance(query, QuerySet):
+        return list(query)
+    return query()
+
+
+async def gather_querysets(*queries):
+    loop = asyncio.get_running_loop()
+    executor = get_query_executor()
+    return await asyncio.gather(
+        *(loop.run_in_executor(executor, _run_query, query) for query in queries)
+    )
+
+
+# Время запросов последовательно и через gather_querysets():
+# python manage.py bench_dashboard --latency 5
+class DashboardView(View):
+    def get_queries(self):
+        from dja.models import Author, Book, Publisher
+
+        return [
+            Author.objects.order_by('-age').values('name', 'age')[:10],
+            lambda: Book.objects.aggregate(
+                avg_price=Avg('price'), max_pages=Max('pages'), count=Count('id')
+            ),
+            lambda: Publisher.objects.count(),
+        ]
+
+    async def get(self, request, *args, **kwargs):
+        authors, books, publishers = await gather_querysets(*self.get_queries())
+        books['avg_price'] = books['avg_price'] and float(books['avg_price'])
+        return JsonResponse({'authors': authors, 'books': books, 'publishers': publishers})
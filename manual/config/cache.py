@@ -0,0 +1,438 @@
+"""
+Раздел: Cache backends (Серверные части кэша)
+
+
+SQLiteCache - кэш в файле SQLite, общий для всех процессов на одном сервере
+(например, воркеров gunicorn). Подходит для тестов и для разработки вместо
+Redis/Memcached, когда нужен общий кэш без отдельного сервера.
+
+В отличие от FileBasedCache и DatabaseCache, add() и incr() атомарны: они
+выполняются одним SQL запросом (INSERT ... ON CONFLICT, UPDATE ... RETURNING),
+поэтому счетчики корректно работают из нескольких процессов.
+
+CACHES = {
+    "shared": {
+        "BACKEND": "config.cache.SQLiteCache",
+        "LOCATION": BASE_DIR / "cache.sqlite3",
+    }
+}
+
+
+TieredCache - двухуровневый кэш: L1 в памяти процесса (LRU с ограничением по размеру
+в байтах) поверх общего L2 (любой другой кэш из CACHES, например SQLiteCache или Redis).
+
+CACHES = {
+    "pages": {
+        "BACKEND": "config.cache.TieredCache",
+        "LOCATION": "shared",           # псевдоним кэша L2
+        "TIMEOUT": 600,
+        "OPTIONS": {
+            "L1_MAX_SIZE": 32 * 1024 * 1024,  # байт в памяти процесса
+            "L1_TIMEOUT": 5,            # сколько секунд L1 может отставать от L2
+            "STALE_TIMEOUT": 60,        # сколько секунд L2 хранит устаревшее значение
+            "BETA": 1.0,                # > 1 - обновлять раньше, < 1 - позже
+            "LOCK_TIMEOUT": 30,
+        },
+    }
+}
+
+Защита от одновременного пересчета (cache stampede):
+- Значение хранится в L2 дольше своего TIMEOUT (на STALE_TIMEOUT). Когда срок истек,
+  get() только у одного процесса возвращает промах (он берет блокировку через add() в L2
+  и пересчитывает значение), остальные получают устаревшее значение до set().
+- Вероятностное досрочное обновление (XFetch): чем ближе истечение и чем дольше
+  пересчитывалось значение (время от промаха до set()), тем вероятнее, что get()
+  вернет промах заранее, пока значение еще действительно.
+- get_or_set() ждет, пока значение посчитает другой процесс, если устаревшего нет.
+
+Целые числа (счетчики, версии) хранятся только в L2, чтобы incr() из других процессов
+был виден сразу. clear() очищает весь L2, поэтому вместе со страницами в L2 можно хранить
+только данные, потеря которых допустима (см. CACHES в config/settings.py).
+Счетчики попаданий, промахов и вытеснений этого процесса возвращает stats().
+"""
+
+
+import math
+import os
+import pickle
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = str(location)
+        self._local = threading.local()
+
+    def _connection(self):
+        # Отдельное соединение на каждый поток и процесс (после fork).
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache '
+                '(key TEXT PRIMARY KEY, value BLOB, expires REAL)'
+            )
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)'
+            )
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def get_backend_timeout(self, timeout=DEFAULT_TIMEOUT):
+        # Абсолютное время истечения или None (без срока действия).
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        return None if timeout is None else time.time() + timeout
+
+    # Целые числа хранятся как INTEGER, чтобы incr() выполнялся в SQL.
+    # Остальные значения (включая bool) сериализуются pickle.
+    def _encode(self, value):
+        if type(value) is int:
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def _decode(self, value):
+        return pickle.loads(value) if isinstance(value, bytes) else value
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute(
+            'SELECT value FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (key, time.time())
+        ).fetchone()
+        return default if row is None else self._decode(row[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        connection = self._connection()
+        connection.execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+            (key, self._encode(value), self.get_backend_timeout(timeout))
+        )
+        self._cull(connection)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        # Запись заменяется только если ее нет или срок ее действия истек.
+        key = self.make_and_validate_key(key, version=version)
+        connection = self._connection()
+        cursor = connection.execute(
+            'INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires '
+            'WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+            (key, self._encode(value), self.get_backend_timeout(timeout), time.time())
+        )
+        if cursor.rowcount != 1:
+            return False
+        self._cull(connection)
+        return True
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute(
+            'UPDATE cache SET value = value + ? WHERE key = ? '
+            "AND (expires IS NULL OR expires > ?) AND typeof(value) = 'integer' "
+            'RETURNING value',
+            (delta, key, time.time())
+        ).fetchone()
+        if row is None:
+            raise ValueError("Key '%s' not found" % key)
+        return row[0]
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection().execute(
+            'UPDATE cache SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, time.time())
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection().execute('DELETE FROM cache WHERE key = ?', (key,))
+        return cursor.rowcount == 1
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute(
+            'SELECT 1 FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (key, time.time())
+        ).fetchone()
+        return row is not None
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+    def _cull(self, connection):
+        connection.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self._max_entries and self._cull_frequency == 0:
+            connection.execute('DELETE FROM cache')
+        elif count > self._max_entries:
+            # Удаляется 1/cull_frequency записей с ближайшим сроком истечения.
+            connection.execute(
+                'DELETE FROM cache WHERE key IN ('
+                'SELECT key FROM cache ORDER BY expires IS NULL, expires LIMIT ?)',
+                (count // self._cull_frequency or 1,)
+            )
+
+
+# Значение в L2: expires - время истечения (None - без срока действия),
+# delta - сколько секунд значение пересчитывалось.
+CacheEntry = namedtuple('CacheEntry', 'value expires delta')
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.l2_alias = location
+        self.l1_max_size = int(options.get('L1_MAX_SIZE', 32 * 1024 * 1024))
+        self.l1_timeout = float(options.get('L1_TIMEOUT', 5))
+        self.stale_timeout = float(options.get('STALE_TIMEOUT', 60))
+        self.beta = float(options.get('BETA', 1.0))
+        self.lock_timeout = int(options.get('LOCK_TIMEOUT', 30))
+        # key -> (pickled CacheEntry, время истечения в L1)
+        self._l1 = OrderedDict()
+        self._l1_size = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._counters = dict.fromkeys(
+            ('l1_hits', 'l2_hits', 'misses', 'stale_hits', 'early_refreshes', 'evictions'), 0
+        )
+
+    @property
+    def l2(self):
+        return caches[self.l2_alias]
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, l1_size=self._l1_size, l1_entries=len(self._l1))
+
+    # Состояние потока: время промахов (для delta) и взятые блокировки.
+    def _state(self):
+        if not hasattr(self._local, 'misses'):
+            self._local.misses, self._local.locks = {}, {}
+        return self._local
+
+    def _l1_get(self, key):
+        with self._lock:
+            item = self._l1.get(key)
+            if item is None:
+                return None
+            if item[1] <= time.time():
+                self._l1_discard(key)
+                return None
+            self._l1.move_to_end(key)
+            return item[0]
+
+    def _l1_set(self, key, data, expires):
+        size = len(data)
+        with self._lock:
+            self._l1_discard(key)
+            if size > self.l1_max_size:
+                return
+            expires = time.time() + self.l1_timeout if expires is None else min(
+                expires, time.time() + self.l1_timeout
+            )
+            self._l1[key] = (data, expires)
+            self._l1_size += size
+            while self._l1_size > self.l1_max_size:
+                _, (evicted, _) = self._l1.popitem(last=False)
+                self._l1_size -= len(evicted)
+                self._counters['evictions'] += 1
+
+    def _l1_discard(self, key):
+        item = self._l1.pop(key, None)
+        if item is not None:
+            self._l1_size -= len(item[0])
+
+    def _lookup(self, key):
+        # Значение из L1 или L2 без учета срока действия: CacheEntry, int или None.
+        data = self._l1_get(key)
+        if data is not None:
+            entry = pickle.loads(data)
+            if entry.expires is None or entry.expires > time.time():
+                self._count('l1_hits')
+                return entry
+            # Устаревшее в L1 значение могло быть уже обновлено в L2.
+            with self._lock:
+                self._l1_discard(key)
+        data = self.l2.get(key)
+        if data is None:
+            return None
+        self._count('l2_hits')
+        if isinstance(data, int):
+            return data
+        entry = pickle.loads(data)
+        if entry.expires is None or entry.expires + self.stale_timeout > time.time():
+            self._l1_set(key, data, None if entry.expires is None else entry.expires + self.stale_timeout)
+        return entry
+
+    def _lock_key(self, key):
+        return key + ':lock'
+
+    def _holds_lock(self, key):
+        # Блокировка в L2 истекает через LOCK_TIMEOUT, после этого ее может взять другой.
+        deadline = self._state().locks.get(key)
+        return deadline is not None and deadline > time.monotonic()
+
+    def _acquire(self, key):
+        if self._holds_lock(key):
+            return True
+        if self.l2.add(self._lock_key(key), 1, self.lock_timeout):
+            self._state().locks[key] = time.monotonic() + self.lock_timeout
+            return True
+        return False
+
+    def _release(self, key):
+        if self._state().locks.pop(key, None) is not None:
+            self.l2.delete(self._lock_key(key))
+
+    def _miss(self, key):
+        misses = self._state().misses
+        if len(misses) > 1000:
+            misses.clear()
+        misses[key] = time.monotonic()
+
+    def _should_refresh(self, entry, now):
+        # XFetch: now - delta * beta * ln(rand) >= expires.
+        if entry.expires is None:
+            return False
+        return now - entry.delta * self.beta * math.log(1 - random.random()) >= entry.expires
+
+    def _is_fresh(self, entry):
+        return isinstance(entry, int) or entry.expires is None or entry.expires > time.time()
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        entry = self._lookup(key)
+        if isinstance(entry, int):
+            return entry
+        if entry is not None and self._is_fresh(entry):
+            if not self._should_refresh(entry, time.time()) or not self._acquire(key):
+                return entry.value
+            self._count('early_refreshes')
+        elif not self._acquire(key):
+            # Пересчитывает другой процесс или поток.
+            if entry is None:
+                self._count('misses')
+                return default
+            self._count('stale_hits')
+            return entry.value
+        else:
+            # Значение могли обновить, пока блокировка была занята.
+            current = self._lookup(key)
+            if current is not None and self._is_fresh(current):
+                self._release(key)
+                return current if isinstance(current, int) else current.value
+            self._count('misses')
+        self._miss(key)
+        return default
+
+    def _store(self, key, value, timeout, delta, add=False):
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if isinstance(value, int) and not isinstance(value, bool):
+            with self._lock:
+                self._l1_discard(key)
+            if add:
+                return self.l2.add(key, value, timeout)
+            self.l2.set(key, value, timeout)
+            return True
+        expires = None if timeout is None else time.time() + timeout
+        data = pickle.dumps(CacheEntry(value, expires, delta), pickle.HIGHEST_PROTOCOL)
+        l2_timeout = None if timeout is None else max(timeout, 0) + self.stale_timeout
+        if add:
+            if not self.l2.add(key, data, l2_timeout):
+                return False
+        else:
+            self.l2.set(key, data, l2_timeout)
+        self._l1_set(key, data, None if expires is None else expires + self.stale_timeout)
+        return True
+
+    def _delta(self, key):
+        started = self._state().misses.pop(key, None)
+        return 0 if started is None else time.monotonic() - started
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        try:
+            self._store(key, value, timeout, self._delta(key))
+        finally:
+            self._release(key)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        entry = self._lookup(key)
+        if isinstance(entry, CacheEntry) and self._is_fresh(entry):
+            return False
+        if entry is not None and not isinstance(entry, int):
+            # В L2 лежит устаревшее значение, add() его заменяет.
+            self.l2.delete(key)
+        try:
+            return self._store(key, value, timeout, self._delta(key), add=True)
+        finally:
+            self._release(key)
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        value = self.get(key, self._missing_key, version=version)
+        if value is not self._missing_key:
+            return value
+        made_key = self.make_and_validate_key(key, version=version)
+        if not self._holds_lock(made_key):
+            # Значение считает другой процесс, ждем его до LOCK_TIMEOUT.
+            deadline = time.monotonic() + self.lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                value = self.get(key, self._missing_key, version=version)
+                if value is not self._missing_key:
+                    return value
+                if self._holds_lock(made_key):
+                    break
+        if callable(default):
+            default = default()
+        self.set(key, default, timeout, version=version)
+        return default
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        entry = self._lookup(key)
+        return entry is not None and self._is_fresh(entry)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        entry = self._lookup(key)
+        if entry is None:
+            return False
+        if isinstance(entry, int):
+            return self.l2.touch(key, self.default_timeout if timeout == DEFAULT_TIMEOUT else timeout)
+        return self._store(key, entry.value, timeout, entry.delta)
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self.l2.incr(key, delta)
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            self._l1_discard(key)
+        return self.l2.delete(key)
+
+    def clear(self):
+        with self._lock:
+            self._l1.clear()
+            self._l1_size = 0
+        self.l2.clear()
@@ -65,3 +65,192 @@ class SimpleMiddleware:
     #     Должен возвращать обьект ответа, реализующий render метод. Может создать и вернуть совершенно новое TemplateResponse.
     #     """
     #     pass
+
+
+"""
+Бюджет запросов к БД.
+
+
+QueryBudgetMiddleware оборачивает каждый запрос в connection.execute_wrapper()
+(см. QueryLogger в dja/models.py) и считает:
+    - кол-во SQL запросов;
+    - общее время работы БД;
+    - повторяющиеся запросы (отпечатки SQL без параметров). Признак N+1.
+
+Бюджет запросов задается:
+1. Атрибутом представления query_budget.
+class BlogListView(generic.ListView):
+    query_budget = 2
+2. Настройкой QUERY_BUDGETS = {'dja.views.BlogListView': 2}.
+3. Настройкой QUERY_BUDGET_DEFAULT для всех остальных представлений.
+
+При превышении бюджета пишется WARNING, а если QUERY_BUDGET_RAISE=True, 
+то вызывается QueryBudgetExceeded.
+
+Заголовки ответа:
+X-DB-Queries: 3
+Server-Timing: db;dur=1.52;desc="3 queries"
+
+Для StreamingHttpResponse запросы выполняются при отдаче тела, уже после
+middleware, поэтому заголовки не добавляются и бюджет не проверяется.
+"""
+
+
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+# Приведение SQL к отпечатку: литералы заменяются на ?, списки IN (...) 
+# схлопываются, чтобы одинаковые по форме запросы совпадали.
+_FINGERPRINT_RE = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+)
+
+
+def sql_fingerprint(sql):
+    for pattern, repl in _FINGERPRINT_RE:
+        sql = pattern.sub(repl, sql)
+    return sql.strip()
+
+
+class QueryCounter:
+    """
+    Обертка для execute_wrapper(), собирающая статистику запросов.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.monotonic()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.monotonic() - start
+            self.count += 1
+            self.fingerprints[sql_fingerprint(sql)] += 1
+
+    @property
+    def duplicates(self):
+        # Отпечатки, выполненные больше одного раза.
+        return {sql: n for sql, n in self.fingerprints.items() if n > 1}
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+
+    def __call__(self, request) -> Any:
+        counter = QueryCounter()
+        request._query_budget = getattr(settings, 'QUERY_BUDGET_DEFAULT', None)
+        request._query_budget_view = None
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        request.query_counter = counter
+        if response.streaming:
+            return response
+
+        response['X-DB-Queries'] = str(counter.count)
+        response['Server-Timing'] = 'db;dur=%.2f;desc="%d queries"' % (
+            counter.duration * 1000, counter.count
+        )
+        self.check_budget(request, counter)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Бюджет определяется здесь, так как только тут известно представление.
+        view = getattr(view_func, 'view_class', view_func)
+        name = '%s.%s' % (view.__module__, view.__qualname__)
+        budgets = getattr(settings, 'QUERY_BUDGETS', {})
+        budget = getattr(view, 'query_budget', budgets.get(name))
+        if budget is not None:
+            request._query_budget = budget
+        request._query_budget_view = name
+        return None
+
+    def check_budget(self, request, counter):
+        budget = request._query_budget
+        if budget is None or counter.count <= budget:
+            return
+        message = '%s: %d queries (budget %d), %.2f ms, duplicates: %r' % (
+            request._query_budget_view or request.path, counter.count, budget,
+            counter.duration * 1000, counter.duplicates,
+        )
+        if getattr(settings, 'QUERY_BUDGET_RAISE', False):
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+"""
+Закрепление чтения за primary.
+
+
+ReplicaPinningMiddleware вместе с config.router.ReplicaRouter обеспечивает 
+read-your-writes между запросами: после записи клиент получает cookie со 
+временем, до которого его чтение идет в primary. Должен стоять в MIDDLEWARE 
+раньше middleware, которые обращаются к БД.
+Cookie подписана (set_signed_cookie), а время из нее ограничено max_pin_seconds,
+чтобы клиент не мог закрепить свое чтение за primary навсегда.
+"""
+
+
+import math
+
+from config.router import ReplicaRouter, end_pin, get_pin, start_pin
+
+
+class ReplicaPinningMiddleware:
+    cookie_name = 'db_pinned_until'
+    cookie_salt = 'config.middleware.ReplicaPinningMiddleware'
+    max_pin_seconds = ReplicaRouter.pin_seconds
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def get_pinned_until(self, request):
+        try:
+            pinned_until = float(request.get_signed_cookie(
+                self.cookie_name, default=0, salt=self.cookie_salt,
+                max_age=self.max_pin_seconds,
+            ))
+        except ValueError:
+            return 0
+        if not math.isfinite(pinned_until):
+            return 0
+        return min(pinned_until, time.time() + self.max_pin_seconds)
+
+    def __call__(self, request):
+        pinned_until = self.get_pinned_until(request)
+        token = start_pin(pinned_until)
+        try:
+            response = self.get_response(request)
+            until = get_pin()['until']
+        finally:
+            end_pin(token)
+        if until > pinned_until and until > time.time():
+            response.set_signed_cookie(
+                self.cookie_name, str(until), salt=self.cookie_salt,
+                max_age=math.ceil(until - time.time()), httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,238 @@
+"""
+Раздел: Connection pooling (Пул соединений с БД)
+
+
+Django держит одно соединение на поток и закрывает его в конце запроса
+(CONN_MAX_AGE = 0) или переиспользует только в том же потоке (CONN_MAX_AGE > 0).
+PooledDatabaseWrapperMixin заменяет открытие и закрытие соединения на выдачу
+и возврат соединения из общего для всех потоков процесса пула.
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'config.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 0,  # соединение возвращается в пул в конце запроса
+        'OPTIONS': {
+            'pool': {
+                'min_size': 2,          # соединений создается сразу
+                'max_size': 10,         # постоянных соединений
+                'max_overflow': 5,      # временных, закрываются при возврате
+                'timeout': 30,          # ожидание свободного соединения, сек
+                'health_check_interval': 30,  # SELECT 1 перед выдачей после простоя
+                'max_lifetime': 3600,   # пересоздание старых соединений
+            },
+        },
+    },
+}
+
+Для другой СУБД достаточно пакета с base.py:
+from django.db.backends.postgresql import base
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    pass
+
+Соединение берется из пула в connect() и возвращается в close(), поэтому пул
+работает и в потоках sync_to_async(thread_sensitive=True) при ASGI: Django
+закрывает соединения по сигналу request_finished в том же потоке.
+
+Метрики: connections['default'].pool.stats()
+"""
+
+
+import os
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class PooledConnection:
+    def __init__(self, connection, overflow):
+        self.connection = connection
+        self.overflow = overflow
+        self.created_at = self.used_at = time.monotonic()
+
+
+class ConnectionPool:
+    def __init__(self, connect, min_size=0, max_size=10, max_overflow=0, timeout=30,
+                 health_check_interval=30, max_lifetime=None):
+        self.connect = connect
+        self.min_size, self.max_size, self.max_overflow = min_size, max_size, max_overflow
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.max_lifetime = max_lifetime
+        self.condition = threading.Condition()
+        self.idle = []
+        self.in_use = {}
+        self.size = 0
+        self.overflow = 0
+        self.pid = os.getpid()
+        self.metrics = {
+            'created': 0, 'closed': 0, 'checkouts': 0, 'waits': 0, 'wait_time': 0.0,
+            'max_wait_time': 0.0, 'timeouts': 0, 'health_check_failures': 0,
+        }
+        for _ in range(min_size):
+            self.idle.append(self._create(overflow=False))
+
+    def _create(self, overflow):
+        connection = self.connect()
+        self.metrics['created'] += 1
+        if overflow:
+            self.overflow += 1
+        else:
+            self.size += 1
+        return PooledConnection(connection, overflow)
+
+    def _discard(self, pooled):
+        if pooled.overflow:
+            self.overflow -= 1
+        else:
+            self.size -= 1
+        self.metrics['closed'] += 1
+        try:
+            pooled.connection.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, pooled):
+        now = time.monotonic()
+        if self.max_lifetime is not None and now - pooled.created_at > self.max_lifetime:
+            return False
+        if self.health_check_interval is not None and now - pooled.used_at > self.health_check_interval:
+            try:
+                pooled.connection.cursor().execute('SELECT 1')
+            except Exception:
+                self.metrics['health_check_failures'] += 1
+                return False
+        return True
+
+    def acquire(self):
+        started = time.monotonic()
+        waited = False
+        with self.condition:
+            while True:
+                while self.idle:
+                    pooled = self.idle.pop()
+                    if self._is_healthy(pooled):
+                        break
+                    self._discard(pooled)
+                else:
+                    pooled = None
+                if pooled is None:
+                    if self.size < self.max_size:
+                        pooled = self._create(overflow=False)
+                    elif self.overflow < self.max_overflow:
+                        pooled = self._create(overflow=True)
+                if pooled is not None:
+                    break
+                remaining = self.timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    self.metrics['timeouts'] += 1
+                    raise PoolTimeout(
+                        'No connection available in %s seconds (size %s, overflow %s).'
+                        % (self.timeout, self.size, self.overflow)
+                    )
+                waited = True
+                self.condition.wait(remaining)
+            self.metrics['checkouts'] += 1
+            if waited:
+                wait_time = time.monotonic() - started
+                self.metrics['waits'] += 1
+                self.metrics['wait_time'] += wait_time
+                self.metrics['max_wait_time'] = max(self.metrics['max_wait_time'], wait_time)
+            self.in_use[id(pooled.connection)] = pooled
+            return pooled.connection
+
+    def release(self, connection, discard=False):
+        with self.condition:
+            pooled = self.in_use.pop(id(connection), None)
+            if pooled is None:
+                connection.close()
+                return
+            if discard or pooled.overflow:
+                self._discard(pooled)
+            else:
+                pooled.used_at = time.monotonic()
+                self.idle.append(pooled)
+            self.condition.notify()
+
+    def close(self):
+        with self.condition:
+            while self.idle:
+                self._discard(self.idle.pop())
+
+    def stats(self):
+        with self.condition:
+            return {
+                'size': self.size, 'overflow': self.overflow,
+                'idle': len(self.idle), 'in_use': len(self.in_use),
+                **self.metrics,
+            }
+
+
+# Пулы процесса по псевдониму и параметрам подключения.
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(key, connect, options):
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool.pid != os.getpid():
+            # После fork соединения родителя не используются.
+            pool = _pools[key] = ConnectionPool(connect, **options)
+        return pool
+
+
+def close_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+class PooledDatabaseWrapperMixin:
+    @property
+    def pool_options(self):
+        return self.settings_dict['OPTIONS'].get('pool', {})
+
+    @property
+    def pool(self):
+        key = (self.alias, str(self.settings_dict['NAME']), self.settings_dict.get('HOST'))
+        conn_params = self.get_connection_params()
+        return get_pool(
+            key, lambda: super(PooledDatabaseWrapperMixin, self).get_new_connection(conn_params),
+            self.pool_options,
+        )
+
+    def get_connection_params(self):
+        settings_dict = self.settings_dict
+        options = settings_dict['OPTIONS']
+        if 'pool' not in options:
+            return super().get_connection_params()
+        # Параметры пула не передаются драйверу БД.
+        self.settings_dict = {**settings_dict, 'OPTIONS': {k: v for k, v in options.items() if k != 'pool'}}
+        try:
+            return super().get_connection_params()
+        finally:
+            self.settings_dict = settings_dict
+
+    def get_new_connection(self, conn_params):
+        try:
+            return self.pool.acquire()
+        except PoolTimeout as e:
+            raise self.Database.OperationalError(str(e)) from e
+
+    def _close(self):
+        if self.connection is None:
+            return
+        # Соединение внутри atomic() останется у обертки (closed_in_transaction),
+        # поэтому в пул оно не возвращается.
+        discard = self.in_atomic_block
+        if not discard:
+            try:
+                self.connection.rollback()
+            except self.Database.Error:
+                discard = True
+        self.pool.release(self.connection, discard=discard)
@@ -85,4 +85,227 @@ class PrimaryReplicaRouter:
 
 Добавляем в настройки маршрутизаторы (порядок важен):
 DATABASE_ROUTERS = ["path.to.AuthRouter", "path.to.PrimaryReplicaRouter"]
-"""
\ No newline at end of file
+"""
+
+"""
+Маршрутизатор primary/replica для продакшена.
+
+
+ReplicaRouter:
+1. Выбирает реплику случайно с весом weight / latency, где latency - 
+   экспоненциальное среднее времени запросов к реплике (измеряется 
+   execute_wrapper на каждом соединении реплики).
+2. Отключает реплику после failure_threshold ошибок подряд (circuit breaker).
+   Через recovery_timeout секунд реплика получает один пробный запрос.
+3. Исключает реплики с отставанием больше max_lag секунд. Отставание 
+   проверяется не чаще раза в lag_check_interval секунд (measure_lag()).
+4. После любой записи направляет чтение в primary на pin_seconds секунд
+   (read-your-writes). Вместе с ReplicaPinningMiddleware (config/middleware.py)
+   закрепление действует для клиента между запросами.
+
+Если подходящих реплик нет, чтение идет в primary.
+
+class MyRouter(ReplicaRouter):
+    primary = "primary"
+    replicas = {"replica1": 2, "replica2": 1}  # псевдоним: вес
+
+DATABASE_ROUTERS = ["path.to.MyRouter"]
+"""
+
+
+import contextvars
+import random
+import threading
+import time
+
+from django.db import InterfaceError, OperationalError, connections
+from django.db.backends.signals import connection_created
+
+
+# Время до которого чтение закреплено за primary. Хранится в изменяемом словаре,
+# чтобы запись из любого контекста (потока sync_to_async) была видна запросу.
+_pin = contextvars.ContextVar('replica_router_pin', default=None)
+_thread_pin = threading.local()
+
+
+def get_pin():
+    pin = _pin.get()
+    if pin is None:
+        pin = getattr(_thread_pin, 'pin', None)
+        if pin is None:
+            pin = _thread_pin.pin = {'until': 0}
+    return pin
+
+
+def start_pin(until=0):
+    """Начинает новое закрепление (на время запроса). Возвращает токен для end_pin()."""
+    return _pin.set({'until': until})
+
+
+def end_pin(token):
+    _pin.reset(token)
+
+
+def pin_primary(seconds):
+    pin = get_pin()
+    pin['until'] = max(pin['until'], time.time() + seconds)
+
+
+def is_pinned():
+    return get_pin()['until'] > time.time()
+
+
+class ReplicaState:
+    def __init__(self, weight):
+        self.weight = weight
+        self.latency = None
+        self.lag = 0
+        self.failures = 0
+        self.opened_at = None
+
+
+class ReplicaRouter:
+    primary = 'default'
+    # Псевдоним реплики: вес.
+    replicas = {}
+    pin_seconds = 5
+    max_lag = 10
+    lag_check_interval = 5
+    failure_threshold = 3
+    recovery_timeout = 30
+    # Коэффициент экспоненциального среднего задержки.
+    latency_alpha = 0.2
+    # Нижняя граница задержки, чтобы одна быстрая реплика не забирала все чтение.
+    min_latency = 0.001
+    clock = staticmethod(time.monotonic)
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.state = {alias: ReplicaState(weight) for alias, weight in self.replicas.items()}
+        self.lag_checked_at = None
+        connection_created.connect(
+            self.connection_created, weak=False, dispatch_uid=('replica-router', id(self))
+        )
+        for alias in self.replicas:
+            # Соединение могло быть открыто до создания маршрутизатора.
+            if connections[alias].connection is not None:
+                self.connection_created(None, connections[alias])
+
+    def connection_created(self, sender, connection, **kwargs):
+        if connection.alias in self.state:
+            if not any(isinstance(w, QueryTimer) for w in connection.execute_wrappers):
+                connection.execute_wrappers.append(QueryTimer(self, connection.alias))
+
+    # Учет задержек и ошибок.
+    def record_success(self, alias, duration):
+        with self.lock:
+            state = self.state[alias]
+            if state.latency is None:
+                state.latency = duration
+            else:
+                state.latency += self.latency_alpha * (duration - state.latency)
+            state.failures, state.opened_at = 0, None
+
+    def record_failure(self, alias, force_open=False):
+        with self.lock:
+            state = self.state[alias]
+            state.failures += 1
+            if force_open or state.failures >= self.failure_threshold:
+                state.opened_at = self.clock()
+
+    def is_available(self, alias):
+        state = self.state[alias]
+        if state.lag > self.max_lag:
+            return False
+        return state.opened_at is None or self.clock() - state.opened_at >= self.recovery_timeout
+
+    # Отставание реплик.
+    def measure_lag(self, alias):
+        """Возвращает отставание реплики alias в секундах."""
+        connection = connections[alias]
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    'SELECT COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)'
+                )
+                return float(cursor.fetchone()[0])
+            if connection.vendor == 'mysql':
+                cursor.execute('SHOW REPLICA STATUS')
+                row = cursor.fetchone()
+                if row is None:
+                    return 0
+                columns = [column[0] for column in cursor.description]
+                return float(dict(zip(columns, row))['Seconds_Behind_Source'] or 0)
+        return 0
+
+    def check_lag(self):
+        now = self.clock()
+        if self.lag_checked_at is not None and now - self.lag_checked_at < self.lag_check_interval:
+            return
+        # Проверку выполняет один поток, остальные продолжают со старыми данными.
+        if not self.lock.acquire(blocking=False):
+            return
+        try:
+            self.lag_checked_at = now
+        finally:
+            self.lock.release()
+        for alias, state in self.state.items():
+            if state.opened_at is not None:
+                continue
+            try:
+                connections[alias].ensure_connection()
+                state.lag = self.measure_lag(alias)
+            except (OperationalError, InterfaceError):
+                # Реплика недоступна: отключается сразу, без накопления ошибок.
+                self.record_failure(alias, force_open=True)
+
+    def choose_replica(self):
+        self.check_lag()
+        candidates, weights = [], []
+        with self.lock:
+            for alias, state in self.state.items():
+                if self.is_available(alias):
+                    candidates.append(alias)
+                    weights.append(state.weight / max(state.latency or 0, self.min_latency))
+            if not candidates:
+                return self.primary
+            alias = random.choices(candidates, weights)[0]
+            state = self.state[alias]
+            if state.opened_at is not None:
+                # Полуоткрытое состояние: один пробный запрос. До его успеха
+                # (record_success) реплика снова отключена на recovery_timeout.
+                state.opened_at = self.clock()
+            return alias
+
+    def db_for_read(self, model, **hints):
+        if is_pinned():
+            return self.primary
+        return self.choose_replica()
+
+    def db_for_write(self, model, **hints):
+        pin_primary(self.pin_seconds)
+        return self.primary
+
+    def allow_relation(self, obj1, obj2, **hints):
+        db_set = {self.primary, *self.replicas}
+        if obj1._state.db in db_set and obj2._state.db in db_set:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return True
+
+
+class QueryTimer:
+    def __init__(self, router, alias):
+        self.router, self.alias = router, alias
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            result = execute(sql, params, many, context)
+        except (OperationalError, InterfaceError):
+            self.router.record_failure(self.alias)
+            raise
+        self.router.record_success(self.alias, time.perf_counter() - start)
+        return result
@@ -57,12 +57,48 @@ APPEND_SLASH = True
 CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
-    }
+    },
+    # Общий для всех процессов кэш счетчиков тротлинга (в production - Redis или Memcached).
+    "throttle": {
+        "BACKEND": "config.cache.SQLiteCache",
+        "LOCATION": BASE_DIR / "throttle.sqlite3",
+    },
+    # Общий кэш страниц (L2) и двухуровневый кэш поверх него с защитой от
+    # одновременного пересчета (config/cache.py). В 'pages' кэшируются страницы
+    # (CACHE_MIDDLEWARE_ALIAS) и версии их тегов (dja/cache.py).
+    # В 'shared' также хранятся данные, которые должны быть видны всем процессам:
+    # токены (drf/authentication.py), версия списка блокировки (drf/permissions.py),
+    # разрешения пользователей и хеши паролей до фонового пересчета (aut/models.py).
+    # Их можно потерять: caches['pages'].clear() очищает весь 'shared', после этого
+    # данные читаются из БД, а версии начинаются заново.
+    "shared": {
+        "BACKEND": "config.cache.SQLiteCache",
+        "LOCATION": BASE_DIR / "cache.sqlite3",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+    "pages": {
+        "BACKEND": "config.cache.TieredCache",
+        "LOCATION": "shared",
+        "TIMEOUT": 600,
+        "OPTIONS": {
+            "L1_MAX_SIZE": 32 * 1024 * 1024,
+            "L1_TIMEOUT": 5,
+            "STALE_TIMEOUT": 60,
+        },
+    },
+    # Время изменения групп обьектов для ETag/Last-Modified (dja/decorators.py).
+    # Отдельный файл: очистка 'pages' не сбрасывает время, а вытеснение записей
+    # страниц при MAX_ENTRIES его не затрагивает.
+    "last_modified": {
+        "BACKEND": "config.cache.SQLiteCache",
+        "LOCATION": BASE_DIR / "last_modified.sqlite3",
+        "OPTIONS": {"MAX_ENTRIES": 100000},
+    },
 }
 
 
 # Псевдоним кэша, который будет использоваться.
-CACHE_MIDDLEWARE_ALIAS = 'default'
+CACHE_MIDDLEWARE_ALIAS = 'pages'
 
 
 # Имя сайта или другая строка, уникальная для этого экземпляра Django, чтобы 
@@ -138,6 +174,7 @@ CSRF_TRUSTED_ORIGINS = []
 # DISABLE_SERVER_SIDE_CURSORS - отключить ли использование курсоров на стороне сервера. По умолчанию False.
 # USER - имя пользователя БД. По умолчанию ''.
 # TEST - Словарь настроек тестовых баз. По умолчанию {}.
+# Пул соединений: ENGINE 'config.backends.sqlite3' и OPTIONS['pool'] (см. config/pool.py).
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
@@ -378,6 +415,7 @@ INSTALLED_APPS = [
 
     'dja',
     'drf',
+    'aut',
 ]
 
 
@@ -473,6 +511,8 @@ MIDDLEWARE = [
 
     # Подключение кастомного middleware
     'config.middleware.SimpleMiddleware',
+    # Подсчет запросов к БД и контроль бюджета запросов представлений
+    'config.middleware.QueryBudgetMiddleware',
 ]
 
 
@@ -494,6 +534,25 @@ NUMBER_GROUPING = 0
 PREPEND_WWW = False
 
 
+# Бюджет запросов к БД на один запрос для QueryBudgetMiddleware. None - без ограничений.
+QUERY_BUDGET_DEFAULT = None
+
+
+# Бюджеты запросов для отдельных представлений (полный путь к представлению: кол-во запросов).
+# Атрибут представления query_budget имеет приоритет.
+QUERY_BUDGETS = {
+    'dja.views.BlogListView': 5,
+    'dja.views.CustomListView': 5,
+    'drf.views.PostListAPIView': 5,
+    'drf.views.CustomListAPIView': 5,
+    'drf.views.UserList2': 5,
+}
+
+
+# Вызывать ли QueryBudgetExceeded при превышении бюджета. Если False, то только WARNING в лог.
+QUERY_BUDGET_RAISE = False
+
+
 # Полный путь корневой конфигурации URL.
 ROOT_URLCONF = 'config.urls' # По умолчанию None
 
@@ -622,7 +681,8 @@ TEMPLATES = [
 
 
 # Имя класса для запуска набора тестов.
-TEST_RUNNER = 'django.test.runner.DiscoverRunner'
+# config.test_runner переносит файлы SQLiteCache во временный каталог.
+TEST_RUNNER = 'config.test_runner.DiscoverRunner'
 
 
 # Список приложений для отключения отката после проведения тестирования.
@@ -1,4 +1,4 @@
-from django.core.checks import Error, register, Tags
+from django.core.checks import Error, Warning, register, Tags
 
 
 """
@@ -12,6 +12,16 @@ from django.core.checks import Error, register, Tags
 TODO
 Список всех проверок:
 https://docs.djangoproject.com/en/5.0/ref/checks/
+
+
+index_check - предупреждает о полях без индекса, по которым фильтруют или сортируют:
+- config.W001 - DRF filterset_fields и filterset_class.Meta.fields представлений из URLconf;
+- config.W002 - ordering представлений и пагинации, DRF ordering_fields и Meta.ordering моделей;
+- config.W003 - date_field архивных представлений.
+Поле считается проиндексированным, если оно первичный ключ, unique, db_index (в т.ч. ForeignKey)
+или первая колонка индекса из Meta.indexes, unique_together или UniqueConstraint без condition.
+Для сортировки по нескольким полям нужен индекс, который начинается с этих полей.
+Meta.ordering проверяется только у моделей проекта (приложения в BASE_DIR).
 """
 
 
@@ -50,4 +60,174 @@ def my_check(app_configs, **kwargs):
 # Регистрация проверок развертывания для производственных настроек.
 @register(Tags.security, deploy=True)
 def my_check(app_configs, **kwargs):
-    pass
+    return []
+
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db.models import QuerySet, UniqueConstraint
+from django.urls import URLPattern, URLResolver, get_resolver
+
+
+def iter_view_classes(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_view_classes(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern):
+            # Django as_view() сохраняет класс в view_class, DRF - в cls.
+            view_class = getattr(pattern.callback, 'view_class', None) or getattr(
+                pattern.callback, 'cls', None
+            )
+            if view_class is not None:
+                yield view_class
+
+
+def get_view_model(view_class):
+    queryset = getattr(view_class, 'queryset', None)
+    if isinstance(queryset, QuerySet):
+        return queryset.model
+    return getattr(view_class, 'model', None)
+
+
+def as_list(value):
+    if not value or value == '__all__':
+        return []
+    if isinstance(value, str):
+        return [value]
+    # filterset_fields может быть словарем {поле: [lookup, ...]}.
+    return list(value)
+
+
+def resolve_field(model, path):
+    # 'publisher__name' -> (Publisher, 'name'). None, если это не колонка.
+    parts = path.lstrip('-').split('__')
+    try:
+        for part in parts[:-1]:
+            model = model._meta.get_field(part).related_model
+            if model is None:
+                return None
+        field = model._meta.get_field(parts[-1])
+    except FieldDoesNotExist:
+        return None
+    if not field.concrete or field.many_to_many:
+        return None
+    return model, field.name
+
+
+def index_prefixes(model):
+    opts = model._meta
+    indexes = [
+        [opts.get_field(name.lstrip('-')).name for name in index.fields]
+        for index in opts.indexes if index.fields and index.condition is None
+    ]
+    indexes += [list(fields) for fields in opts.unique_together]
+    indexes += [
+        list(constraint.fields) for constraint in opts.constraints
+        if isinstance(constraint, UniqueConstraint) and constraint.fields
+        and constraint.condition is None
+    ]
+    indexes += [
+        [field.name] for field in opts.concrete_fields
+        if field.primary_key or field.unique or field.db_index
+    ]
+    return indexes
+
+
+def is_covered(model, fields):
+    first = model._meta.get_field(fields[0])
+    if first.primary_key or first.unique:
+        return True
+    return any(index[:len(fields)] == fields for index in index_prefixes(model))
+
+
+def collect_columns(model, paths):
+    # Группы колонок для проверки: поля одной модели подряд (для сортировки
+    # по нескольким полям) или по одному.
+    groups = []
+    for path in paths:
+        if not isinstance(path, str) or path == '?':
+            continue
+        resolved = resolve_field(model, path)
+        if resolved is None:
+            continue
+        if groups and groups[-1][0] is resolved[0]:
+            groups[-1][1].append(resolved[1])
+        else:
+            groups.append((resolved[0], [resolved[1]]))
+    return groups
+
+
+def is_project_app(app_config):
+    return str(app_config.path).startswith(str(settings.BASE_DIR))
+
+
+INDEX_CHECK_MESSAGES = {
+    'config.W001': 'Фильтр по %s без индекса: %s.',
+    'config.W002': 'Сортировка по %s без индекса: %s.',
+    'config.W003': 'date_field %s без индекса: %s.',
+}
+
+
+@register(Tags.models, Tags.urls)
+def index_check(app_configs, **kwargs):
+    # (id, модель, поля) -> источники, чтобы одно поле из нескольких представлений
+    # давало одно предупреждение.
+    found = {}
+
+    def add(check_id, model, paths, source, multi_column=False):
+        for column_model, fields in collect_columns(model, paths):
+            groups = [fields] if multi_column else [[field] for field in fields]
+            for group in groups:
+                if not is_covered(column_model, group):
+                    found.setdefault((check_id, column_model, tuple(group)), []).append(source)
+
+    try:
+        view_classes = list(dict.fromkeys(iter_view_classes(get_resolver().url_patterns)))
+    except (ImportError, ImproperlyConfigured):
+        # Ошибки URLconf сообщают проверки Django (urls.E*).
+        view_classes = []
+
+    for view_class in view_classes:
+        model = get_view_model(view_class)
+        source = '%s.%s' % (view_class.__module__, view_class.__qualname__)
+        filterset_class = getattr(view_class, 'filterset_class', None)
+        filterset_meta = getattr(filterset_class, '_meta', None)
+        if filterset_meta is not None and filterset_meta.model is not None:
+            add('config.W001', filterset_meta.model, as_list(filterset_meta.fields), source)
+        if model is None:
+            continue
+        add('config.W001', model, as_list(getattr(view_class, 'filterset_fields', None)), source)
+        add('config.W002', model, as_list(getattr(view_class, 'ordering_fields', None)), source)
+        add('config.W002', model, as_list(getattr(view_class, 'ordering', None)), source, True)
+        pagination_class = getattr(view_class, 'pagination_class', None)
+        add('config.W002', model, as_list(getattr(pagination_class, 'ordering', None)), source, True)
+        add('config.W003', model, as_list(getattr(view_class, 'date_field', None)), source)
+
+    for app_config in app_configs or apps.get_app_configs():
+        if not is_project_app(app_config):
+            continue
+        for model in app_config.get_models():
+            add('config.W002', model, list(model._meta.ordering), '%s.Meta.ordering' % model._meta.label, True)
+
+    labels = {app_config.label for app_config in app_configs} if app_configs else None
+    errors = []
+    for (check_id, model, fields), sources in found.items():
+        if labels is not None and model._meta.app_label not in labels:
+            continue
+        columns = ', '.join(fields)
+        if len(fields) == 1:
+            hint = 'Добавьте db_index=True полю %s или models.Index(fields=[%r]) в %s.Meta.indexes.' % (
+                fields[0], fields[0], model.__name__
+            )
+        else:
+            hint = 'Добавьте models.Index(fields=%r) в %s.Meta.indexes.' % (list(fields), model.__name__)
+        errors.append(
+            Warning(
+                INDEX_CHECK_MESSAGES[check_id] % (columns, ', '.join(dict.fromkeys(sources))),
+                hint=hint,
+                obj=model,
+                id=check_id,
+            )
+        )
+    return errors
@@ -0,0 +1,39 @@
+"""
+Раздел: Test runner (Запуск тестов)
+
+
+Кэши SQLiteCache общие для всех процессов сервера (config/cache.py): в них лежат
+версии списка блокировки, токены, разрешения пользователей и т.д. Записи ссылаются
+на id обьектов, поэтому тесты не должны читать кэш сервера разработки и оставлять в
+нем записи тестовой БД. DiscoverRunner на время тестов переносит файлы всех
+SQLiteCache во временный каталог, который удаляется после тестов.
+
+TEST_RUNNER = 'config.test_runner.DiscoverRunner'
+"""
+
+
+import os
+import tempfile
+
+from django.conf import settings
+from django.test import override_settings
+from django.test import runner
+
+
+class DiscoverRunner(runner.DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_dir = tempfile.TemporaryDirectory()
+        caches = {}
+        for alias, params in settings.CACHES.items():
+            params = dict(params)
+            if params['BACKEND'] == 'config.cache.SQLiteCache':
+                params['LOCATION'] = os.path.join(self.cache_dir.name, '%s.sqlite3' % alias)
+            caches[alias] = params
+        self.cache_settings = override_settings(CACHES=caches)
+        self.cache_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_settings.disable()
+        self.cache_dir.cleanup()
+        super().teardown_test_environment(**kwargs)
@@ -13,4 +13,16 @@ class DJAConfig(AppConfig):
         # Обычное подключение сигналов
         # request_finished.connect(signals.my_callback)
 
+        # Сброс кэша представлений по тегам.
+        from . import cache
+
+        # Время изменения для condition().
+        from . import decorators
+
+        # Сводная таблица дат для архивных представлений.
+        from . import rollups
+
+        # Проверка индексов для фильтров и сортировок (python manage.py check).
+        from config import system_check
+
         return super().ready()
\ No newline at end of file
@@ -0,0 +1,223 @@
+"""
+Раздел: Tagged view cache (Кэширование представлений с тегами).
+
+
+cache_page кэширует ответ на заданное время и не знает, какие данные он содержит,
+поэтому после изменения Author страница остается устаревшей до истечения таймаута.
+
+cache_view(timeout, tags) и CachedViewMixin помечают ответ тегами моделей, которые
+он читает. Тег - это модель, QuerySet (берется его модель), экземпляр модели или строка
+из model_tag()/instance_tag().
+
+У каждого тега есть версия в кэше. Ключ ответа строится из URL и версий всех его тегов,
+поэтому для сброса достаточно увеличить версию тега - старые записи больше не будут
+найдены и истекут сами. Версии всех тегов читаются одним get_many().
+
+post_save, post_delete и m2m_changed увеличивают версию тега модели и тега экземпляра:
+- 'dja.author' - сбрасывает все ответы, помеченные моделью Author (списки);
+- 'dja.author:5' - только ответы, помеченные этим экземпляром (детали).
+QuerySet.update(), bulk_create() и raw SQL сигналы не отправляют, после них нужно вызвать
+invalidate_tags(Author) вручную.
+
+post_delete подключается только к моделям из тегов при импорте представлений:
+обработчик для всех моделей отключил бы быстрое удаление (fast delete) связанных
+обьектов во всем проекте. Если tags - функция, ее модели передаются в models, иначе
+удаление в процессе, который еще не выполнил это представление, ничего не сбросит.
+
+Версии тегов и ответы хранятся в кэше CACHE_MIDDLEWARE_ALIAS ('pages' - TieredCache
+поверх общего SQLiteCache). Версии - целые числа, TieredCache хранит их только в L2,
+поэтому сброс в одном процессе сразу виден всем остальным.
+
+@cache_view(60 * 60 * 24, tags=[Author])
+def authors(request):
+    ...
+
+@cache_view(60 * 60, tags=lambda request, pk: [instance_tag(Author, pk)], models=[Author])
+def author(request, pk):
+    ...
+
+class BlogListView(CachedViewMixin, generic.ListView):
+    model = Blog
+    cache_timeout = 60 * 60 * 24
+"""
+
+
+import hashlib
+import time
+from functools import wraps
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Model, QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+
+TAG_VERSION_PREFIX = 'view-cache-tag:'
+VIEW_CACHE_PREFIX = 'view-cache:'
+
+
+def get_cache():
+    return caches[settings.CACHE_MIDDLEWARE_ALIAS]
+
+
+def model_tag(model):
+    return model._meta.label_lower
+
+
+def instance_tag(model, pk):
+    return '%s:%s' % (model._meta.label_lower, pk)
+
+
+def get_tags(objs):
+    tags = set()
+    for obj in objs:
+        if isinstance(obj, str):
+            tags.add(obj)
+        elif isinstance(obj, QuerySet):
+            tags.add(model_tag(obj.model))
+        elif isinstance(obj, Model):
+            tags.add(instance_tag(type(obj), obj.pk))
+        else:
+            tags.add(model_tag(obj))
+    return sorted(tags)
+
+
+def get_tag_models(objs):
+    models = set()
+    for obj in objs:
+        if isinstance(obj, str):
+            models.add(apps.get_model(obj.split(':')[0]))
+        elif isinstance(obj, QuerySet):
+            models.add(obj.model)
+        elif isinstance(obj, Model):
+            models.add(type(obj))
+        elif obj is not None:
+            models.add(obj)
+    return models
+
+
+# Модели, к которым подключен post_delete.
+tracked_models = set()
+
+
+def track_models(objs):
+    for model in get_tag_models(objs) - tracked_models:
+        post_delete.connect(
+            invalidate_instance, sender=model,
+            dispatch_uid='view_cache_post_delete:%s' % model_tag(model)
+        )
+        tracked_models.add(model)
+
+
+def get_tag_versions(tags):
+    cache = get_cache()
+    keys = [TAG_VERSION_PREFIX + tag for tag in tags]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Начальная версия - время в мс, чтобы после вытеснения ключа
+            # версия не начиналась заново и не совпала со старыми записями.
+            cache.add(key, time.time_ns() // 1000000, None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def invalidate_tags(*objs):
+    cache = get_cache()
+    for tag in get_tags(objs):
+        try:
+            cache.incr(TAG_VERSION_PREFIX + tag)
+        except ValueError:
+            # Версии нет, значит и записей с этим тегом нет.
+            pass
+
+
+def view_cache_key(request, tags):
+    versions = get_tag_versions(tags)
+    url = hashlib.md5(request.build_absolute_uri().encode(), usedforsecurity=False)
+    stamp = ';'.join('%s=%s' % item for item in zip(tags, versions))
+    stamp = hashlib.md5(stamp.encode(), usedforsecurity=False)
+    return '%s%s.%s' % (VIEW_CACHE_PREFIX, url.hexdigest(), stamp.hexdigest())
+
+
+def cache_response(request, tags, timeout, get_response):
+    # Кэшируются только GET/HEAD запросы и успешные ответы без cookie.
+    if request.method not in ('GET', 'HEAD'):
+        return get_response()
+    cache = get_cache()
+    track_models(tags)
+    key = view_cache_key(request, get_tags(tags))
+    response = cache.get(key)
+    if response is not None:
+        return response
+
+    def store(response):
+        if response.status_code == 200 and not response.streaming and not response.cookies:
+            cache.set(key, response, timeout)
+
+    response = get_response()
+    if hasattr(response, 'render') and callable(response.render):
+        response.add_post_render_callback(store)
+    else:
+        store(response)
+    return response
+
+
+def cache_view(timeout, tags=(), models=()):
+    # tags - список тегов или функция (request, *args, **kwargs), возвращающая его.
+    # models - модели тегов, которые возвращает функция.
+    if callable(tags) and not models:
+        raise ImproperlyConfigured('cache_view() с функцией tags требует models.')
+
+    def decorator(view_func):
+        track_models(models if callable(tags) else tags)
+
+        @wraps(view_func)
+        def _wrapper_view(request, *args, **kwargs):
+            view_tags = tags(request, *args, **kwargs) if callable(tags) else tags
+            return cache_response(
+                request, view_tags, timeout,
+                lambda: view_func(request, *args, **kwargs)
+            )
+        return _wrapper_view
+    return decorator
+
+
+class CachedViewMixin:
+    cache_timeout = None
+    cache_tags = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        track_models(cls.cache_tags or [getattr(cls, 'queryset', None), getattr(cls, 'model', None)])
+
+    def get_cache_tags(self):
+        # По умолчанию ответ помечается моделью представления.
+        if self.cache_tags is not None:
+            return self.cache_tags
+        if getattr(self, 'queryset', None) is not None:
+            return [self.queryset]
+        return [self.model]
+
+    def dispatch(self, request, *args, **kwargs):
+        return cache_response(
+            request, self.get_cache_tags(), self.cache_timeout,
+            lambda: super(CachedViewMixin, self).dispatch(request, *args, **kwargs)
+        )
+
+
+@receiver(post_save, dispatch_uid='view_cache_post_save')
+def invalidate_instance(sender, instance, **kwargs):
+    invalidate_tags(sender, instance)
+
+
+@receiver(m2m_changed, dispatch_uid='view_cache_m2m_changed')
+def invalidate_m2m(sender, instance, action, model, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    tags = [sender, type(instance), instance, model]
+    tags += [instance_tag(model, pk) for pk in pk_set or ()]
+    invalidate_tags(*tags)
@@ -20,9 +20,109 @@ def latest_entry(request, blog_id):
 @condition(last_modified_func=latest_entry)
 def front_page(request, blog_id):
     pass
-    
+
+latest_entry выполняет запрос при каждом условном GET, даже если ответ 304.
+LastModifiedRegistry хранит время последнего изменения группы обьектов (blog_id -> timestamp)
+в кэше и обновляет его по сигналам post_save/post_delete модели. Функции
+last_modified_func() и etag_func() читают только кэш, поэтому 304 отдается без запросов к БД:
+
+entry_last_modified = LastModifiedRegistry(Entry, 'blog')
+
+@condition(
+    etag_func=entry_last_modified.etag_func('blog_id'),
+    last_modified_func=entry_last_modified.last_modified_func('blog_id'),
+)
+def front_page(request, blog_id):
+    pass
+
+Если записи в кэше нет, временем изменения считается текущее время (без запроса к БД),
+поэтому после очистки кэша клиенты один раз получат полный ответ вместо 304.
+QuerySet.update() и bulk_create() сигналы не отправляют, после них нужно вызвать touch().
+Если обьект перенесен в другую группу (Entry в другой блог), обновляются обе группы:
+прежнее значение берется из TrackedFieldsModel.old_value() (dja/models.py) без запроса.
+Время хранится в общем для всех процессов кэше ('last_modified'): в LocMemCache каждый
+процесс видел бы только свои изменения и продолжал отдавать 304. Кэш отдельный от L2 кэша
+страниц ('shared'), т.к. caches['pages'].clear() очищает весь L2.
+
 
 - django.contrib.auth.decorators.login_required(redirect_field_name='next', login_url=None) - Если пользователь не вошел в систему, то редирект LOGIN_URL.
 - django.contrib.auth.decorators.user_passes_test(test_func, login_url=None, redirect_field_name='next') - Запускает функцию test_func и если она возвращает False, то выполняется перенаправление на LOGIN_URL.
 - django.contrib.auth.decorators.permission_required(perm, login_url=None, raise_exception=False) - проверка наличия у пользователя разрешения.
 """
+
+
+import datetime
+import time
+
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from .models import Entry, TrackedFieldsModel
+
+
+class LastModifiedRegistry:
+    def __init__(self, model, group_field, cache_alias='last_modified', timeout=None):
+        if not issubclass(model, TrackedFieldsModel):
+            raise ImproperlyConfigured('%s должна наследовать TrackedFieldsModel.' % model._meta.label)
+        self.model = model
+        self.group_field = model._meta.get_field(group_field)
+        self.cache_alias = cache_alias
+        self.timeout = timeout
+        self.prefix = 'last-modified:%s.%s:' % (model._meta.label_lower, self.group_field.name)
+        uid = self.prefix + 'receiver'
+        post_save.connect(self.receiver, sender=model, weak=False, dispatch_uid=uid)
+        post_delete.connect(self.receiver, sender=model, weak=False, dispatch_uid=uid)
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def get(self, group_id):
+        key = self.prefix + str(group_id)
+        timestamp = self.cache.get(key)
+        if timestamp is None:
+            self.cache.add(key, time.time(), self.timeout)
+            timestamp = self.cache.get(key)
+        return timestamp
+
+    def touch(self, group_id):
+        self.cache.set(self.prefix + str(group_id), time.time(), self.timeout)
+
+    def receiver(self, sender, instance, **kwargs):
+        # Прежняя группа нужна, чтобы обновить и ее при переносе обьекта.
+        group_ids = {getattr(instance, self.group_field.attname)}
+        old = instance.old_value(self.group_field.attname)
+        if old is not None:
+            group_ids.add(old)
+        # Время обновляется сразу и еще раз после коммита, иначе запрос,
+        # пришедший до коммита, закэшировал бы старые данные с новым ETag.
+        def touch_all():
+            for group_id in group_ids:
+                self.touch(group_id)
+
+        touch_all()
+        transaction.on_commit(touch_all, using=kwargs.get('using'))
+
+    def last_modified(self, group_id):
+        return datetime.datetime.fromtimestamp(self.get(group_id), datetime.timezone.utc)
+
+    def etag(self, group_id):
+        return '%s-%s' % (group_id, int(self.get(group_id) * 1000000))
+
+    def _group_id(self, url_kwarg, args, kwargs):
+        return kwargs[url_kwarg] if url_kwarg in kwargs else args[0]
+
+    def last_modified_func(self, url_kwarg):
+        def func(request, *args, **kwargs):
+            return self.last_modified(self._group_id(url_kwarg, args, kwargs))
+        return func
+
+    def etag_func(self, url_kwarg):
+        def func(request, *args, **kwargs):
+            return self.etag(self._group_id(url_kwarg, args, kwargs))
+        return func
+
+
+entry_last_modified = LastModifiedRegistry(Entry, 'blog')
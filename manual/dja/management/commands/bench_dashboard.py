@@ -0,0 +1,71 @@
+import importlib
+import time
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models import QuerySet
+
+# async - ключевое слово, модуль импортируется по строке.
+dashboard = importlib.import_module('config.async')
+
+
+def run_query(query):
+    if isinstance(query, QuerySet):
+        return list(query)
+    return query()
+
+
+# Запросы config.async.DashboardView последовательно через
+# sync_to_async(thread_sensitive=True), как без gather_querysets(), и параллельно
+# через gather_querysets(). Данные - текущие строки БД, команда только читает.
+# --latency добавляет задержку к каждому запросу (execute_wrapper), как у БД
+# по сети: с локальным SQLite выигрыш от параллельности почти не виден.
+class Command(BaseCommand):
+    help = 'Сравнивает время запросов DashboardView последовательно и через gather_querysets.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=20)
+        parser.add_argument('--latency', type=float, default=0, help='мс на запрос')
+
+    def handle(self, *args, rounds, latency, **options):
+        view = dashboard.DashboardView()
+
+        async def sequential():
+            return [await sync_to_async(run_query)(query) for query in view.get_queries()]
+
+        async def concurrent():
+            return await dashboard.gather_querysets(*view.get_queries())
+
+        def add_latency(sender, connection, **kwargs):
+            def wrapper(execute, sql, params, many, context):
+                time.sleep(latency / 1000)
+                return execute(sql, params, many, context)
+            connection.execute_wrappers.append(wrapper)
+
+        def measure(func):
+            result = async_to_sync(func)()
+            started = time.perf_counter()
+            for _ in range(rounds):
+                async_to_sync(func)()
+            return result, (time.perf_counter() - started) / rounds
+
+        # Новые соединения всех потоков получают задержку.
+        connections.close_all()
+        connection_created.connect(add_latency)
+        try:
+            expected, sequential_time = measure(sequential)
+            result, concurrent_time = measure(concurrent)
+        finally:
+            connection_created.disconnect(add_latency)
+
+        if result != expected:
+            self.stderr.write('Результаты последовательных и параллельных запросов не совпадают.')
+        self.stdout.write(
+            'последовательно: %.1f мс, gather_querysets: %.1f мс '
+            '(%d запроса, задержка %.1f мс, %d повторов)' % (
+                sequential_time * 1000, concurrent_time * 1000,
+                len(view.get_queries()), latency, rounds,
+            )
+        )
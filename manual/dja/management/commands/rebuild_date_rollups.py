@@ -0,0 +1,45 @@
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from dja.models import DateRollup
+from dja.rollups import registry, rebuild_rollup
+
+
+class Command(BaseCommand):
+    # Нужна после QuerySet.update(), bulk_create() и загрузки данных в обход сигналов.
+    help = 'Пересобирает таблицу DateRollup для зарегистрированных моделей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'fields', nargs='*', metavar='app_label.Model.date_field',
+            help='По умолчанию - все зарегистрированные поля.'
+        )
+
+    def handle(self, *args, fields, **options):
+        targets = []
+        for field in fields:
+            try:
+                label, date_field = field.rsplit('.', 1)
+                model = apps.get_model(label)
+            except (ValueError, LookupError):
+                raise CommandError('Неизвестное поле %s.' % field)
+            if (model._meta.label_lower, date_field) not in registry:
+                raise CommandError('Поле %s не зарегистрировано в dja.rollups.' % field)
+            targets.append((model, date_field))
+        if not fields:
+            targets = [(model, date_field) for (_, date_field), model in registry.items()]
+
+        for model, date_field in targets:
+            started = time.perf_counter()
+            rebuild_rollup(model, date_field)
+            self.stdout.write(self.style.SUCCESS(
+                '%s.%s: дней %d, %.1f с.' % (
+                    model._meta.label, date_field,
+                    DateRollup.objects.filter(
+                        model=model._meta.label_lower, date_field=date_field
+                    ).count(),
+                    time.perf_counter() - started,
+                )
+            ))
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dja', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(fields=['published', 'id'], name='dja_entry_publish_da7b6b_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dja', '0002_entry_published_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DateRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100)),
+                ('date_field', models.CharField(max_length=100)),
+                ('year', models.PositiveSmallIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('day', models.PositiveSmallIntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='daterollup',
+            constraint=models.UniqueConstraint(fields=('model', 'date_field', 'year', 'month', 'day'), name='dja_daterollup_unique_day'),
+        ),
+    ]
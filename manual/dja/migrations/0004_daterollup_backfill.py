@@ -0,0 +1,55 @@
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import ExtractDay, ExtractMonth, ExtractYear
+
+
+# Поля, зарегистрированные в dja.rollups на момент миграции.
+ROLLUP_FIELDS = [
+    ('Book', 'pubdate'),
+    ('Entry', 'published'),
+]
+
+
+def backfill_date_rollups(apps, schema_editor):
+    # То же, что python manage.py rebuild_date_rollups, на исторических моделях.
+    using = schema_editor.connection.alias
+    DateRollup = apps.get_model('dja', 'DateRollup')
+    for model_name, date_field in ROLLUP_FIELDS:
+        model = apps.get_model('dja', model_name)
+        label = model._meta.label_lower
+        rows = (
+            model._default_manager.using(using)
+            .filter(**{'%s__isnull' % date_field: False})
+            .annotate(
+                rollup_year=ExtractYear(date_field),
+                rollup_month=ExtractMonth(date_field),
+                rollup_day=ExtractDay(date_field),
+            )
+            .values('rollup_year', 'rollup_month', 'rollup_day')
+            .annotate(rollup_count=Count('pk'))
+            .order_by()
+        )
+        DateRollup.objects.using(using).filter(model=label, date_field=date_field).delete()
+        DateRollup.objects.using(using).bulk_create(
+            DateRollup(
+                model=label, date_field=date_field, year=row['rollup_year'],
+                month=row['rollup_month'], day=row['rollup_day'], count=row['rollup_count'],
+            )
+            for row in rows.iterator()
+        )
+
+
+def clear_date_rollups(apps, schema_editor):
+    DateRollup = apps.get_model('dja', 'DateRollup')
+    DateRollup.objects.using(schema_editor.connection.alias).all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dja', '0003_daterollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_date_rollups, clear_date_rollups),
+    ]
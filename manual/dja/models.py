@@ -1,17 +1,74 @@
-from django.db import models
+from django.db import models, router
 from django.db.models.functions import Coalesce
 from django.db.models.query import QuerySet
 import datetime
 
 
+# Значения полей до сохранения.
+# Обработчикам post_save нужно прежнее значение поля (dja.rollups переносит обьект
+# в другой день, dja.decorators.LastModifiedRegistry - в другую группу). Значения,
+# загруженные из БД (from_db), хранятся в обьекте и обновляются после save(),
+# поэтому old_value() не выполняет запросов. Один SELECT только если поле было
+# отложено (only()/defer()).
+class TrackedFieldsModel(models.Model):
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save_base(self, raw=False, force_insert=False, force_update=False, using=None,
+                  update_fields=None):
+        using = using or router.db_for_write(self.__class__, instance=self)
+        old = {}
+        if not self._state.adding and self.pk is not None:
+            old = dict(getattr(self, '_loaded_values', {}))
+            missing = [
+                field.attname for field in self._meta.concrete_fields if field.attname not in old
+            ]
+            if missing:
+                old.update(
+                    type(self)._base_manager.using(using).filter(pk=self.pk)
+                    .values(*missing).first() or {}
+                )
+        self._old_values = old
+        try:
+            super().save_base(raw, force_insert, force_update, using, update_fields)
+        finally:
+            del self._old_values
+        saved = update_fields or [field.attname for field in self._meta.concrete_fields]
+        self._loaded_values = {
+            **old,
+            **{
+                field.attname: getattr(self, field.attname)
+                for field in self._meta.concrete_fields
+                if field.attname in saved or field.name in saved
+            },
+        }
+
+    def old_value(self, attname):
+        """
+        Значение поля в БД до текущего save() (в обработчиках pre_save/post_save).
+        Для нового обьекта - None.
+        """
+        return getattr(self, '_old_values', {}).get(attname)
+
+
 class Blog(models.Model):
     name = models.CharField(max_length=64)
 
 
-class Entry(models.Model):
+class Entry(TrackedFieldsModel):
     blog = models.ForeignKey(Blog, on_delete=models.CASCADE)
     published = models.DateTimeField(default=datetime.datetime.now)
 
+    class Meta:
+        # Индекс для keyset пагинации по (published, id).
+        indexes = [models.Index(fields=['published', 'id'])]
+
 
 class Animal(models.Model):
     name = models.CharField(max_length=64)
@@ -55,7 +112,7 @@ class Publisher(models.Model):
     name = models.CharField(max_length=300)
 
 
-class Book(models.Model):
+class Book(TrackedFieldsModel):
     name = models.CharField(max_length=300)
     pages = models.IntegerField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
@@ -882,4 +939,24 @@ class Waiter(models.Model):
     restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE)
     name = models.CharField(max_length=50)
 
-    
+
+# ---
+
+
+class DateRollup(models.Model):
+    # Количество обьектов модели model (app_label.model_name) за день по полю
+    # date_field. Поддерживается сигналами, см. dja/rollups.py.
+    model = models.CharField(max_length=100)
+    date_field = models.CharField(max_length=100)
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    day = models.PositiveSmallIntegerField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['model', 'date_field', 'year', 'month', 'day'],
+                name='dja_daterollup_unique_day',
+            )
+        ]
@@ -90,4 +90,230 @@ def listing(request):
     page_number = request.GET.get("page")
     page_obj = paginator.get_page(page_number)
     return render(request, "list.html", {"page_obj": page_obj})
-"""
\ No newline at end of file
+"""
+
+"""
+Keyset (seek) пагинация.
+
+
+Paginator выполняет COUNT(*) и OFFSET, поэтому чем дальше страница, тем 
+медленнее запрос. KeysetPaginator запоминает значения полей сортировки 
+последней строки страницы и следующую страницу выбирает условием 
+WHERE (published, id) > (:published, :id) LIMIT per_page + 1.
+Работает за O(per_page) на любой глубине, если по полям сортировки есть индекс.
+
+Номер страницы заменяется непрозрачным токеном: next_page_number() и 
+previous_page_number() возвращают токены для ?page=. 
+count и num_pages доступны, но выполняют COUNT(*).
+Даты и время в токене хранятся с микросекундами: DjangoJSONEncoder обрезает их 
+до миллисекунд, и строки внутри одной миллисекунды пропускались бы.
+
+class EntryListView(KeysetPaginationMixin, ListView):
+    queryset = Entry.objects.order_by('published', 'id')
+    paginate_by = 20
+"""
+
+
+import base64
+import datetime
+import json
+from collections.abc import Sequence
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import InvalidPage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.db.models import Q
+from django.http import Http404
+from django.utils.dateparse import parse_datetime, parse_time
+from django.utils.functional import cached_property
+from django.utils.translation import gettext as _
+
+
+class KeysetTokenEncoder(DjangoJSONEncoder):
+    # datetime и time без обрезки до миллисекунд.
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPage(Sequence):
+    def __init__(self, object_list, paginator, number=None, next_token=None, previous_token=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.number = number
+        self._next_token = next_token
+        self._previous_token = previous_token
+
+    def __repr__(self):
+        return '<KeysetPage %s>' % (self.number or 'first')
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._next_token is not None
+
+    def has_previous(self):
+        return self._previous_token is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def next_page_number(self):
+        if self._next_token is None:
+            raise InvalidPage(_('That page contains no results'))
+        return self._next_token
+
+    def previous_page_number(self):
+        if self._previous_token is None:
+            raise InvalidPage(_('That page number is less than 1'))
+        return self._previous_token
+
+
+class KeysetPaginator:
+    """
+    Совместим по аргументам с Paginator и MultipleObjectMixin.paginator_class.
+    ordering - поля сортировки, по умолчанию берется из order_by() queryset 
+    или Meta.ordering. pk добавляется в конец для однозначности сортировки.
+    """
+
+    def __init__(self, object_list, per_page, orphans=0, allow_empty_first_page=True, ordering=None):
+        self.per_page = int(per_page)
+        self.allow_empty_first_page = allow_empty_first_page
+        self.ordering = self.get_ordering(object_list, ordering)
+        self.object_list = object_list.order_by(*self.ordering)
+
+    def get_ordering(self, queryset, ordering=None):
+        ordering = list(ordering or queryset.query.order_by or queryset.model._meta.ordering)
+        if not ordering:
+            ordering = ['pk']
+        names = {field.lstrip('-') for field in ordering}
+        if not names & {'pk', queryset.model._meta.pk.name}:
+            ordering.append('-pk' if ordering[0].startswith('-') else 'pk')
+        return ordering
+
+    @cached_property
+    def count(self):
+        return self.object_list.count()
+
+    @cached_property
+    def num_pages(self):
+        return max(1, -(-self.count // self.per_page))
+
+    def encode_token(self, direction, obj):
+        values = [getattr(obj, field.lstrip('-')) for field in self.ordering]
+        data = json.dumps([direction, values], cls=KeysetTokenEncoder)
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+    def decode_token(self, token):
+        try:
+            padding = '=' * (-len(token) % 4)
+            direction, values = json.loads(base64.urlsafe_b64decode(token + padding))
+        except (TypeError, ValueError):
+            raise InvalidPage(_('That page number is not an integer'))
+        if direction not in ('next', 'previous') or len(values) != len(self.ordering):
+            raise InvalidPage(_('That page number is not an integer'))
+        return direction, [self.parse_value(field, value) for field, value in zip(self.ordering, values)]
+
+    def parse_value(self, field, value):
+        # Строки полей DateTimeField/TimeField обратно в datetime/time.
+        name = field.lstrip('-')
+        opts = self.object_list.model._meta
+        try:
+            model_field = opts.pk if name == 'pk' else opts.get_field(name)
+        except FieldDoesNotExist:
+            return value
+        if isinstance(model_field, models.DateTimeField):
+            parse = parse_datetime
+        elif isinstance(model_field, models.TimeField):
+            parse = parse_time
+        else:
+            return value
+        if not isinstance(value, str):
+            return value
+        try:
+            parsed = parse(value)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise InvalidPage(_('That page number is not an integer'))
+        return parsed
+
+    def seek_filter(self, values, reverse=False):
+        # (a, b) > (va, vb)  =>  a > va OR (a = va AND b > vb)
+        condition = Q()
+        for i, field in enumerate(self.ordering):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            step = Q(**{'%s__%s' % (name, 'lt' if descending else 'gt'): values[i]})
+            for prev_field, value in zip(self.ordering[:i], values):
+                step &= Q(**{prev_field.lstrip('-'): value})
+            condition |= step
+        return condition
+
+    def page(self, token=None):
+        # Выбирается per_page + 1 строк: лишняя строка означает, что есть еще страница.
+        if not token or str(token) == '1':
+            rows = list(self.object_list[:self.per_page + 1])
+            return self.build_page(
+                rows[:self.per_page], None, has_next=len(rows) > self.per_page
+            )
+
+        direction, values = self.decode_token(str(token))
+        if direction == 'next':
+            rows = list(self.object_list.filter(self.seek_filter(values))[:self.per_page + 1])
+            return self.build_page(
+                rows[:self.per_page], token,
+                has_next=len(rows) > self.per_page, has_previous=True,
+            )
+
+        reversed_ordering = [
+            field[1:] if field.startswith('-') else '-' + field for field in self.ordering
+        ]
+        rows = list(
+            self.object_list.filter(self.seek_filter(values, reverse=True))
+            .order_by(*reversed_ordering)[:self.per_page + 1]
+        )
+        return self.build_page(
+            rows[:self.per_page][::-1], token,
+            has_next=True, has_previous=len(rows) > self.per_page,
+        )
+
+    def build_page(self, rows, token, has_next=False, has_previous=False):
+        if not rows:
+            if token is None and self.allow_empty_first_page:
+                return KeysetPage(rows, self)
+            raise InvalidPage(_('That page contains no results'))
+        return KeysetPage(
+            rows, self, token,
+            next_token=self.encode_token('next', rows[-1]) if has_next else None,
+            previous_token=self.encode_token('previous', rows[0]) if has_previous else None,
+        )
+
+
+class KeysetPaginationMixin:
+    """
+    Миксин для ListView и архивных представлений по дате. 
+    MultipleObjectMixin.paginate_queryset приводит ?page= к int, поэтому 
+    токен страницы передается в paginator.page() напрямую.
+    """
+
+    paginator_class = KeysetPaginator
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = self.get_paginator(
+            queryset, page_size, orphans=self.get_paginate_orphans(),
+            allow_empty_first_page=self.get_allow_empty(),
+        )
+        page_kwarg = self.page_kwarg
+        token = self.kwargs.get(page_kwarg) or self.request.GET.get(page_kwarg)
+        try:
+            page = paginator.page(token)
+        except InvalidPage as e:
+            raise Http404(_('Invalid page: %(message)s') % {'message': str(e)})
+        return (paginator, page, page.object_list, page.has_other_pages())
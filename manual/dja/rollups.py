@@ -0,0 +1,266 @@
+"""
+Раздел: Date rollups (Сводная таблица дат для архивных представлений).
+
+
+ArchiveIndexView, YearArchiveView, MonthArchiveView и другие представления по дате
+строят date_list запросом DISTINCT по усеченной дате (queryset.dates()), а next_* и
+previous_* - отдельными запросами к таблице модели. Время растет с количеством строк.
+
+DateRollup хранит количество обьектов за каждый день (year, month, day, count)
+для пары (модель, date_field). register(Book, 'pubdate') подключает сигналы
+post_save/post_delete, которые изменяют счетчики в той же транзакции. Модель должна
+наследовать TrackedFieldsModel (dja/models.py): прежняя дата берется без запроса.
+DateRollupMixin читает date_list, next_* и previous_* из DateRollup, поэтому навигация
+по архиву зависит от количества дней с обьектами, а не от количества обьектов.
+
+class CustomYearArchiveView(DateRollupMixin, generic.YearArchiveView):
+    queryset = Book.objects.all()
+    date_field = 'pubdate'
+
+Миксин используется, только если модель зарегистрирована и queryset не отфильтрован,
+иначе представление работает как обычно.
+QuerySet.update(), bulk_create() и raw SQL сигналы не отправляют, после них нужно
+пересобрать таблицу: python manage.py rebuild_date_rollups dja.Book.pubdate
+Для существующих данных таблица заполняется миграцией dja 0004 (тот же запрос, что в
+rebuild_rollup(), на исторических моделях).
+Дни, счетчик которых дошел до нуля, удаляются.
+Для DateTimeField день определяется в часовом поясе TIME_ZONE, а при allow_future=False
+отбрасываются только следующие дни (обьекты позже текущего времени, но сегодня, остаются).
+"""
+
+
+import datetime
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import ExtractDay, ExtractMonth, ExtractYear
+from django.db.models.signals import post_delete, post_save
+from django.http import Http404
+from django.utils import timezone
+from django.utils.translation import gettext as _
+from django.views.generic.dates import timezone_today
+
+from .models import Book, DateRollup, Entry, TrackedFieldsModel
+
+
+# (app_label.model_name, date_field) зарегистрированных моделей.
+registry = {}
+
+
+def rollup_label(model):
+    return model._meta.label_lower
+
+
+def is_registered(model, date_field):
+    return (rollup_label(model), date_field) in registry
+
+
+def to_date(value):
+    if isinstance(value, datetime.datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value, timezone.get_default_timezone())
+        return value.date()
+    return value
+
+
+def add_to_rollup(model, date_field, date, delta, using=None):
+    if date is None or not delta:
+        return
+    rows = DateRollup.objects.using(using).filter(
+        model=rollup_label(model), date_field=date_field,
+        year=date.year, month=date.month, day=date.day,
+    )
+    if delta < 0:
+        # Счетчик не уходит ниже нуля (PositiveIntegerField), пустые дни удаляются.
+        rows.filter(count__gte=-delta).update(count=F('count') + delta)
+        rows.filter(count=0).delete()
+        return
+    if rows.update(count=F('count') + delta):
+        return
+    try:
+        with transaction.atomic(using=using):
+            rows.create(
+                model=rollup_label(model), date_field=date_field,
+                year=date.year, month=date.month, day=date.day, count=delta,
+            )
+    except IntegrityError:
+        # Строку дня одновременно создал другой процесс.
+        rows.update(count=F('count') + delta)
+
+
+def rebuild_rollup(model, date_field, using=None):
+    label = rollup_label(model)
+    rows = (
+        model._default_manager.using(using)
+        .filter(**{'%s__isnull' % date_field: False})
+        .annotate(
+            rollup_year=ExtractYear(date_field),
+            rollup_month=ExtractMonth(date_field),
+            rollup_day=ExtractDay(date_field),
+        )
+        .values('rollup_year', 'rollup_month', 'rollup_day')
+        .annotate(rollup_count=Count('pk'))
+        .order_by()
+    )
+    with transaction.atomic(using=using):
+        DateRollup.objects.using(using).filter(model=label, date_field=date_field).delete()
+        DateRollup.objects.using(using).bulk_create(
+            DateRollup(
+                model=label, date_field=date_field, year=row['rollup_year'],
+                month=row['rollup_month'], day=row['rollup_day'], count=row['rollup_count'],
+            )
+            for row in rows.iterator()
+        )
+
+
+def register(model, date_field):
+    # Прежнее значение (чтобы перенести обьект в другой день) берется из
+    # TrackedFieldsModel.old_value() без запроса к БД.
+    if not issubclass(model, TrackedFieldsModel):
+        raise ImproperlyConfigured('%s должна наследовать TrackedFieldsModel.' % model._meta.label)
+    registry[rollup_label(model), date_field] = model
+    uid = 'date_rollup:%s.%s' % (rollup_label(model), date_field)
+
+    def on_save(sender, instance, created, using=None, **kwargs):
+        old = to_date(instance.old_value(date_field))
+        new = to_date(getattr(instance, date_field))
+        if old != new:
+            add_to_rollup(sender, date_field, old, -1, using)
+            add_to_rollup(sender, date_field, new, 1, using)
+
+    def on_delete(sender, instance, using=None, **kwargs):
+        add_to_rollup(sender, date_field, to_date(getattr(instance, date_field)), -1, using)
+
+    post_save.connect(on_save, sender=model, weak=False, dispatch_uid=uid)
+    post_delete.connect(on_delete, sender=model, weak=False, dispatch_uid=uid)
+
+
+def date_q(date, lookup):
+    # Сравнение (year, month, day) с датой: lookup - 'gte', 'lt' или 'lte'.
+    strict = 'gt' if lookup.startswith('g') else 'lt'
+    return (
+        Q(**{'year__%s' % strict: date.year})
+        | Q(year=date.year, **{'month__%s' % strict: date.month})
+        | Q(year=date.year, month=date.month, **{'day__%s' % lookup: date.day})
+    )
+
+
+class DateRollupMixin:
+    """
+    Миксин для архивных представлений по дате (dja/views.py). Диапазон дат берется
+    из lookup, который представление передает в get_dated_queryset().
+    """
+
+    def get_rollup(self):
+        queryset = self.get_queryset()
+        date_field = self.get_date_field()
+        if not is_registered(queryset.model, date_field) or queryset.query.has_filters():
+            return None
+        rows = DateRollup.objects.filter(
+            model=rollup_label(queryset.model), date_field=date_field, count__gt=0
+        )
+        if not self.get_allow_future():
+            rows = rows.filter(date_q(timezone_today(), 'lte'))
+        return rows
+
+    def get_rollup_range(self, rows):
+        since, until = getattr(self, '_rollup_range', (None, None))
+        if since is not None:
+            rows = rows.filter(date_q(since, 'gte'))
+        if until is not None:
+            rows = rows.filter(date_q(until, 'lt'))
+        return rows
+
+    def get_dated_queryset(self, **lookup):
+        date_field = self.get_date_field()
+        if date_field in lookup:
+            # DayArchiveView для DateField ищет по точной дате.
+            day = to_date(lookup[date_field])
+            self._rollup_range = (day, day + datetime.timedelta(days=1))
+        else:
+            self._rollup_range = tuple(
+                to_date(lookup.get('%s__%s' % (date_field, op))) for op in ('gte', 'lt')
+            )
+        rows = self.get_rollup()
+        if rows is None:
+            return super().get_dated_queryset(**lookup)
+
+        qs = self.get_queryset().filter(**lookup)
+        if not self.get_allow_future():
+            now = timezone.now() if self.uses_datetime_field else timezone_today()
+            qs = qs.filter(**{'%s__lte' % date_field: now})
+        if not self.get_allow_empty() and not self.get_rollup_range(rows).exists():
+            raise Http404(
+                _('No %(verbose_name_plural)s available')
+                % {'verbose_name_plural': qs.model._meta.verbose_name_plural}
+            )
+        return qs
+
+    def make_rollup_date(self, year, month=1, day=1):
+        # Те же типы, что возвращают queryset.dates() и queryset.datetimes().
+        if not self.uses_datetime_field:
+            return datetime.date(year, month, day)
+        value = datetime.datetime(year, month, day)
+        return timezone.make_aware(value) if settings.USE_TZ else value
+
+    def get_date_list(self, queryset, date_type=None, ordering='ASC'):
+        rows = self.get_rollup()
+        if rows is None:
+            return super().get_date_list(queryset, date_type, ordering)
+        if date_type is None:
+            date_type = self.get_date_list_period()
+        fields = {'year': ['year'], 'month': ['year', 'month'], 'day': ['year', 'month', 'day']}[date_type]
+        order = fields if ordering == 'ASC' else ['-%s' % field for field in fields]
+        rows = self.get_rollup_range(rows).values_list(*fields).distinct().order_by(*order)
+        date_list = [self.make_rollup_date(*row) for row in rows]
+        if not date_list and not self.get_allow_empty():
+            raise Http404(
+                _('No %(verbose_name_plural)s available')
+                % {'verbose_name_plural': queryset.model._meta.verbose_name_plural}
+            )
+        return date_list
+
+    def _get_rollup_next_prev(self, date, is_previous, period):
+        # То же, что django.views.generic.dates._get_next_prev, но поиск
+        # ближайшего дня с обьектами выполняется по DateRollup.
+        rows = self.get_rollup()
+        if rows is None or self.get_allow_empty():
+            return getattr(super(), 'get_%s_%s' % ('previous' if is_previous else 'next', period))(date)
+        get_current = getattr(self, '_get_current_%s' % period)
+        get_next = getattr(self, '_get_next_%s' % period)
+        if is_previous:
+            rows = rows.filter(date_q(get_current(date), 'lt')).order_by('-year', '-month', '-day')
+        else:
+            rows = rows.filter(date_q(get_next(date), 'gte')).order_by('year', 'month', 'day')
+        row = rows.values_list('year', 'month', 'day').first()
+        return None if row is None else get_current(datetime.date(*row))
+
+    def get_next_year(self, date):
+        return self._get_rollup_next_prev(date, False, 'year')
+
+    def get_previous_year(self, date):
+        return self._get_rollup_next_prev(date, True, 'year')
+
+    def get_next_month(self, date):
+        return self._get_rollup_next_prev(date, False, 'month')
+
+    def get_previous_month(self, date):
+        return self._get_rollup_next_prev(date, True, 'month')
+
+    def get_next_week(self, date):
+        return self._get_rollup_next_prev(date, False, 'week')
+
+    def get_previous_week(self, date):
+        return self._get_rollup_next_prev(date, True, 'week')
+
+    def get_next_day(self, date):
+        return self._get_rollup_next_prev(date, False, 'day')
+
+    def get_previous_day(self, date):
+        return self._get_rollup_next_prev(date, True, 'day')
+
+
+register(Book, 'pubdate')
+register(Entry, 'published')
@@ -198,4 +198,933 @@ class MySeleniumTests(StaticLiveServerTestCase):
 Подробнее:
 https://docs.djangoproject.com/en/4.2/topics/testing/tools/
 https://docs.djangoproject.com/en/4.2/topics/testing/advanced/
-"""
\ No newline at end of file
+"""
+
+from django.test import override_settings
+from django.http import StreamingHttpResponse
+from django.test import RequestFactory
+from config.middleware import QueryBudgetExceeded, QueryBudgetMiddleware, sql_fingerprint
+from .models import Blog
+
+
+class QueryBudgetMiddlewareTestCase(TestCase):
+    def setUp(self):
+        Blog.objects.bulk_create([Blog(name='blog %d' % i) for i in range(3)])
+
+    def test_headers(self):
+        response = self.client.get('/views/ListView')
+        self.assertIn('X-DB-Queries', response)
+        self.assertTrue(response['Server-Timing'].startswith('db;dur='))
+
+    @override_settings(QUERY_BUDGETS={'dja.views.blog_list': 0}, QUERY_BUDGET_RAISE=True)
+    def test_budget_exceeded(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get('/blog/')
+
+    @override_settings(QUERY_BUDGET_DEFAULT=0, QUERY_BUDGET_RAISE=True)
+    def test_streaming(self):
+        # Запросы выполняются при чтении тела, поэтому счетчик не показывается.
+        def get_response(request):
+            return StreamingHttpResponse(blog.name for blog in Blog.objects.all())
+
+        middleware = QueryBudgetMiddleware(get_response)
+        response = middleware(RequestFactory().get('/'))
+        self.assertNotIn('X-DB-Queries', response)
+        self.assertEqual(b''.join(response.streaming_content), b'blog 0blog 1blog 2')
+
+    def test_fingerprint(self):
+        self.assertEqual(
+            sql_fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s)'),
+            sql_fingerprint("SELECT * FROM t WHERE id IN (1)"),
+        )
+
+
+import datetime
+from .models import Entry
+from .pagination import KeysetPaginator
+
+
+class KeysetPaginatorTestCase(TestCase):
+    def setUp(self):
+        blog = Blog.objects.create(name='blog')
+        day = datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc)
+        # По 3 записи с одинаковой датой, чтобы проверить сортировку по id.
+        Entry.objects.bulk_create([
+            Entry(blog=blog, published=day + datetime.timedelta(days=i // 3))
+            for i in range(10)
+        ])
+        self.expected = list(Entry.objects.order_by('-published', '-id'))
+
+    def test_forward_and_backward(self):
+        paginator = KeysetPaginator(Entry.objects.order_by('-published'), 4)
+        self.assertEqual(paginator.ordering, ['-published', '-pk'])
+        pages, page = [], paginator.page()
+        while True:
+            pages.append(list(page))
+            if not page.has_next():
+                break
+            page = paginator.page(page.next_page_number())
+        self.assertEqual(sum(pages, []), self.expected)
+
+        backward = [list(page)]
+        while page.has_previous():
+            page = paginator.page(page.previous_page_number())
+            backward.append(list(page))
+        self.assertEqual(backward[::-1], pages)
+
+    def test_view(self):
+        response = self.client.get('/views/EntryArchiveIndexView')
+        page = response.context['page_obj']
+        self.assertEqual(list(page), self.expected[:20])
+        self.assertFalse(response.context['is_paginated'])
+        response = self.client.get('/views/EntryArchiveIndexView?page=bad')
+        self.assertEqual(response.status_code, 404)
+
+    def test_microseconds(self):
+        # Записи в пределах одной миллисекунды: токен не должен обрезать время.
+        Entry.objects.all().delete()
+        blog = Blog.objects.get()
+        moment = datetime.datetime(2023, 2, 1, 12, 0, 0, 100, tzinfo=datetime.timezone.utc)
+        Entry.objects.bulk_create([
+            Entry(blog=blog, published=moment + datetime.timedelta(microseconds=i))
+            for i in range(7)
+        ])
+        for ordering in (['published'], ['-published']):
+            expected = list(Entry.objects.order_by(*ordering, 'pk'))
+            paginator = KeysetPaginator(Entry.objects.order_by(*ordering), 2)
+            pages, page = [], paginator.page()
+            while len(pages) < 10:
+                pages.append(list(page))
+                if not page.has_next():
+                    break
+                page = paginator.page(page.next_page_number())
+            self.assertEqual(sum(pages, []), expected)
+            self.assertEqual(len(pages), 4)
+
+            backward = [pages[-1]]
+            while page.has_previous():
+                page = paginator.page(page.previous_page_number())
+                backward.append(list(page))
+            self.assertEqual(backward[::-1], pages)
+
+
+import os
+import tempfile
+import time
+from django.core import signing
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+from config.middleware import ReplicaPinningMiddleware
+from config.router import ReplicaRouter
+
+
+class LaggingReplicaRouter(ReplicaRouter):
+    primary = 'router_primary'
+    replicas = {'router_replica1': 1, 'router_replica2': 1}
+    lag = {}
+
+    def measure_lag(self, alias):
+        return self.lag.get(alias, 0)
+
+
+# Primary и реплики - отдельные файлы SQLite. Репликация выполняется вручную
+# (replicate()), поэтому до ее вызова реплики отстают от primary.
+class ReplicaRouterTestCase(SimpleTestCase):
+    aliases = ['router_primary', 'router_replica1', 'router_replica2']
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmpdir = tempfile.mkdtemp()
+        for alias in cls.aliases:
+            connections.settings[alias] = {
+                **connections.settings['default'],
+                'NAME': os.path.join(cls.tmpdir, alias + '.sqlite3'),
+            }
+            with connections[alias].schema_editor() as editor:
+                editor.create_model(Blog)
+                editor.create_model(Entry)
+
+    @classmethod
+    def tearDownClass(cls):
+        for alias in cls.aliases:
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+        for name in os.listdir(cls.tmpdir):
+            os.remove(os.path.join(cls.tmpdir, name))
+        os.rmdir(cls.tmpdir)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.now = 1000.0
+        self.router = LaggingReplicaRouter()
+        self.router.clock = lambda: self.now
+        self.router.lag = {}
+        self.override = override_settings(DATABASE_ROUTERS=[self.router])
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+        for alias in self.aliases:
+            Blog.objects.using(alias).all().delete()
+
+    def replicate(self):
+        rows = list(Blog.objects.using('router_primary').values('id', 'name'))
+        for alias in self.router.replicas:
+            Blog.objects.using(alias).bulk_create(
+                [Blog(**row) for row in rows], ignore_conflicts=True
+            )
+
+    def test_read_your_writes(self):
+        request = RequestFactory().get('/')
+
+        def view(request):
+            Blog.objects.create(name='new')
+            return HttpResponse(Blog.objects.get(name='new').name)
+
+        response = ReplicaPinningMiddleware(view)(request)
+        self.assertEqual(response.content, b'new')
+        cookie = response.cookies[ReplicaPinningMiddleware.cookie_name]
+
+        # Следующий запрос клиента с cookie читает из primary, реплики еще отстают.
+        request = RequestFactory().get('/')
+        request.COOKIES[ReplicaPinningMiddleware.cookie_name] = cookie.value
+        response = ReplicaPinningMiddleware(
+            lambda request: HttpResponse(Blog.objects.filter(name='new').count())
+        )(request)
+        self.assertEqual(response.content, b'1')
+
+        # Без cookie чтение идет в реплику.
+        response = ReplicaPinningMiddleware(
+            lambda request: HttpResponse(Blog.objects.filter(name='new').count())
+        )(RequestFactory().get('/'))
+        self.assertEqual(response.content, b'0')
+        self.replicate()
+        self.assertEqual(self.router.db_for_read(Blog) in self.router.replicas, True)
+
+    def test_pin_cookie_from_client(self):
+        # Неподписанное или бесконечное значение не закрепляет чтение,
+        # подписанное время ограничено max_pin_seconds.
+        middleware = ReplicaPinningMiddleware(lambda request: HttpResponse())
+        name = ReplicaPinningMiddleware.cookie_name
+        signer = signing.get_cookie_signer(salt=name + ReplicaPinningMiddleware.cookie_salt)
+        for value in ('inf', str(time.time() + 3600), signer.sign('inf'), signer.sign('nan')):
+            request = RequestFactory().get('/')
+            request.COOKIES[name] = value
+            with self.subTest(value=value):
+                self.assertEqual(middleware.get_pinned_until(request), 0)
+        request = RequestFactory().get('/')
+        request.COOKIES[name] = signer.sign(str(time.time() + 3600))
+        self.assertLessEqual(
+            middleware.get_pinned_until(request),
+            time.time() + ReplicaPinningMiddleware.max_pin_seconds
+        )
+
+    def test_weighted_latency(self):
+        self.router.state['router_replica1'].latency = 0.001
+        self.router.state['router_replica2'].latency = 0.009
+        chosen = [self.router.db_for_read(Blog) for _ in range(2000)]
+        self.assertGreater(chosen.count('router_replica1'), chosen.count('router_replica2') * 5)
+
+    def test_lag(self):
+        self.router.lag = {'router_replica1': 60}
+        self.assertEqual({self.router.db_for_read(Blog) for _ in range(50)}, {'router_replica2'})
+        self.router.lag = {'router_replica1': 60, 'router_replica2': 60}
+        self.now += self.router.lag_check_interval
+        self.assertEqual(self.router.db_for_read(Blog), 'router_primary')
+
+    def test_circuit_breaker(self):
+        for _ in range(self.router.failure_threshold):
+            self.router.record_failure('router_replica1')
+        self.assertEqual({self.router.db_for_read(Blog) for _ in range(50)}, {'router_replica2'})
+
+        # После recovery_timeout один пробный запрос. replica2 исключена по отставанию.
+        self.router.lag = {'router_replica2': 60}
+        self.now += self.router.recovery_timeout
+        self.assertEqual(self.router.db_for_read(Blog), 'router_replica1')
+        self.assertEqual(self.router.db_for_read(Blog), 'router_primary')
+
+        # Успешный запрос закрывает автомат.
+        self.now += self.router.recovery_timeout
+        Blog.objects.using(self.router.db_for_read(Blog)).count()
+        self.assertIsNone(self.router.state['router_replica1'].opened_at)
+
+    def test_unreachable_replica(self):
+        connections['router_replica2'].close()
+        connections['router_replica2'].settings_dict['NAME'] = os.path.join(
+            self.tmpdir, 'missing', 'replica.sqlite3'
+        )
+        try:
+            self.router.check_lag()
+            self.assertIsNotNone(self.router.state['router_replica2'].opened_at)
+            self.assertEqual({self.router.db_for_read(Blog) for _ in range(50)}, {'router_replica1'})
+        finally:
+            connections['router_replica2'].settings_dict['NAME'] = os.path.join(
+                self.tmpdir, 'router_replica2.sqlite3'
+            )
+
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import async_to_sync, sync_to_async
+from django.db import OperationalError
+from config.pool import close_pools
+
+
+# Пул соединений на файле SQLite.
+class ConnectionPoolTestCase(SimpleTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.aliases = []
+
+    def tearDown(self):
+        for alias in self.aliases:
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+        close_pools()
+        for name in os.listdir(self.tmpdir):
+            os.remove(os.path.join(self.tmpdir, name))
+        os.rmdir(self.tmpdir)
+
+    def add_database(self, alias, **pool):
+        connections.settings[alias] = {
+            **connections.settings['default'],
+            'ENGINE': 'config.backends.sqlite3',
+            'NAME': os.path.join(self.tmpdir, 'pool.sqlite3'),
+            'OPTIONS': {'pool': pool},
+        }
+        self.aliases.append(alias)
+        return connections[alias]
+
+    def query(self, alias):
+        # Как запрос: соединение берется из пула и возвращается в конце.
+        connection = connections[alias]
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                return cursor.fetchone()[0]
+        finally:
+            connection.close()
+
+    def test_reuse(self):
+        connection = self.add_database('pool_reuse', min_size=1, max_size=2)
+        connection.ensure_connection()
+        raw = connection.connection
+        connection.close()
+        connection.ensure_connection()
+        self.assertIs(connection.connection, raw)
+        connection.close()
+        stats = connection.pool.stats()
+        self.assertEqual((stats['created'], stats['checkouts'], stats['idle']), (1, 2, 1))
+
+    def test_threads_overflow(self):
+        connection = self.add_database('pool_threads', max_size=2, max_overflow=1, timeout=10)
+        barrier = threading.Barrier(3)
+
+        def work(_):
+            connections['pool_threads'].ensure_connection()
+            barrier.wait()
+            connections['pool_threads'].close()
+            return self.query('pool_threads')
+
+        with ThreadPoolExecutor(3) as executor:
+            self.assertEqual(list(executor.map(work, range(3))), [1, 1, 1])
+        stats = connection.pool.stats()
+        # Третье соединение временное и закрывается при возврате.
+        self.assertEqual((stats['size'], stats['overflow'], stats['in_use']), (2, 0, 0))
+        self.assertEqual(stats['idle'], 2)
+
+    def test_wait_and_timeout(self):
+        connection = self.add_database('pool_wait', max_size=1, timeout=0.2)
+        connection.ensure_connection()
+        with ThreadPoolExecutor(1) as executor:
+            with self.assertRaises(OperationalError):
+                executor.submit(self.query, 'pool_wait').result()
+            future = executor.submit(self.query, 'pool_wait')
+            time.sleep(0.05)
+            connection.close()
+            self.assertEqual(future.result(), 1)
+        stats = connection.pool.stats()
+        self.assertEqual((stats['timeouts'], stats['waits']), (1, 1))
+        self.assertGreater(stats['max_wait_time'], 0)
+
+    def test_health_check(self):
+        connection = self.add_database('pool_health', max_size=1, health_check_interval=0)
+        connection.ensure_connection()
+        raw = connection.connection
+        connection.close()
+        raw.close()
+        self.assertEqual(self.query('pool_health'), 1)
+        stats = connection.pool.stats()
+        self.assertEqual((stats['created'], stats['health_check_failures']), (2, 1))
+
+    def test_asgi(self):
+        connection = self.add_database('pool_asgi', max_size=1, timeout=1)
+
+        async def view():
+            return await sync_to_async(self.query, thread_sensitive=True)('pool_asgi')
+
+        self.assertEqual([async_to_sync(view)() for _ in range(3)], [1, 1, 1])
+        self.assertEqual(connection.pool.stats()['in_use'], 0)
+
+
+from django.db.backends.signals import connection_created
+import importlib
+from django.db.models import Count, Max, QuerySet
+from .models import Author, Book, Publisher
+
+# async - ключевое слово, модуль импортируется по строке.
+gather_querysets = importlib.import_module('config.async').gather_querysets
+
+
+# Дашборд из трех независимых запросов: последовательно через 
+# sync_to_async(thread_sensitive=True) и параллельно через gather_querysets().
+# execute_wrapper записывает alias и поток каждого запроса.
+class GatherQuerysetsTestCase(SimpleTestCase):
+    alias = 'dashboard'
+    executed = []
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmpdir = tempfile.mkdtemp()
+        connections.settings[cls.alias] = {
+            **connections.settings['default'],
+            'NAME': os.path.join(cls.tmpdir, 'dashboard.sqlite3'),
+        }
+        connection_created.connect(cls.record_queries)
+        with connections[cls.alias].schema_editor() as editor:
+            for model in (Author, Publisher, Book):
+                editor.create_model(model)
+        publishers = Publisher.objects.using(cls.alias).bulk_create(
+            [Publisher(name='p%s' % i) for i in range(10)]
+        )
+        Author.objects.using(cls.alias).bulk_create(
+            [Author(name='a%s' % i, age=20 + i % 50) for i in range(100)]
+        )
+        Book.objects.using(cls.alias).bulk_create([
+            Book(name='b%s' % i, pages=i % 500, price=i % 90, rating=1,
+                 publisher=publishers[i % 10])
+            for i in range(1000)
+        ])
+
+    @classmethod
+    def tearDownClass(cls):
+        connection_created.disconnect(cls.record_queries)
+        connections[cls.alias].close()
+        del connections[cls.alias]
+        del connections.settings[cls.alias]
+        for name in os.listdir(cls.tmpdir):
+            os.remove(os.path.join(cls.tmpdir, name))
+        os.rmdir(cls.tmpdir)
+        super().tearDownClass()
+
+    @classmethod
+    def record_queries(cls, sender, connection, **kwargs):
+        def wrapper(execute, sql, params, many, context):
+            cls.executed.append((connection.alias, threading.current_thread().name))
+            return execute(sql, params, many, context)
+        connection.execute_wrappers.append(wrapper)
+
+    def queries(self):
+        db = self.alias
+        return [
+            Author.objects.using(db).order_by('-age', 'name').values('name', 'age')[:10],
+            lambda: Book.objects.using(db).aggregate(max_pages=Max('pages'), count=Count('id')),
+            lambda: Publisher.objects.using(db).count(),
+        ]
+
+    async def sequential(self):
+        results = []
+        for query in self.queries():
+            if isinstance(query, QuerySet):
+                results.append(await sync_to_async(list)(query))
+            else:
+                results.append(await sync_to_async(query)())
+        return results
+
+    async def concurrent(self):
+        return await gather_querysets(*self.queries())
+
+    def run_recorded(self, func):
+        self.executed.clear()
+        result = async_to_sync(func)()
+        return result, list(self.executed)
+
+    def test_results(self):
+        expected, sequential = self.run_recorded(self.sequential)
+        result, concurrent = self.run_recorded(self.concurrent)
+        self.assertEqual(result, expected)
+        self.assertEqual(result[1], {'max_pages': 499, 'count': 1000})
+        self.assertEqual(result[2], 10)
+        # По одному запросу на каждый QuerySet/функцию и только к alias дашборда.
+        self.assertEqual([alias for alias, _ in sequential], [self.alias] * 3)
+        self.assertEqual([alias for alias, _ in concurrent], [self.alias] * 3)
+        # gather_querysets выполняет запросы в потоках своего пула.
+        self.assertTrue(all(name.startswith('async-query') for _, name in concurrent))
+
+
+import io
+from django.core.management import call_command
+
+
+class DashboardBenchTestCase(TestCase):
+    def test_bench_command(self):
+        out, err = io.StringIO(), io.StringIO()
+        call_command('bench_dashboard', rounds=1, latency=1, stdout=out, stderr=err)
+        self.assertIn('gather_querysets', out.getvalue())
+        self.assertEqual(err.getvalue(), '')
+
+
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from config.cache import SQLiteCache, TieredCache
+from .cache import cache_view, get_cache, instance_tag, invalidate_tags, tracked_models
+from .views import BlogListView
+
+
+class OtherProcessTieredCache(TieredCache):
+    # Экземпляр кэша страниц другого процесса.
+    def __init__(self, cache):
+        super().__init__(cache.l2_alias, {})
+        self._l2 = SQLiteCache(cache.l2.path, {})
+
+    @property
+    def l2(self):
+        return self._l2
+
+
+class TaggedViewCacheTestCase(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.author = Author.objects.create(name='Author 1', age=30)
+        self.factory = RequestFactory()
+
+    def test_cached_page(self):
+        content = self.client.get('/cached_page/').content
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/cached_page/').content, content)
+
+        # Изменения других моделей не сбрасывают страницу.
+        Blog.objects.create(name='blog')
+        with self.assertNumQueries(0):
+            self.client.get('/cached_page/')
+
+        Author.objects.create(name='Author 2', age=40)
+        self.assertNotEqual(self.client.get('/cached_page/').content, content)
+
+    def test_list_views(self):
+        blog = Blog.objects.create(name='blog')
+        view = BlogListView.as_view()
+        self.assertContains(view(self.factory.get('/blog/')).render(), 'blog')
+        with self.assertNumQueries(0):
+            self.assertContains(view(self.factory.get('/blog/')), 'blog')
+        blog.name = 'renamed'
+        blog.save()
+        self.assertContains(view(self.factory.get('/blog/')).render(), 'renamed')
+
+        self.assertContains(self.client.get('/views/ListView'), 'Author 1')
+        self.author.delete()
+        self.assertNotContains(self.client.get('/views/ListView'), 'Author 1')
+
+    def test_instance_tags(self):
+        calls = []
+
+        @cache_view(60, tags=lambda request, pk: [instance_tag(Author, pk)], models=[Author])
+        def author_view(request, pk):
+            calls.append(pk)
+            return HttpResponse(Author.objects.get(pk=pk).name)
+
+        other = Author.objects.create(name='Author 2', age=40)
+        publisher = Publisher.objects.create(name='publisher')
+        book = Book.objects.create(name='book', pages=1, price=1, rating=1, publisher=publisher)
+        for _ in range(2):
+            author_view(self.factory.get('/a/'), self.author.pk)
+            author_view(self.factory.get('/b/'), other.pk)
+        self.assertEqual(calls, [self.author.pk, other.pk])
+
+        book.authors.add(self.author)
+        author_view(self.factory.get('/a/'), self.author.pk)
+        author_view(self.factory.get('/b/'), other.pk)
+        self.assertEqual(calls, [self.author.pk, other.pk, self.author.pk])
+
+        # Тег модели не затрагивает ответы, помеченные только экземпляром.
+        invalidate_tags(Author)
+        author_view(self.factory.get('/b/'), other.pk)
+        self.assertEqual(len(calls), 3)
+        invalidate_tags(other)
+        author_view(self.factory.get('/b/'), other.pk)
+        self.assertEqual(calls[-1], other.pk)
+
+    def test_other_process(self):
+        # Другой процесс: свой L1 и свой экземпляр SQLiteCache того же файла.
+        # Сброс версии в этом процессе виден ему сразу, а не через TTL страницы.
+        other_process = OtherProcessTieredCache(get_cache())
+        content = self.client.get('/cached_page/').content
+        with mock.patch('dja.cache.get_cache', return_value=other_process):
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get('/cached_page/').content, content)
+        Author.objects.create(name='Author 2', age=40)
+        with mock.patch('dja.cache.get_cache', return_value=other_process):
+            self.assertNotEqual(self.client.get('/cached_page/').content, content)
+
+    def test_models_tracked_on_decoration(self):
+        # post_delete подключается до первого запроса к представлению.
+        @cache_view(60, tags=lambda request, pk: [instance_tag(Publisher, pk)], models=[Publisher])
+        def publisher_view(request, pk):
+            return HttpResponse()
+
+        self.assertIn(Publisher, tracked_models)
+        with self.assertRaises(ImproperlyConfigured):
+            cache_view(60, tags=lambda request: [Publisher])
+
+    def test_not_cached(self):
+        self.client.post('/cached_page/')
+        with self.assertNumQueries(1):
+            self.client.post('/cached_page/')
+
+
+from django.conf import settings
+from django.core.cache import caches
+from config.cache import SQLiteCache
+from .decorators import entry_last_modified
+
+
+class LastModifiedRegistryTestCase(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.override = override_settings(CACHES={
+            **settings.CACHES,
+            'shared': {
+                'BACKEND': 'config.cache.SQLiteCache',
+                'LOCATION': os.path.join(self.tmp.name, 'cache.sqlite3'),
+            },
+            'last_modified': {
+                'BACKEND': 'config.cache.SQLiteCache',
+                'LOCATION': os.path.join(self.tmp.name, 'last_modified.sqlite3'),
+            },
+        })
+        self.override.enable()
+        self.addCleanup(self.tmp.cleanup)
+        self.addCleanup(self.override.disable)
+        get_cache().clear()
+        self.blog = Blog.objects.create(name='blog')
+        self.other = Blog.objects.create(name='other')
+        Entry.objects.create(blog=self.blog)
+
+    def test_not_modified(self):
+        response = self.client.get('/blog/%s/' % self.blog.pk)
+        self.assertEqual(response.status_code, 200)
+        headers = {
+            'HTTP_IF_NONE_MATCH': response['ETag'],
+            'HTTP_IF_MODIFIED_SINCE': response['Last-Modified'],
+        }
+        with self.assertNumQueries(0):
+            response = self.client.get('/blog/%s/' % self.blog.pk, **headers)
+        self.assertEqual(response.status_code, 304)
+
+        # Изменение записей другого блога не меняет ETag.
+        Entry.objects.create(blog=self.other)
+        self.assertEqual(self.client.get('/blog/%s/' % self.blog.pk, **headers).status_code, 304)
+
+        Entry.objects.create(blog=self.blog)
+        self.assertEqual(self.client.get('/blog/%s/' % self.blog.pk, **headers).status_code, 200)
+
+    def test_delete(self):
+        etag = entry_last_modified.etag(self.blog.pk)
+        Entry.objects.filter(blog=self.blog).delete()
+        self.assertNotEqual(entry_last_modified.etag(self.blog.pk), etag)
+
+    def test_missing(self):
+        entry_last_modified.cache.clear()
+        with self.assertNumQueries(0):
+            etag = entry_last_modified.etag(self.blog.pk)
+        self.assertEqual(entry_last_modified.etag(self.blog.pk), etag)
+
+    def test_move(self):
+        # Перенос записи в другой блог меняет ETag обоих блогов.
+        etags = [entry_last_modified.etag(blog.pk) for blog in (self.blog, self.other)]
+        entry = Entry.objects.get(blog=self.blog)
+        entry.blog = self.other
+        entry.save()
+        self.assertNotEqual(entry_last_modified.etag(self.blog.pk), etags[0])
+        self.assertNotEqual(entry_last_modified.etag(self.other.pk), etags[1])
+
+    def test_pages_clear(self):
+        # Очистка кэша страниц и вытеснение его записей не сбрасывают время изменения.
+        etag = entry_last_modified.etag(self.blog.pk)
+        pages = caches['pages']
+        for i in range(400):
+            pages.set('page-%d' % i, 'x')
+        pages.clear()
+        self.assertEqual(entry_last_modified.etag(self.blog.pk), etag)
+
+    def test_shared_cache(self):
+        # Время изменения видно экземпляру кэша другого процесса.
+        etag = entry_last_modified.etag(self.blog.pk)
+        other_process = SQLiteCache(os.path.join(self.tmp.name, 'last_modified.sqlite3'), {})
+        self.assertEqual(
+            other_process.get(entry_last_modified.prefix + str(self.blog.pk)),
+            entry_last_modified.get(self.blog.pk)
+        )
+        Entry.objects.create(blog=self.blog)
+        self.assertNotEqual(entry_last_modified.etag(self.blog.pk), etag)
+
+
+from config.cache import TieredCache
+
+
+class TieredCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.settings = override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'l2': {
+                'BACKEND': 'config.cache.SQLiteCache',
+                'LOCATION': os.path.join(self.tmp.name, 'cache.sqlite3'),
+            },
+        })
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+        self.tmp.cleanup()
+
+    def tiered(self, **options):
+        # Отдельный экземпляр - как кэш в другом процессе с общим L2.
+        return TieredCache('l2', {'TIMEOUT': 60, 'OPTIONS': options})
+
+    def test_l1_and_l2(self):
+        cache, other = self.tiered(), self.tiered()
+        cache.set('key', {'value': 1})
+        self.assertEqual(cache.get('key'), {'value': 1})
+        self.assertEqual(other.get('key'), {'value': 1})
+        self.assertEqual(other.get('key'), {'value': 1})
+        self.assertEqual(cache.stats()['l1_hits'], 1)
+        self.assertEqual(other.stats()['l2_hits'], 1)
+        self.assertEqual(other.stats()['l1_hits'], 1)
+
+        self.assertFalse(other.add('key', 2))
+        self.assertTrue(cache.delete('key'))
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual(cache.stats()['misses'], 1)
+
+        cache.set('counter', 1)
+        self.assertEqual(other.incr('counter'), 2)
+        self.assertEqual(cache.get('counter'), 2)
+        self.assertTrue(cache.has_key('counter'))
+
+    def test_l1_size(self):
+        cache = self.tiered(L1_MAX_SIZE=1000)
+        for i in range(10):
+            cache.set('key%s' % i, 'x' * 200)
+        stats = cache.stats()
+        self.assertLessEqual(stats['l1_size'], 1000)
+        self.assertGreater(stats['evictions'], 0)
+        self.assertEqual(cache.get('key0'), 'x' * 200)
+
+    def test_stale_while_recompute(self):
+        cache, other = self.tiered(), self.tiered()
+        cache.set('key', 'old', 0.1)
+        time.sleep(0.15)
+        self.assertIsNone(cache.get('key'))
+        # Пока первый процесс пересчитывает значение, второй получает устаревшее.
+        self.assertEqual(other.get('key'), 'old')
+        self.assertEqual(other.stats()['stale_hits'], 1)
+        cache.set('key', 'new')
+        self.assertEqual(other.get('key'), 'new')
+
+    def test_early_refresh(self):
+        cache = self.tiered(BETA=1000000)
+        self.assertIsNone(cache.get('key'))
+        time.sleep(0.05)
+        cache.set('key', 'value', 60)
+        # Пересчет занял 0.05 с, при большом BETA значение обновляется досрочно, но только одним.
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual(self.tiered(BETA=1000000).get('key'), 'value')
+        self.assertEqual(cache.stats()['early_refreshes'], 1)
+
+    def test_single_flight(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'value'
+
+        caches = [self.tiered() for _ in range(8)]
+        with ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(lambda cache: cache.get_or_set('key', compute), caches))
+        self.assertEqual(results, ['value'] * 8)
+        self.assertEqual(len(calls), 1)
+
+
+from types import SimpleNamespace
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.db.models import F
+from django.http import Http404
+from django.test.utils import CaptureQueriesContext
+from django.views import generic
+from .models import DateRollup
+from .views import (
+    CustomArchiveIndexView, CustomDayArchiveView, CustomMonthArchiveView,
+    CustomWeekArchiveView, CustomYearArchiveView
+)
+
+
+class DateRollupTestCase(TestCase):
+    dates = [
+        datetime.date(2022, 12, 31), datetime.date(2023, 1, 1), datetime.date(2023, 1, 1),
+        datetime.date(2023, 3, 15), datetime.date(2023, 8, 1), datetime.date(2024, 2, 29),
+    ]
+
+    def setUp(self):
+        publisher = Publisher.objects.create(name='publisher')
+        self.books = []
+        for i, pubdate in enumerate(self.dates):
+            book = Book.objects.create(name='book %d' % i, pages=1, price=1, rating=1, publisher=publisher)
+            # pubdate с auto_now_add задается только при изменении.
+            book.pubdate = pubdate
+            book.save()
+            self.books.append(book)
+        self.factory = RequestFactory()
+
+    def rollup(self):
+        return {
+            (row.year, row.month, row.day): row.count
+            for row in DateRollup.objects.filter(model='dja.book', count__gt=0)
+        }
+
+    def context(self, view_class, **kwargs):
+        # Контекст представления с DateRollupMixin и того же представления Django без него.
+        plain_class = type('Plain', (view_class.__bases__[-1],), {
+            key: value for key, value in vars(view_class).items() if not key.startswith('__')
+        })
+        contexts = []
+        for cls in (view_class, plain_class):
+            response = cls.as_view()(self.factory.get('/'), **kwargs)
+            context = response.context_data
+            contexts.append({
+                key: list(value) if key == 'date_list' and value is not None else value
+                for key, value in context.items()
+                if key == 'date_list' or key.startswith(('next_', 'previous_'))
+            })
+        return contexts
+
+    def test_signals(self):
+        self.assertEqual(self.rollup(), {
+            (2022, 12, 31): 1, (2023, 1, 1): 2, (2023, 3, 15): 1, (2023, 8, 1): 1, (2024, 2, 29): 1,
+        })
+        self.books[1].pubdate = datetime.date(2023, 3, 15)
+        self.books[1].save()
+        self.books[0].delete()
+        self.assertEqual(self.rollup(), {
+            (2023, 1, 1): 1, (2023, 3, 15): 2, (2023, 8, 1): 1, (2024, 2, 29): 1,
+        })
+
+    def test_old_value_without_select(self):
+        # Прежняя дата берется из значений, загруженных из БД: save() без SELECT.
+        book = Book.objects.get(pk=self.books[1].pk)
+        book.pubdate = datetime.date(2023, 3, 15)
+        with CaptureQueriesContext(connection) as queries:
+            book.save()
+        self.assertFalse([q['sql'] for q in queries if q['sql'].startswith('SELECT')])
+        book.pubdate = datetime.date(2023, 8, 1)
+        book.save()
+        # Отложенное поле читается одним запросом.
+        deferred = Book.objects.only('name').get(pk=self.books[2].pk)
+        deferred.name = 'renamed'
+        deferred.save()
+        deferred = Book.objects.defer('pubdate').get(pk=self.books[2].pk)
+        deferred.pubdate = datetime.date(2024, 2, 29)
+        deferred.save(update_fields=['pubdate'])
+        self.assertEqual(self.rollup(), {
+            (2022, 12, 31): 1, (2023, 3, 15): 1, (2023, 8, 1): 2, (2024, 2, 29): 2,
+        })
+
+    def test_delete_missing_day(self):
+        # Последняя книга дня: строка удаляется, а не остается с count=0.
+        self.books[4].delete()
+        self.assertFalse(DateRollup.objects.filter(model='dja.book', year=2023, month=8).exists())
+        # Счетчик устарел (до rebuild_date_rollups): не уходит в минус.
+        DateRollup.objects.all().update(count=0)
+        self.books[0].delete()
+        self.assertFalse(DateRollup.objects.filter(model='dja.book', year=2022).exists())
+        DateRollup.objects.all().delete()
+        self.books[1].delete()
+        self.assertFalse(DateRollup.objects.exists())
+
+    def test_migration_backfill(self):
+        # RunPython миграции 0004 на исторических моделях заполняет таблицу как rebuild_date_rollups.
+        DateRollup.objects.all().delete()
+        loader = MigrationLoader(connection)
+        state = loader.project_state(('dja', '0004_daterollup_backfill'), at_end=False)
+        migration = importlib.import_module('dja.migrations.0004_daterollup_backfill')
+        migration.backfill_date_rollups(state.apps, SimpleNamespace(connection=connection))
+        self.assertEqual(self.rollup(), {
+            (2022, 12, 31): 1, (2023, 1, 1): 2, (2023, 3, 15): 1, (2023, 8, 1): 1, (2024, 2, 29): 1,
+        })
+
+    def test_rebuild(self):
+        Book.objects.filter(pubdate__year=2023).update(pubdate=F('pubdate') - datetime.timedelta(days=365))
+        call_command('rebuild_date_rollups', 'dja.Book.pubdate', stdout=open(os.devnull, 'w'))
+        self.assertEqual(self.rollup(), {
+            (2022, 1, 1): 2, (2022, 3, 15): 1, (2022, 8, 1): 1, (2022, 12, 31): 1, (2024, 2, 29): 1,
+        })
+
+    def test_views(self):
+        cases = [
+            (CustomArchiveIndexView, {}),
+            (CustomYearArchiveView, {'year': 2023}),
+            (CustomMonthArchiveView, {'year': 2023, 'month': '03'}),
+            (CustomWeekArchiveView, {'year': 2023, 'week': 0}),
+            (CustomDayArchiveView, {'year': 2023, 'month': 'mar', 'day': 15}),
+        ]
+        for view_class, kwargs in cases:
+            with self.subTest(view_class.__name__):
+                rollup, plain = self.context(view_class, **kwargs)
+                self.assertEqual(rollup, plain)
+
+    def test_no_table_scan(self):
+        with CaptureQueriesContext(connection) as queries:
+            CustomYearArchiveView.as_view()(self.factory.get('/'), year=2023)
+        self.assertFalse(any('dja_book' in query['sql'] for query in queries))
+
+    def test_empty(self):
+        with self.assertRaises(Http404):
+            CustomYearArchiveView.as_view()(self.factory.get('/'), year=2021)
+
+
+from django.apps import apps
+from config.system_check import index_check
+from drf.models import Post
+
+
+class IndexCheckTestCase(SimpleTestCase):
+    def test_warnings(self):
+        warnings = {
+            (warning.id, warning.obj, warning.msg.split(' без индекса')[0])
+            for warning in index_check(None)
+        }
+        self.assertIn(('config.W003', Book, 'date_field pubdate'), warnings)
+        # DateRollupMixin заменяет только date_list и навигацию: object_list
+        # по-прежнему фильтруется и сортируется по date_field.
+        sources = ' '.join(
+            warning.msg for warning in index_check(None) if warning.id == 'config.W003'
+        )
+        self.assertIn('dja.views.CustomArchiveIndexView', sources)
+        self.assertIn('dja.views.CustomYearArchiveView', sources)
+        self.assertIn(('config.W001', Post, 'Фильтр по body'), warnings)
+        # id - первичный ключ, (published, id) покрыт индексом Entry.
+        self.assertNotIn(('config.W001', Post, 'Фильтр по id'), warnings)
+        self.assertFalse([warning for warning in warnings if warning[1] is Entry])
+
+    def test_app_configs(self):
+        warnings = index_check([apps.get_app_config('drf')])
+        self.assertTrue(warnings)
+        self.assertTrue(all(warning.obj._meta.app_label == 'drf' for warning in warnings))
@@ -14,6 +14,7 @@ views_urlpatterns = [
     path('UpdateView/<int:pk>', CustomUpdateView.as_view(), name='class-update-view'),
     path('DeleteView/<int:pk>', CustomDeleteView.as_view(), name='class-delete-view'),
     path('ArchiveIndexView', CustomArchiveIndexView.as_view(), name='class-archive-index-view'),
+    path('EntryArchiveIndexView', EntryArchiveIndexView.as_view(), name='class-entry-archive-index-view'),
     path('YearArchiveView/<int:year>', CustomYearArchiveView.as_view(), name='class-year-archive-view'),
     path('MonthArchiveView/<int:year>/<int:month>', CustomMonthArchiveView.as_view(), name='class-month-archive-view'),
     path('WeekArchiveView/<int:year>/week/<int:week>', CustomWeekArchiveView.as_view(), name='class-week-archive-view'),
@@ -23,14 +24,13 @@ views_urlpatterns = [
 ]
 
 
-from django.views.decorators.cache import cache_page
-
 
 urlpatterns = [
     path('blog/', blog_list, name='blog_list'),
     # path('blog/', BlogListView.as_view(), name='blog_list'),
     path('blog/create/', BlogCreateView.as_view()),
-    path('cached_page/', cache_page(60 * 15)(cached_page)),
+    path('blog/<int:blog_id>/', blog_front_page),
+    path('cached_page/', cached_page),
     path('log', logging_view),
     path('', TemplateView.as_view(template_name='index.html')),
     path('upload_file', upload_file),
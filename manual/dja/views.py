@@ -9,7 +9,10 @@ import asyncio
 
 from datetime import date
 
-from .models import Author, Book
+from .models import Author, Book, Entry
+from .cache import CachedViewMixin, cache_view
+from .pagination import KeysetPaginationMixin
+from .rollups import DateRollupMixin
 
 """
 Decorators (Декораторы)
@@ -237,9 +240,10 @@ class CustomDetailView(generic.DetailView):
 Содержит список обьектов (self.object_list) над которыми работает представление.
 """
 
-class CustomListView(generic.ListView):
+class CustomListView(CachedViewMixin, generic.ListView):
     template_name = 'object-list.html'
     model = Author
+    cache_timeout = 60 * 60 * 24
 
 
 """
@@ -320,9 +324,11 @@ class CustomDeleteView(generic.DeleteView):
 
 Контекст:
     - date_list - QuerySet обьект, содержащий все годы, в которых есть обьекты.
+
+Custom*ArchiveView читают date_list, next_* и previous_* из таблицы DateRollup (dja/rollups.py).
 """
 
-class CustomArchiveIndexView(generic.ArchiveIndexView):
+class CustomArchiveIndexView(DateRollupMixin, generic.ArchiveIndexView):
     model = Book
     date_field = 'pubdate'
     template_name = 'object-list.html'
@@ -345,7 +351,7 @@ class CustomArchiveIndexView(generic.ArchiveIndexView):
     - previous_year - date обьект, представляющий первый день предыдущего года в соотв. с allow_empty и allow_future.
 """
 
-class CustomYearArchiveView(generic.YearArchiveView):
+class CustomYearArchiveView(DateRollupMixin, generic.YearArchiveView):
     queryset = Book.objects.all()
     date_field = 'pubdate'
     make_object_list = True
@@ -360,7 +366,7 @@ class CustomYearArchiveView(generic.YearArchiveView):
 Страница ежемесячного архива, показывающая все обьекты за определенный месяц.
 """
 
-class CustomMonthArchiveView(generic.MonthArchiveView):
+class CustomMonthArchiveView(DateRollupMixin, generic.MonthArchiveView):
     template_name = 'object-list.html'
     queryset = Book.objects.all()
     date_field = 'pubdate'
@@ -374,7 +380,7 @@ class CustomMonthArchiveView(generic.MonthArchiveView):
 Страница еженедельного архива, показывающая все обьекты за данную неделю.
 """
 
-class CustomWeekArchiveView(generic.WeekArchiveView):
+class CustomWeekArchiveView(DateRollupMixin, generic.WeekArchiveView):
     template_name = 'object-list.html'
     queryset = Book.objects.all()
     date_field = 'pubdate'
@@ -387,7 +393,7 @@ class CustomWeekArchiveView(generic.WeekArchiveView):
 Страница архива дня, показывающая все обьекты за определенный день.
 """
 
-class CustomDayArchiveView(generic.DayArchiveView):
+class CustomDayArchiveView(DateRollupMixin, generic.DayArchiveView):
     template_name = 'object-list.html'
     queryset = Book.objects.all()
     date_field = 'pubdate'
@@ -399,7 +405,7 @@ class CustomDayArchiveView(generic.DayArchiveView):
 Страница архива дня, показывающая все обьекты за сегодня.
 """
 
-class CustomTodayArchiveView(generic.TodayArchiveView):
+class CustomTodayArchiveView(DateRollupMixin, generic.TodayArchiveView):
     template_name = 'object-list.html'
     queryset = Book.objects.all()
     date_field = 'pubdate'
@@ -417,6 +423,20 @@ class CustomDateDetailView(generic.DateDetailView):
     date_field = 'pubdate'
 
 
+"""
+Keyset пагинация архива по дате.
+
+Страницы выбираются условием по (published, id) вместо OFFSET, поэтому 
+скорость не зависит от глубины страницы (см. dja/pagination.py).
+"""
+
+class EntryArchiveIndexView(KeysetPaginationMixin, generic.ArchiveIndexView):
+    model = Entry
+    date_field = 'published'
+    paginate_by = 20
+    template_name = 'object-list.html'
+
+
 """
 17. LoginView
 
@@ -591,7 +611,8 @@ def logging_view(request):
 from django.views.decorators.cache import cache_page
 
 
-# @cache_page(60 * 15)
+# Ответ сбрасывается при изменении Author (dja/cache.py), поэтому таймаут может быть большим.
+@cache_view(60 * 60 * 24, tags=[Author])
 def cached_page(request, *args, **kwargs):
     a = Author.objects.all()
     return HttpResponse(a)
@@ -610,11 +631,26 @@ class BlogCreateView(generic.CreateView):
 
 "<script>console.log('OK')</script>"
 
-class BlogListView(generic.ListView):
+class BlogListView(CachedViewMixin, generic.ListView):
     model = Blog
     template_name = 'object-list.html'
+    cache_timeout = 60 * 60 * 24
 
 
 def blog_list(request):
     b = Blog.objects.all()
     return HttpResponse([i.name + ' ' for i in b])
+
+
+from django.views.decorators.http import condition
+from .decorators import entry_last_modified
+
+
+# 304 отдается по времени изменения из кэша, без запроса к БД.
+@condition(
+    etag_func=entry_last_modified.etag_func('blog_id'),
+    last_modified_func=entry_last_modified.last_modified_func('blog_id'),
+)
+def blog_front_page(request, blog_id):
+    entries = Entry.objects.filter(blog=blog_id).order_by('-published')[:10]
+    return HttpResponse([str(entry.published) + ' ' for entry in entries])
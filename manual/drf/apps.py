@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class DrfConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'drf'
+
+    def ready(self) -> None:
+        # Подключение сигналов сброса кэша токенов и списка блокировки.
+        from . import authentication, permissions
+
+        return super().ready()
@@ -4,18 +4,143 @@ from rest_framework.response import Response
 from django.contrib.auth.models import User
 from rest_framework import authentication
 from rest_framework import exceptions
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+# Кэширование токенов.
+# TokenAuthentication на каждый запрос выполняет SELECT Token JOIN User.
+# CachedTokenAuthentication хранит пару (user, token):
+#   1. в памяти процесса (LRU на local_cache_size записей, живет local_timeout 
+#      секунд, т.к. сигналы из других процессов сюда не доходят);
+#   2. в кэше 'shared', общем для всех процессов, на cache_timeout секунд.
+# Ключ кэша - sha256 токена, а не сам токен. Записи удаляются сигналами 
+# post_save/post_delete моделей Token и User, поэтому в установившемся режиме 
+# аутентификация не обращается к БД. Сигнал в одном процессе удаляет запись из
+# общего кэша, остальные процессы увидят изменение через local_timeout секунд.
+# Каждый запрос получает копию user и token без кэшей прав (_perm_cache и др.), 
+# чтобы изменения обьекта в одном запросе не попадали в другие.
+def token_cache_key(key):
+    return 'auth-token:%s' % hashlib.sha256(key.encode()).hexdigest()
+
+
+def user_token_cache_key(user_id):
+    return 'auth-token-user:%s' % user_id
+
+
+def get_cache():
+    return caches['shared']
+
+
+class LocalLRUCache:
+    def __init__(self, size, timeout):
+        self.size, self.timeout = size, timeout
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.data.get(key)
+            if item is None or item[0] < time.monotonic():
+                self.data.pop(key, None)
+                return None
+            self.data.move_to_end(key)
+            return item[1]
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = (time.monotonic() + self.timeout, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.size:
+                self.data.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+# Атрибуты, которые ModelBackend и запрос добавляют пользователю.
+USER_CACHE_ATTRS = ('_perm_cache', '_user_perm_cache', '_group_perm_cache')
+
+
+def copy_credentials(credentials):
+    user, token = credentials
+    user = copy.copy(user)
+    for attr in USER_CACHE_ATTRS:
+        user.__dict__.pop(attr, None)
+    token = copy.copy(token)
+    token.user = user
+    return user, token
+
+
+class CachedTokenAuthentication(authentication.TokenAuthentication):
+    cache_timeout = 300
+    local_cache = LocalLRUCache(size=1024, timeout=5)
+
+    def authenticate_credentials(self, key):
+        cache_key = token_cache_key(key)
+        credentials = self.local_cache.get(cache_key)
+        if credentials is None:
+            cache = get_cache()
+            credentials = cache.get(cache_key)
+            if credentials is None:
+                credentials = super().authenticate_credentials(key)
+                cache.set(cache_key, credentials, self.cache_timeout)
+                cache.set(user_token_cache_key(credentials[1].user_id), key, self.cache_timeout)
+            self.local_cache.set(cache_key, credentials)
+
+        user, token = copy_credentials(credentials)
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        return (user, token)
+
+
+def invalidate_token(key):
+    cache_key = token_cache_key(key)
+    get_cache().delete(cache_key)
+    CachedTokenAuthentication.local_cache.delete(cache_key)
+
+
+@receiver([post_save, post_delete], sender=Token)
+def token_changed(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+    get_cache().delete(user_token_cache_key(instance.user_id))
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    key = get_cache().get(user_token_cache_key(instance.pk))
+    if key is not None:
+        invalidate_token(key)
 
 
 # Возврат дополнительной информации о пользователе помимо token.
+# Ключ токена пользователя берется из кэша, get_or_create() только при промахе.
 class CustomAuthToken(ObtainAuthToken):
     def post(self, request, *args, **kwargs):
         serializer = self.serializer_class(data=request.data,
                                            context={'request': request})
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data['user']
-        token, created = Token.objects.get_or_create(user=user)
+        cache = get_cache()
+        key = cache.get(user_token_cache_key(user.pk))
+        if key is None:
+            token, created = Token.objects.get_or_create(user=user)
+            key = token.key
+            cache.set(user_token_cache_key(user.pk), key, CachedTokenAuthentication.cache_timeout)
         return Response({
-            'token': token.key,
+            'token': key,
             'user_id': user.pk,
             'email': user.email
         })
@@ -0,0 +1,45 @@
+import ipaddress
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from drf.models import Blocklist
+from drf.permissions import blocklist_index, invalidate_blocklist
+
+
+# Запрос к БД на каждую проверку адреса против индекса BlocklistIndex в памяти.
+# Записи создаются в транзакции, которая в конце откатывается.
+class Command(BaseCommand):
+    help = 'Сравнивает проверку IP по Blocklist запросом к БД и через BlocklistIndex.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+        parser.add_argument('--lookups', type=int, default=1000)
+
+    def handle(self, *args, rows, lookups, **options):
+        addresses = [str(ipaddress.IPv4Address(i * 13)) for i in range(lookups)]
+        with transaction.atomic():
+            Blocklist.objects.bulk_create(
+                [Blocklist(network=str(ipaddress.IPv4Address(i * 7))) for i in range(rows)],
+                batch_size=5000
+            )
+            invalidate_blocklist()
+
+            started = time.perf_counter()
+            expected = [Blocklist.objects.filter(network=ip).exists() for ip in addresses]
+            query_time = time.perf_counter() - started
+
+            blocklist_index.get_intervals()
+            started = time.perf_counter()
+            result = [blocklist_index.is_blocked(ip) for ip in addresses]
+            index_time = time.perf_counter() - started
+
+            transaction.set_rollback(True)
+        invalidate_blocklist()
+
+        if result != expected:
+            self.stderr.write('Результаты БД и индекса не совпадают.')
+        self.stdout.write('БД: %.1f мс, индекс: %.1f мс (%d адресов, %d записей)' % (
+            query_time * 1000, index_time * 1000, lookups, rows
+        ))
@@ -1,3 +1,6 @@
+import ipaddress
+
+from django.core.exceptions import ValidationError
 from django.db import models
 
 
@@ -46,3 +49,19 @@ class Track(models.Model):
     
     def __str__(self) -> str:
         return f'{self.order} {self.title}'
+
+
+# Список блокировки IP адресов для BlocklistPermission.
+# network - IP адрес или подсеть в нотации CIDR: 10.0.0.1, 10.0.0.0/8, 2001:db8::/32.
+class Blocklist(models.Model):
+    network = models.CharField(max_length=43, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def clean(self):
+        try:
+            self.network = str(ipaddress.ip_network(self.network, strict=False))
+        except ValueError as e:
+            raise ValidationError({'network': str(e)})
+
+    def __str__(self) -> str:
+        return self.network
@@ -1,8 +1,26 @@
 from rest_framework.pagination import (
     PageNumberPagination, LimitOffsetPagination, CursorPagination,
-    BasePagination
+    BasePagination, Cursor
 )
 from rest_framework.response import Response
+from rest_framework.exceptions import NotFound
+from rest_framework.utils.urls import replace_query_param
+
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import (
+    Paginator as DjangoPaginator, Page, EmptyPage, PageNotAnInteger
+)
+from django.db import connections
+from django.db.models import BooleanField, Expression, F, Q, Value
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+
+from dja.pagination import KeysetTokenEncoder
+
+import hashlib
+import json
+from base64 import b64decode, b64encode
 
 
 class LargeResultsSetPagination(PageNumberPagination):
@@ -26,7 +44,269 @@ class CustomCursorPagination(CursorPagination):
     ordering = '-id'
 
 
-class CustomPagination(PageNumberPagination):
+# Сравнение строк (row value): (published, id) < (%s, %s).
+# В отличие от цепочки OR, такое условие БД использует как диапазон индекса.
+class RowValueCompare(Expression):
+    output_field = BooleanField()
+    conditional = True
+
+    def __init__(self, fields, operator, values):
+        super().__init__()
+        self.fields, self.operator, self.values = fields, operator, values
+
+    def resolve_expression(self, query=None, allow_joins=True, reuse=None, summarize=False, for_save=False):
+        c = self.copy()
+        c.lhs = [
+            F(field).resolve_expression(query, allow_joins, reuse, summarize)
+            for field in self.fields
+        ]
+        c.rhs = [
+            Value(value, output_field=column.output_field)
+            for column, value in zip(c.lhs, self.values)
+        ]
+        return c
+
+    def as_sql(self, compiler, connection):
+        lhs, rhs, params = [], [], []
+        for columns, sql_list in ((self.lhs, lhs), (self.rhs, rhs)):
+            for column in columns:
+                sql, column_params = compiler.compile(column)
+                sql_list.append(sql)
+                params.extend(column_params)
+        return '(%s) %s (%s)' % (', '.join(lhs), self.operator, ', '.join(rhs)), params
+
+
+# Курсорная пагинация по составной неуникальной сортировке.
+# CursorPagination хранит в курсоре значение одного поля и смещение (offset) 
+# для совпадающих значений. Здесь курсор хранит позицию (field, pk) целиком, 
+# а следующая страница выбирается условием (field, pk) < (:field, :pk) 
+# LIMIT page_size + 1. Скорость не зависит от глубины страницы, если есть 
+# индекс по (field, pk).
+# Даты в курсоре хранятся с микросекундами (KeysetTokenEncoder), 
+# иначе строки внутри одной миллисекунды пропускаются.
+class CompositeCursorPagination(CursorPagination):
+    page_size = 10
+    ordering = '-id'
+
+    def get_ordering(self, request, queryset, view):
+        ordering = list(super().get_ordering(request, queryset, view))
+        names = {field.lstrip('-') for field in ordering}
+        if not names & {'pk', 'id', queryset.model._meta.pk.name}:
+            ordering.append('-pk' if ordering[0].startswith('-') else 'pk')
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = bool(self.cursor and self.cursor.reverse)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = [f[1:] if f.startswith('-') else '-' + f for f in ordering]
+        queryset = queryset.order_by(*ordering)
+        if self.cursor:
+            position = self.parse_position(queryset.model, self.cursor.position)
+            queryset = queryset.filter(self.seek_filter(ordering, position))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+        self.has_next = has_more if not reverse else True
+        self.has_previous = has_more if reverse else self.cursor is not None
+        return self.page
+
+    def seek_filter(self, ordering, position):
+        names = [field.lstrip('-') for field in ordering]
+        directions = {field.startswith('-') for field in ordering}
+        if len(directions) == 1:
+            return RowValueCompare(names, '<' if directions.pop() else '>', position)
+        # Разные направления сортировки: a > :a OR (a = :a AND b < :b).
+        condition = Q()
+        for i, field in enumerate(ordering):
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            step = Q(**{'%s__%s' % (names[i], lookup): position[i]})
+            step &= Q(**dict(zip(names[:i], position[:i])))
+            condition |= step
+        return condition
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            padding = '=' * (-len(encoded) % 4)
+            data = json.loads(b64decode(encoded + padding, altchars=b'-_'))
+            position, reverse = data['p'], bool(data.get('r'))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return Cursor(offset=0, reverse=reverse, position=position)
+
+    def parse_position(self, model, position):
+        # Строки из JSON обратно в значения полей (datetime для DateTimeField).
+        values = []
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            try:
+                model_field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+                values.append(model_field.to_python(value))
+            except FieldDoesNotExist:
+                values.append(value)
+            except ValidationError:
+                raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def encode_cursor(self, cursor):
+        data = json.dumps({'p': cursor.position, 'r': int(cursor.reverse)}, cls=KeysetTokenEncoder)
+        encoded = b64encode(data.encode(), altchars=b'-_').decode().rstrip('=')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_position(self, instance):
+        return [getattr(instance, field.lstrip('-')) for field in self.ordering]
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(
+            Cursor(offset=0, reverse=False, position=self.get_position(self.page[-1]))
+        )
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(
+            Cursor(offset=0, reverse=True, position=self.get_position(self.page[0]))
+        )
+
+
+# Лента записей по дате публикации. Индекс (published, id) есть у Entry.
+class EntryFeedPagination(CompositeCursorPagination):
+    page_size = 100
+    ordering = '-published'
+
+
+class CountlessPage(Page):
+    # Страница без COUNT(*): наличие следующей страницы определяется лишней 
+    # (per_page + 1) строкой.
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+
+class CountPaginator(DjangoPaginator):
+    """
+    count_func - функция подсчета кол-ва обьектов. Если None, то COUNT(*) не 
+    выполняется совсем, count = None.
+    """
+
+    def __init__(self, object_list, per_page, count_func=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_func = count_func
+        self.last_page_number = 1
+
+    @cached_property
+    def count(self):
+        return self.count_func() if self.count_func else None
+
+    @property
+    def num_pages(self):
+        if self.count is None:
+            # Известны только уже просмотренные страницы.
+            return self.last_page_number
+        return super().num_pages
+
+    def page(self, number):
+        if self.count_func:
+            return super().page(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(_('That page number is not an integer'))
+        if number < 1:
+            raise EmptyPage(_('That page number is less than 1'))
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage(_('That page contains no results'))
+        has_next = len(rows) > self.per_page
+        self.last_page_number = number + 1 if has_next else number
+        return CountlessPage(rows[:self.per_page], number, self, has_next)
+
+
+# Пагинация без COUNT(*) на каждый запрос. На больших таблицах COUNT(*) 
+# дороже самого запроса страницы.
+# count_mode:
+#   - 'exact' - обычный COUNT(*);
+#   - 'cached' - COUNT(*) кэшируется на count_cache_timeout секунд, ключ 
+#     строится из SQL запроса (учитывает фильтры);
+#   - 'estimate' - оценка планировщика (EXPLAIN) для PostgreSQL. Если оценка 
+#     меньше estimate_threshold или БД не поддерживает оценку, то 'cached'.
+# Параметр ?count=false отключает подсчет: count = null, next по лишней строке.
+class CountModePagination(PageNumberPagination):
+    page_size = 10
+    count_mode = 'cached'
+    count_cache_timeout = 60
+    estimate_threshold = 10000
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count_request = request
+        return super().paginate_queryset(queryset, request, view)
+
+    def django_paginator_class(self, queryset, page_size):
+        return CountPaginator(
+            queryset, page_size, count_func=self.get_count_func(queryset)
+        )
+
+    def get_count_func(self, queryset):
+        value = self.count_request.query_params.get(self.count_query_param, '')
+        if value.lower() in ('false', '0', 'no'):
+            return None
+        if self.count_mode == 'exact':
+            return queryset.count
+        if self.count_mode == 'estimate':
+            return lambda: self.get_estimated_count(queryset)
+        return lambda: self.get_cached_count(queryset)
+
+    def get_cached_count(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        key = 'pagination-count:%s' % hashlib.md5(
+            ('%s:%s:%r' % (queryset.db, sql, params)).encode()
+        ).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, self.count_cache_timeout)
+        return count
+
+    def get_estimated_count(self, queryset):
+        if connections[queryset.db].vendor != 'postgresql':
+            return self.get_cached_count(queryset)
+        plan = json.loads(queryset.explain(format='json'))
+        estimate = int(plan[0]['Plan']['Plan Rows'])
+        if estimate < self.estimate_threshold:
+            return self.get_cached_count(queryset)
+        return estimate
+
+
+class CustomPagination(CountModePagination):
     def get_paginated_response(self, data):
         return Response({
             'links': {
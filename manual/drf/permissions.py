@@ -1,4 +1,14 @@
 from rest_framework import permissions
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Blocklist
+
+import bisect
+import ipaddress
+import threading
+import time
 
 
 class ReadOnly(permissions.BasePermission):
@@ -12,7 +22,109 @@ class CustomerAccessPermission(permissions.BasePermission):
     message = 'Сообщение об ошибке'
 
 
-Blocklist = '' # Тестовая модель
+# Список блокировки IP адресов.
+# Вместо запроса к БД на каждый запрос все записи Blocklist один раз загружаются
+# в память процесса и сводятся в отсортированные непересекающиеся интервалы
+# [начало, конец] целых чисел (отдельно для IPv4 и IPv6). Поиск адреса - бинарный
+# поиск (bisect) за O(log n), подсети CIDR поддерживаются.
+# Актуальность проверяется по номеру версии в кэше 'shared' (общем для всех
+# процессов) не чаще раза в check_interval секунд. Версию увеличивают сигналы
+# post_save/post_delete модели Blocklist; после bulk_create/update вызвать
+# invalidate_blocklist() вручную.
+BLOCKLIST_VERSION_KEY = 'blocklist-version'
+
+
+def get_cache():
+    return caches['shared']
+
+
+def invalidate_blocklist():
+    cache = get_cache()
+    try:
+        cache.incr(BLOCKLIST_VERSION_KEY)
+    except ValueError:
+        # Начальная версия - время в мс, чтобы после вытеснения ключа
+        # версия не совпала с той, что уже загружена в других процессах.
+        if not cache.add(BLOCKLIST_VERSION_KEY, time.time_ns() // 1000000, None):
+            cache.incr(BLOCKLIST_VERSION_KEY)
+    blocklist_index.reload()
+
+
+def parse_ip(ip_addr):
+    try:
+        address = ipaddress.ip_address(ip_addr)
+    except ValueError:
+        return None
+    if address.version == 6 and address.ipv4_mapped:
+        address = address.ipv4_mapped
+    return address
+
+
+class BlocklistIndex:
+    check_interval = 1
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.intervals = None
+        self.version = None
+        self.checked_at = 0
+
+    def load(self):
+        # Один запрос, строки читаются частями через iterator().
+        ranges = {4: [], 6: []}
+        networks = Blocklist.objects.values_list('network', flat=True)
+        for network in networks.iterator(chunk_size=10000):
+            try:
+                network = ipaddress.ip_network(network, strict=False)
+            except ValueError:
+                continue
+            ranges[network.version].append(
+                (int(network.network_address), int(network.broadcast_address))
+            )
+        intervals = {}
+        for version, items in ranges.items():
+            starts, ends = [], []
+            for start, end in sorted(items):
+                # Объединение пересекающихся и соседних интервалов.
+                if ends and start <= ends[-1] + 1:
+                    ends[-1] = max(ends[-1], end)
+                else:
+                    starts.append(start)
+                    ends.append(end)
+            intervals[version] = (starts, ends)
+        return intervals
+
+    def reload(self):
+        with self.lock:
+            self.intervals = None
+
+    def get_intervals(self):
+        now = time.monotonic()
+        if self.intervals is not None and now - self.checked_at < self.check_interval:
+            return self.intervals
+        with self.lock:
+            version = get_cache().get(BLOCKLIST_VERSION_KEY)
+            if self.intervals is None or version != self.version:
+                self.intervals, self.version = self.load(), version
+            self.checked_at = now
+            return self.intervals
+
+    def is_blocked(self, ip_addr):
+        address = parse_ip(ip_addr)
+        if address is None:
+            return False
+        starts, ends = self.get_intervals()[address.version]
+        number = int(address)
+        i = bisect.bisect_right(starts, number) - 1
+        return i >= 0 and number <= ends[i]
+
+
+blocklist_index = BlocklistIndex()
+
+
+@receiver([post_save, post_delete], sender=Blocklist)
+def blocklist_changed(sender, **kwargs):
+    invalidate_blocklist()
 
 
 # Проверяет IP-адрес входящего запроса по списку блокировки и отклоняет запрос, 
@@ -20,7 +132,7 @@ Blocklist = '' # Тестовая модель
 class BlocklistPermission(permissions.BasePermission):
     def has_permission(self, request, view):
         ip_addr = request.META['REMOTE_ADDR']
-        blocked = Blocklist.objects.filter(ip_addr=ip_addr).exists()
+        blocked = blocklist_index.is_blocked(ip_addr)
         return not blocked
 
 
@@ -2,7 +2,7 @@ from rest_framework.renderers import (
     BrowsableAPIRenderer, JSONRenderer, BaseRenderer
 )
 
-from django.utils.encoding import smart_text
+from django.utils.encoding import smart_str
 
 
 # Использование HTML формат возврата по умолчанию, JSON в просматриваемом API.
@@ -19,7 +19,25 @@ class PlainTextRenderer(BaseRenderer):
                             # двоичное содержимое в виде строки.
 
     def render(self, data, accepted_media_type=None, renderer_context=None):
-        # return smart_text(data, encoding=self.charset)
+        # return smart_str(data, encoding=self.charset)
         # return data.encode(self.charset) # При использовании charset.
         return data # При использовании render_style.
 
+
+
+# Newline delimited JSON: один обьект на строку. Используется потоковыми
+# списками (StreamingListMixin), render() нужен для обычных ответов.
+class NDJSONRenderer(BaseRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if not isinstance(data, list):
+            data = [data]
+        return b''.join(
+            JSONRenderer().render(item) + b'\n' for item in data
+        )
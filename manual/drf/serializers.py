@@ -8,11 +8,93 @@ from rest_framework.validators import (
 from .models import Task, Subtask, Album, Track, Post, DataPoint
 
 from django.contrib.auth.models import User
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections, router, transaction
+from django.db.models.constants import LOOKUP_SEP
 from django.utils import timezone
 
 import re
 
 import time
+import logging
+from contextlib import contextmanager
+
+
+logger = logging.getLogger(__name__)
+
+
+# Жадная загрузка связей для вложенных сериализаторов (защита от N+1).
+# Обходит дерево полей сериализатора и собирает пути для select_related 
+# (ForeignKey, OneToOne) и prefetch_related (обратные ForeignKey, ManyToMany).
+# Все, что находится ниже prefetch пути, тоже загружается через prefetch.
+def get_eager_loading_lookups(serializer, model=None, prefix='', prefetch=False):
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    model = model or serializer.Meta.model
+    select_lookups, prefetch_lookups = set(), set()
+
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if field.source == '*':
+            # Поле сериализует тот же обьект, связи ищутся на том же уровне.
+            if isinstance(field, serializers.BaseSerializer):
+                select, related = get_eager_loading_lookups(
+                    field, model, prefix, prefetch
+                )
+                select_lookups |= select
+                prefetch_lookups |= related
+            continue
+
+        nested = field.child if isinstance(field, serializers.ListSerializer) else field
+        # Для ForeignKey с PrimaryKeyRelatedField достаточно <field>_id.
+        needs_object = not isinstance(field, serializers.PrimaryKeyRelatedField)
+        path, path_model, path_prefetch = prefix, model, prefetch
+        for i, attr in enumerate(field.source_attrs):
+            try:
+                model_field = path_model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                # Свойство или метод модели, дальше связи неизвестны.
+                path_model = None
+                break
+            if not model_field.is_relation:
+                path_model = None
+                break
+            if i == len(field.source_attrs) - 1 and not needs_object:
+                path_model = None
+                break
+            path = LOOKUP_SEP.join(filter(None, [path, attr]))
+            path_prefetch = path_prefetch or model_field.many_to_many or model_field.one_to_many
+            (prefetch_lookups if path_prefetch else select_lookups).add(path)
+            path_model = model_field.related_model
+
+        if path_model is not None and isinstance(nested, serializers.BaseSerializer):
+            select, related = get_eager_loading_lookups(
+                nested, path_model, path, path_prefetch
+            )
+            select_lookups |= select
+            prefetch_lookups |= related
+
+    return select_lookups, prefetch_lookups
+
+
+def apply_eager_loading(queryset, serializer):
+    select_lookups, prefetch_lookups = get_eager_loading_lookups(
+        serializer, queryset.model
+    )
+    if select_lookups:
+        queryset = queryset.select_related(*sorted(select_lookups))
+    if prefetch_lookups:
+        queryset = queryset.prefetch_related(*sorted(prefetch_lookups))
+    return queryset
+
+
+class EagerLoadingMixin:
+    # Использование в функциях представлениях:
+    # queryset = TaskSerializer.setup_eager_loading(Task.objects.all())
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        return apply_eager_loading(queryset, cls())
 
 
 def max_len_32(value):
@@ -86,30 +168,72 @@ class TestUserSerializer(serializers.ModelSerializer):
         return instance
 
 
+# Массовое обновление списка: вместо save()/delete() на каждый обьект 
+# выполняется один bulk_create() для новых id, один bulk_update() только 
+# для измененных полей и один delete() для удаленных id.
+# Удаляются все обьекты instance, которых нет в данных, поэтому передавать 
+# нужно только проверенный queryset (см. PostBulkUpdateAPIView).
+# После update() в bulk_stats хранятся кол-во строк и время каждой фазы:
+# {'create': {'rows': 10, 'seconds': 0.01}, 'update': {...}, 'delete': {...}}
 class CustomListSerializer(serializers.ListSerializer):
+    model = Post
+    # Размер пачки для bulk_create()/bulk_update(). None - одним запросом.
+    batch_size = None
+
     def create(self, validated_data):
-        posts = [Post(**item) for item in validated_data]
-        return Post.objects.bulk_create(posts)
-    
+        posts = [self.model(**item) for item in validated_data]
+        return self.model.objects.bulk_create(posts, batch_size=self.batch_size)
+
     def update(self, instance, validated_data):
         book_mapping = {book.id: book for book in instance}
         data_mapping = {item['id']: item for item in validated_data}
+        self.bulk_stats = {}
 
-        # Perform creations and updates.
-        ret = []
+        to_create, to_update, changed_fields = [], [], set()
         for book_id, data in data_mapping.items():
             book = book_mapping.get(book_id, None)
             if book is None:
-                ret.append(self.child.create(data))
-            else:
-                ret.append(self.child.update(book, data))
-
-        # Perform deletions.
-        for book_id, book in book_mapping.items():
-            if book_id not in data_mapping:
-                book.delete()
-
-        return ret
+                to_create.append(self.model(**data))
+                continue
+            changed = {
+                field for field, value in data.items()
+                if getattr(book, field) != value
+            }
+            for field in changed:
+                setattr(book, field, data[field])
+            if changed:
+                to_update.append(book)
+                changed_fields |= changed
+        delete_ids = [book_id for book_id in book_mapping if book_id not in data_mapping]
+
+        with transaction.atomic():
+            with self.bulk_phase('delete', len(delete_ids)):
+                if delete_ids:
+                    self.model.objects.filter(id__in=delete_ids).delete()
+            with self.bulk_phase('update', len(to_update)):
+                if to_update:
+                    self.model.objects.bulk_update(
+                        to_update, sorted(changed_fields), batch_size=self.batch_size
+                    )
+            with self.bulk_phase('create', len(to_create)):
+                created = self.model.objects.bulk_create(
+                    to_create, batch_size=self.batch_size
+                )
+
+        logger.info('%s bulk update: %r', self.model.__name__, self.bulk_stats)
+        return [
+            book_mapping[book_id] for book_id in data_mapping if book_id in book_mapping
+        ] + created
+
+    @contextmanager
+    def bulk_phase(self, name, rows):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.bulk_stats[name] = {
+                'rows': rows, 'seconds': time.monotonic() - start
+            }
 
 
 class CustomSerializer(serializers.Serializer):
@@ -119,6 +243,16 @@ class CustomSerializer(serializers.Serializer):
         list_serializer_class = CustomListSerializer
 
 
+# Массовый PUT списка Post: PostBulkSerializer(posts, data=data, many=True).
+class PostBulkSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField()
+
+    class Meta:
+        model = Post
+        fields = ['id', 'body']
+        list_serializer_class = CustomListSerializer
+
+
 class HighScoreSerializer(serializers.BaseSerializer):
     # Сериализатор только для чтения.
     def to_representation(self, instance):
@@ -324,7 +458,7 @@ class SubtaskSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class TaskSerializer(serializers.HyperlinkedModelSerializer):
+class TaskSerializer(EagerLoadingMixin, serializers.HyperlinkedModelSerializer):
     title = serializers.CharField(error_messages={
         'blank': 'Ошибка'
     })
@@ -355,20 +489,121 @@ class TrackSerializer(serializers.ModelSerializer):
         exclude = ['album']
 
 
-class AlbumSerializer(serializers.HyperlinkedModelSerializer):
+# Запись вложенных сериализаторов пачками вместо create() на каждый обьект.
+# bulk_nested_fields - {имя вложенного поля (many=True): имя ForeignKey на родителя}.
+# Создание: один bulk_create на каждый уровень вложенности (включая many=True 
+# для родителя через BulkNestedListSerializer). Родители, на которые ссылаются
+# вложенные обьекты, создаются через create(), если их один или если БД не
+# возвращает pk из bulk_create (MySQL), иначе дочерние получили бы album=None.
+# Обновление: дочерние обьекты сравниваются по ключу unique_together без 
+# ForeignKey на родителя (для Track это order), затем один delete() для 
+# удаленных, один bulk_update() для измененных полей, один bulk_create() для новых.
+# Все выполняется в одной транзакции.
+class BulkNestedWriteMixin:
+    bulk_nested_fields = {}
+
+    def pop_nested_data(self, validated_data):
+        return {
+            name: validated_data.pop(name)
+            for name in self.bulk_nested_fields if name in validated_data
+        }
+
+    def get_nested_key(self, name):
+        model = self.fields[name].child.Meta.model
+        fk_name = self.bulk_nested_fields[name]
+        for fields in model._meta.unique_together:
+            if fk_name in fields:
+                return tuple(field for field in fields if field != fk_name)
+        # Без unique_together обьекты сравниваются по id (если он передан).
+        return ('id',)
+
+    def create(self, validated_data):
+        with transaction.atomic():
+            return self.bulk_create_nested([validated_data])[0]
+
+    def create_parents(self, validated_list):
+        ModelClass = self.Meta.model
+        manager = ModelClass._default_manager
+        features = connections[router.db_for_write(ModelClass)].features
+        if len(validated_list) > 1 and features.can_return_rows_from_bulk_insert:
+            return manager.bulk_create([ModelClass(**data) for data in validated_list])
+        return [manager.create(**data) for data in validated_list]
+
+    def bulk_create_nested(self, validated_list):
+        nested_list = [self.pop_nested_data(data) for data in validated_list]
+        instances = self.create_parents(validated_list)
+        for name, fk_name in self.bulk_nested_fields.items():
+            child = self.fields[name].child
+            items = [
+                dict(item, **{fk_name: instance})
+                for instance, nested in zip(instances, nested_list)
+                for item in nested.get(name, [])
+            ]
+            if isinstance(child, BulkNestedWriteMixin):
+                child.bulk_create_nested(items)
+            else:
+                model = child.Meta.model
+                model._default_manager.bulk_create([model(**item) for item in items])
+        return instances
+
+    def update(self, instance, validated_data):
+        nested = self.pop_nested_data(validated_data)
+        with transaction.atomic():
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            if validated_data:
+                instance.save(update_fields=list(validated_data))
+            # При partial=True не переданные вложенные поля не меняются.
+            for name, items in nested.items():
+                self.bulk_update_nested(instance, name, items)
+        return instance
+
+    def bulk_update_nested(self, instance, name, items):
+        model = self.fields[name].child.Meta.model
+        manager = model._default_manager
+        fk_name = self.bulk_nested_fields[name]
+        key = self.get_nested_key(name)
+        existing = {
+            tuple(getattr(obj, field) for field in key): obj
+            for obj in manager.filter(**{fk_name: instance})
+        }
+
+        to_create, to_update, changed_fields = [], [], set()
+        for item in items:
+            obj = existing.pop(tuple(item.get(field) for field in key), None)
+            if obj is None:
+                to_create.append(model(**dict(item, **{fk_name: instance})))
+                continue
+            changed = {field for field, value in item.items() if getattr(obj, field) != value}
+            for field in changed:
+                setattr(obj, field, item[field])
+            if changed:
+                to_update.append(obj)
+                changed_fields |= changed
+
+        # Оставшиеся в existing обьекты отсутствуют в данных.
+        if existing:
+            manager.filter(pk__in=[obj.pk for obj in existing.values()]).delete()
+        if to_update:
+            manager.bulk_update(to_update, sorted(changed_fields))
+        if to_create:
+            manager.bulk_create(to_create)
+
+
+class BulkNestedListSerializer(serializers.ListSerializer):
+    def create(self, validated_data):
+        with transaction.atomic():
+            return self.child.bulk_create_nested(validated_data)
+
+
+class AlbumSerializer(BulkNestedWriteMixin, serializers.HyperlinkedModelSerializer):
     tracks = TrackSerializer(many=True)
+    bulk_nested_fields = {'tracks': 'album'}
 
     class Meta:
         model = Album
         fields = '__all__'
 
-    def create(self, validated_data):
-        tracks = validated_data.pop('tracks')
-        album = Album.objects.create(**validated_data)
-        for track in tracks:
-            Track.objects.create(album=album, **track)
-        return album
-
 
 class AlbumSerializer2(serializers.ModelSerializer):
     tracks = serializers.StringRelatedField(many=True)
@@ -421,7 +656,7 @@ class TrackSerializer(serializers.ModelSerializer):
         exclude = ['album']
 
 
-class AlbumSerializer7(serializers.HyperlinkedModelSerializer):
+class AlbumSerializer7(EagerLoadingMixin, serializers.HyperlinkedModelSerializer):
     tracks = TrackSerializer(many=True, read_only=True)
 
     class Meta:
@@ -430,19 +665,15 @@ class AlbumSerializer7(serializers.HyperlinkedModelSerializer):
 
 
 # Записываемый вложенный сериализатор
-class AlbumSerializer8(serializers.HyperlinkedModelSerializer):
+# Треки создаются и обновляются пачками (см. BulkNestedWriteMixin).
+class AlbumSerializer8(BulkNestedWriteMixin, serializers.HyperlinkedModelSerializer):
     tracks = TrackSerializer(many=True)
+    bulk_nested_fields = {'tracks': 'album'}
 
     class Meta:
         model = Album
         fields = '__all__'
-
-    def create(self, validated_data):
-        tracks = validated_data.pop('tracks')
-        album = Album.objects.create(**validated_data)
-        for track in tracks:
-            Track.objects.create(album=album, **track)
-        return album
+        list_serializer_class = BulkNestedListSerializer
     
 
 # Реляционное поле поле для сериализации трека в пользовательское строковое 
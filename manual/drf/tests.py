@@ -1,6 +1,6 @@
 from django.urls import reverse, include, path
 from rest_framework import status
-from django.contrib.auth.models import User
+from django.contrib.auth.models import Permission, User
 from rest_framework.test import (
     APITestCase, URLPatternsTestCase, APIRequestFactory, force_authenticate,
     APIClient, RequestsClient, CoreAPIClient
@@ -106,7 +106,12 @@ def CoreAPIClient_test():
     return
 
 
-# Можно использовать любой из классов тестов.
+"""
+Можно использовать любой из классов тестов.
+Примеры ссылаются на приложение api (маршрут account-list), которого нет в проекте,
+поэтому они оставлены в документации: include('api.urls') при импорте модуля
+не дал бы запустить остальные тесты drf.
+
 class AccountTests(APITestCase):
     def test_create_account(self):
         url = reverse('account-list')
@@ -117,6 +122,7 @@ class AccountTests(APITestCase):
         self.assertEqual(User.objects.get().name, 'DabApps')
 
 
+URLPatternsTestCase - отдельный URLconf для класса тестов.
 
 class AccountTests(APITestCase, URLPatternsTestCase):
     urlpatterns = [
@@ -128,3 +134,671 @@ class AccountTests(APITestCase, URLPatternsTestCase):
         response = self.client.get(url, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 1)
+"""
+
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .models import Album, Track, Task, Subtask, Post
+from .serializers import TaskSerializer, get_eager_loading_lookups
+
+
+# Проверка отсутствия N+1: кол-во запросов к списку не зависит от кол-ва строк.
+class ConstantQueriesMixin:
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries)
+
+    def assertConstantQueries(self, url, create_rows, sizes=(1, 10)):
+        counts = []
+        for size in sizes:
+            create_rows(size)
+            counts.append(self.count_queries(url))
+        self.assertEqual(
+            len(set(counts)), 1,
+            'Кол-во запросов зависит от кол-ва строк: %r' % dict(zip(sizes, counts))
+        )
+
+
+class EagerLoadingTests(ConstantQueriesMixin, APITestCase):
+    def create_albums(self, size):
+        for i in range(size):
+            album = Album.objects.create(name='album', artist='artist')
+            Track.objects.bulk_create([
+                Track(album=album, order=order, title='track', duration=60)
+                for order in range(3)
+            ])
+
+    def test_album_list_constant_queries(self):
+        self.assertConstantQueries('/api/1', self.create_albums)
+
+    def test_task_lookups(self):
+        self.assertEqual(
+            get_eager_loading_lookups(TaskSerializer()), (set(), {'subtasks'})
+        )
+
+    def test_task_setup_eager_loading(self):
+        task = Task.objects.create(title='T', body='body')
+        Subtask.objects.create(task=task, content='content')
+        queryset = TaskSerializer.setup_eager_loading(Task.objects.all())
+        with self.assertNumQueries(2):
+            [list(task.subtasks.all()) for task in queryset]
+
+
+from unittest import mock
+
+from .serializers import AlbumSerializer8
+
+
+class BulkNestedWriteTests(APITestCase):
+    def tracks(self, *orders):
+        return [
+            {'order': order, 'title': 'track %d' % order, 'duration': 60}
+            for order in orders
+        ]
+
+    def test_create_is_constant(self):
+        serializer = AlbumSerializer8(
+            data={'name': 'album', 'artist': 'artist', 'tracks': self.tracks(*range(100))}
+        )
+        serializer.is_valid(raise_exception=True)
+        # SAVEPOINT, INSERT album, INSERT tracks, RELEASE SAVEPOINT.
+        with self.assertNumQueries(4):
+            album = serializer.save()
+        self.assertEqual(album.tracks.count(), 100)
+
+    def test_create_many(self):
+        data = [
+            {'name': 'album %d' % i, 'artist': 'artist', 'tracks': self.tracks(1, 2)}
+            for i in range(5)
+        ]
+        serializer = AlbumSerializer8(data=data, many=True)
+        serializer.is_valid(raise_exception=True)
+        with self.assertNumQueries(4):
+            serializer.save()
+        self.assertEqual(Track.objects.count(), 10)
+
+    def test_create_many_without_returning_pk(self):
+        # Как на MySQL: bulk_create не заполняет pk, родители создаются по одному.
+        data = [
+            {'name': 'album %d' % i, 'artist': 'artist', 'tracks': self.tracks(1, 2)}
+            for i in range(3)
+        ]
+        serializer = AlbumSerializer8(data=data, many=True)
+        serializer.is_valid(raise_exception=True)
+        with mock.patch.object(
+            type(connection.features), 'can_return_rows_from_bulk_insert',
+            new_callable=mock.PropertyMock, return_value=False
+        ):
+            albums = serializer.save()
+        for album in albums:
+            self.assertEqual(album.tracks.count(), 2)
+
+    def test_update_diff(self):
+        album = Album.objects.create(name='album', artist='artist')
+        Track.objects.bulk_create([
+            Track(album=album, order=order, title='track %d' % order, duration=60)
+            for order in (1, 2, 3)
+        ])
+        tracks = self.tracks(2, 3, 4)
+        tracks[0]['title'] = 'changed'
+        serializer = AlbumSerializer8(album, data={'tracks': tracks}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        # SAVEPOINT, SELECT, DELETE, UPDATE, INSERT, RELEASE SAVEPOINT.
+        with self.assertNumQueries(6):
+            serializer.save()
+        self.assertEqual(
+            list(album.tracks.values_list('order', 'title')),
+            [(2, 'changed'), (3, 'track 3'), (4, 'track 4')]
+        )
+
+
+class BulkListUpdateTests(APITestCase):
+    def setUp(self):
+        Post.objects.bulk_create([Post(id=i, body='post %d' % i) for i in range(1, 6)])
+        self.user = User.objects.create_user('editor')
+        self.user.user_permissions.add(*Permission.objects.filter(
+            content_type__app_label='drf', codename__in=['change_post', 'delete_post']
+        ))
+
+    def test_bulk_put(self):
+        self.user.user_permissions.add(
+            Permission.objects.get(content_type__app_label='drf', codename='add_post')
+        )
+        self.client.force_authenticate(self.user)
+        data = [
+            {'id': 1, 'body': 'post 1'},
+            {'id': 2, 'body': 'changed'},
+            {'id': 3, 'body': 'changed'},
+            {'id': 10, 'body': 'new'},
+        ]
+        response = self.client.put('/api/posts/bulk', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            {phase: stats['rows'] for phase, stats in response.data.items()},
+            {'delete': 0, 'update': 2, 'create': 1}
+        )
+        # Отсутствующие в данных обьекты не удаляются.
+        self.assertEqual(
+            list(Post.objects.order_by('id').values_list('id', 'body')),
+            [(1, 'post 1'), (2, 'changed'), (3, 'changed'), (4, 'post 4'), (5, 'post 5'), (10, 'new')]
+        )
+
+    def test_bulk_put_create_permission(self):
+        # Без drf.add_post PUT может изменять только существующие обьекты.
+        self.client.force_authenticate(self.user)
+        data = [{'id': 2, 'body': 'changed'}, {'id': 10, 'body': 'new'}]
+        response = self.client.put('/api/posts/bulk', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(Post.objects.get(id=2).body, 'post 2')
+        self.assertFalse(Post.objects.filter(id=10).exists())
+        response = self.client.put('/api/posts/bulk', data[:1], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Post.objects.get(id=2).body, 'changed')
+
+    def test_bulk_delete(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.delete('/api/posts/bulk', [2, 4, 100], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'delete': {'rows': 2}})
+        self.assertEqual(list(Post.objects.values_list('id', flat=True)), [1, 3, 5])
+        response = self.client.delete('/api/posts/bulk', {'id': 1}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_permissions(self):
+        response = self.client.put('/api/posts/bulk', [], format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.force_authenticate(User.objects.create_user('reader'))
+        response = self.client.put('/api/posts/bulk', [], format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.delete('/api/posts/bulk', [1], format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(Post.objects.count(), 5)
+
+
+from django.core.cache import cache
+from rest_framework import generics
+
+from .pagination import CustomPagination
+from .serializers import PostSerializer
+
+
+class CountModePaginationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        Post.objects.bulk_create([Post(body='post %d' % i) for i in range(25)])
+        self.view = generics.ListAPIView.as_view(
+            queryset=Post.objects.order_by('id'),
+            serializer_class=PostSerializer,
+            pagination_class=CustomPagination,
+        )
+        self.factory = APIRequestFactory()
+
+    def get(self, **params):
+        response = self.view(self.factory.get('/posts', params))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_cached_count(self):
+        with self.assertNumQueries(2):
+            self.assertEqual(self.get()['count'], 25)
+        # COUNT(*) берется из кэша.
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get(page=2)['count'], 25)
+
+    def test_count_false(self):
+        with self.assertNumQueries(1):
+            data = self.get(page=3, count='false')
+        self.assertIsNone(data['count'])
+        self.assertIsNone(data['links']['next'])
+        self.assertEqual(len(data['results']), 5)
+        data = self.get(page=2, count='false')
+        self.assertIn('page=3', data['links']['next'])
+
+
+import datetime
+import unittest
+
+from rest_framework import serializers
+from dja.models import Blog, Entry
+from .pagination import CompositeCursorPagination, EntryFeedPagination
+from rest_framework.pagination import Cursor
+
+
+class EntrySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Entry
+        fields = ['id', 'published']
+
+
+# Курсорная пагинация на миллионе строк: по 7 записей на одну дату (повторы).
+@unittest.skipUnless(connection.vendor == 'sqlite', 'Фикстура создается SQL SQLite')
+class CompositeCursorPaginationTests(APITestCase):
+    rows = 1_000_000
+
+    @classmethod
+    def setUpTestData(cls):
+        blog = Blog.objects.create(name='feed')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO dja_entry (blog_id, published) "
+                "WITH RECURSIVE seq(x) AS ("
+                "  SELECT 0 UNION ALL SELECT x + 1 FROM seq WHERE x < %s"
+                ") "
+                "SELECT %s, datetime('2020-01-01', '+' || (x / 7) || ' minutes') FROM seq",
+                [cls.rows - 1, blog.pk]
+            )
+
+    def setUp(self):
+        self.view = generics.ListAPIView.as_view(
+            queryset=Entry.objects.all(),
+            serializer_class=EntrySerializer,
+            pagination_class=EntryFeedPagination,
+        )
+        self.factory = APIRequestFactory()
+
+    def get(self, url='/feed'):
+        with CaptureQueriesContext(connection) as context:
+            response = self.view(self.factory.get(url))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(context.captured_queries), 1)
+        return response.data, context.captured_queries[0]['sql']
+
+    def expected_ids(self, offset):
+        return list(
+            Entry.objects.order_by('-published', '-id')
+            .values_list('id', flat=True)[offset:offset + 100]
+        )
+
+    def assertIndexSeek(self, sql):
+        # Страница читается диапазоном индекса, без OFFSET и сортировки в памяти.
+        self.assertNotIn('OFFSET', sql)
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('dja_entry_publish', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_first_page(self):
+        data, sql = self.get()
+        self.assertEqual([row['id'] for row in data['results']], self.expected_ids(0))
+        self.assertIsNone(data['previous'])
+        self.assertIndexSeek(sql)
+
+    def test_page_10000(self):
+        # Курсор, указывающий на последнюю строку страницы 9999.
+        last = Entry.objects.order_by('-published', '-id')[9999 * 100 - 1]
+        cursor = EntryFeedPagination()
+        cursor.base_url, cursor.ordering = '/feed', ['-published', '-pk']
+        url = cursor.encode_cursor(
+            Cursor(offset=0, reverse=False, position=cursor.get_position(last))
+        )
+        data, sql = self.get(url)
+        self.assertEqual([row['id'] for row in data['results']], self.expected_ids(9999 * 100))
+        self.assertIsNone(data['next'])
+        self.assertIndexSeek(sql)
+
+        # Предыдущая страница возвращает ровно страницу 9999 без пропусков на повторах.
+        data, sql = self.get(data['previous'])
+        self.assertEqual([row['id'] for row in data['results']], self.expected_ids(9998 * 100))
+        self.assertIndexSeek(sql)
+
+
+class CompositeCursorPrecisionTests(APITestCase):
+    def setUp(self):
+        blog = Blog.objects.create(name='feed')
+        # Записи через 1 мкс: все попадают в одну миллисекунду.
+        moment = datetime.datetime(2023, 1, 1, 12, 0, 0, 500, tzinfo=datetime.timezone.utc)
+        Entry.objects.bulk_create([
+            Entry(blog=blog, published=moment + datetime.timedelta(microseconds=i))
+            for i in range(25)
+        ])
+        self.factory = APIRequestFactory()
+
+    def pages(self, ordering):
+        pagination = type('Pagination', (CompositeCursorPagination,), {
+            'page_size': 10, 'ordering': ordering,
+        })
+        view = generics.ListAPIView.as_view(
+            queryset=Entry.objects.all(), serializer_class=EntrySerializer,
+            pagination_class=pagination,
+        )
+        pages, url = [], '/feed'
+        while url and len(pages) < 10:
+            data = view(self.factory.get(url)).data
+            pages.append([row['id'] for row in data['results']])
+            url = data['next']
+        return pages
+
+    def test_microseconds(self):
+        for ordering in ('published', '-published'):
+            expected = list(
+                Entry.objects.order_by(ordering, ordering.replace('published', 'id'))
+                .values_list('id', flat=True)
+            )
+            pages = self.pages(ordering)
+            self.assertEqual([len(page) for page in pages], [10, 10, 5])
+            self.assertEqual(sum(pages, []), expected)
+
+
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+
+from django.contrib.auth.models import AnonymousUser
+from config.cache import SQLiteCache
+from .throttling import CustomScopedRateThrottle
+
+
+def incr_worker(path, count):
+    cache = SQLiteCache(path, {})
+    for _ in range(count):
+        cache.incr('counter')
+
+
+class SlidingWindowThrottleTests(APITestCase):
+    def setUp(self):
+        self.path = tempfile.mktemp(suffix='.sqlite3')
+        self.factory = APIRequestFactory()
+
+    def tearDown(self):
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+    def make_throttle(self, now):
+        # Отдельный экземпляр кэша на каждый "воркер" с общим файлом.
+        throttle = CustomScopedRateThrottle()
+        throttle.cache = SQLiteCache(self.path, {})
+        throttle.THROTTLE_RATES = {'feed': '10/min'}
+        throttle.timer = lambda: now
+        return throttle
+
+    def allow(self, now):
+        request = self.factory.get('/')
+        request.user = AnonymousUser()
+        view = type('View', (), {'throttle_scope': 'feed'})()
+        return self.make_throttle(now).allow_request(request, view)
+
+    def test_shared_limit(self):
+        self.assertEqual(sum(self.allow(600 + i) for i in range(15)), 10)
+        # В середине следующего окна учитывается половина предыдущего: 10 * 0.5.
+        self.assertEqual(sum(self.allow(690) for i in range(10)), 5)
+
+    def test_constant_memory(self):
+        # 1000 запросов в одном окне хранятся одним счетчиком, а не списком.
+        throttle = self.make_throttle(600)
+        throttle.THROTTLE_RATES = {'feed': '1000/min'}
+        request = self.factory.get('/')
+        request.user = AnonymousUser()
+        view = type('View', (), {'throttle_scope': 'feed'})()
+        for _ in range(1000):
+            self.assertTrue(throttle.allow_request(request, view))
+        with sqlite3.connect(self.path) as connection:
+            rows = connection.execute('SELECT key, value FROM cache').fetchall()
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0][1], 1000)
+
+    def test_atomic_incr_across_processes(self):
+        SQLiteCache(self.path, {}).set('counter', 0, None)
+        processes = [
+            multiprocessing.Process(target=incr_worker, args=(self.path, 200))
+            for _ in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertEqual(SQLiteCache(self.path, {}).get('counter'), 800)
+
+
+from rest_framework import exceptions
+from .authentication import CachedTokenAuthentication
+from . import authentication as drf_authentication
+
+
+class CachedTokenAuthenticationTests(APITestCase):
+    def setUp(self):
+        drf_authentication.get_cache().clear()
+        CachedTokenAuthentication.local_cache.clear()
+        self.user = User.objects.create_user('olivia', password='secret', is_staff=True)
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def test_steady_state_without_queries(self):
+        self.client.get('/api/views/')
+        # Токен и пользователь берутся из кэша, остается только запрос списка.
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/views/')
+        self.assertEqual(response.data, ['olivia'])
+
+    def test_invalidation(self):
+        self.client.get('/api/views/')
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get('/api/views/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.user.is_active = True
+        self.user.save()
+        self.token.delete()
+        response = self.client.get('/api/views/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_other_process(self):
+        # Отзыв токена в этом процессе виден процессу со своим экземпляром
+        # общего кэша, как только истекает его локальный LRU.
+        auth = CachedTokenAuthentication()
+        auth.authenticate_credentials(self.token.key)
+        other_process = SQLiteCache(drf_authentication.get_cache().path, {})
+        with mock.patch.object(drf_authentication, 'get_cache', return_value=other_process):
+            CachedTokenAuthentication.local_cache.clear()
+            with self.assertNumQueries(0):
+                auth.authenticate_credentials(self.token.key)
+            CachedTokenAuthentication.local_cache.clear()
+
+        self.user.is_active = False
+        self.user.save()
+        with mock.patch.object(drf_authentication, 'get_cache', return_value=other_process):
+            with self.assertRaises(exceptions.AuthenticationFailed):
+                auth.authenticate_credentials(self.token.key)
+
+        self.user.is_active = True
+        self.user.save()
+        key = self.token.key
+        auth.authenticate_credentials(key)
+        self.token.delete()
+        with mock.patch.object(drf_authentication, 'get_cache', return_value=other_process):
+            CachedTokenAuthentication.local_cache.clear()
+            with self.assertRaises(exceptions.AuthenticationFailed):
+                auth.authenticate_credentials(key)
+
+    def test_fresh_user_per_request(self):
+        # Изменения пользователя и кэш прав одного запроса не видны в следующем.
+        self.user.user_permissions.add(Permission.objects.get(content_type__app_label='auth', codename='add_user'))
+        auth = CachedTokenAuthentication()
+        first, token = auth.authenticate_credentials(self.token.key)
+        self.assertTrue(first.has_perm('auth.add_user'))
+        self.assertTrue(hasattr(first, '_perm_cache'))
+        first.first_name = 'changed'
+        first._perm_cache.add('auth.delete_user')
+
+        second, second_token = auth.authenticate_credentials(self.token.key)
+        self.assertIsNot(second, first)
+        self.assertIs(second_token.user, second)
+        self.assertEqual(second.first_name, '')
+        self.assertFalse(hasattr(second, '_perm_cache'))
+        self.assertFalse(hasattr(second, '_user_perm_cache'))
+
+
+import io
+import ipaddress
+
+from django.core.management import call_command
+from django.test import TestCase
+from .models import Blocklist
+from .permissions import (
+    BLOCKLIST_VERSION_KEY, BlocklistIndex, BlocklistPermission, blocklist_index,
+    invalidate_blocklist,
+)
+from . import permissions as drf_permissions
+
+
+class BlocklistPermissionTests(TestCase):
+    def setUp(self):
+        drf_permissions.get_cache().clear()
+        blocklist_index.reload()
+        self.factory = APIRequestFactory()
+        self.permission = BlocklistPermission()
+
+    def allowed(self, ip_addr):
+        request = self.factory.get('/', REMOTE_ADDR=ip_addr)
+        return self.permission.has_permission(request, None)
+
+    def test_networks(self):
+        Blocklist.objects.create(network='10.0.0.0/8')
+        Blocklist.objects.create(network='192.168.1.5')
+        Blocklist.objects.create(network='2001:db8::/32')
+        self.assertFalse(self.allowed('10.20.30.40'))
+        self.assertFalse(self.allowed('192.168.1.5'))
+        self.assertFalse(self.allowed('::ffff:10.0.0.1'))
+        self.assertFalse(self.allowed('2001:db8::1'))
+        self.assertTrue(self.allowed('11.0.0.0'))
+        self.assertTrue(self.allowed('192.168.1.6'))
+        self.assertTrue(self.allowed('2001:db9::1'))
+
+    def test_without_queries(self):
+        Blocklist.objects.create(network='10.0.0.0/8')
+        self.allowed('127.0.0.1')
+        with self.assertNumQueries(0):
+            for _ in range(100):
+                self.assertFalse(self.allowed('10.0.0.1'))
+
+    def test_invalidation(self):
+        entry = Blocklist.objects.create(network='10.0.0.1')
+        self.assertFalse(self.allowed('10.0.0.1'))
+        entry.delete()
+        self.assertTrue(self.allowed('10.0.0.1'))
+
+        Blocklist.objects.bulk_create([Blocklist(network='10.0.0.2')])
+        invalidate_blocklist()
+        self.assertFalse(self.allowed('10.0.0.2'))
+
+    def test_other_process(self):
+        # Индекс другого процесса со своим экземпляром кэша видит версию,
+        # увеличенную сигналом в этом процессе, и перезагружает интервалы.
+        path = drf_permissions.get_cache().path
+        other_index = BlocklistIndex()
+        other_index.check_interval = 0
+        with mock.patch.object(drf_permissions, 'get_cache', return_value=SQLiteCache(path, {})):
+            self.assertFalse(other_index.is_blocked('10.0.0.1'))
+        Blocklist.objects.create(network='10.0.0.1')
+        other_process = SQLiteCache(path, {})
+        self.assertEqual(
+            other_process.get(BLOCKLIST_VERSION_KEY),
+            drf_permissions.get_cache().get(BLOCKLIST_VERSION_KEY)
+        )
+        with mock.patch.object(drf_permissions, 'get_cache', return_value=other_process):
+            self.assertTrue(other_index.is_blocked('10.0.0.1'))
+
+    def test_merged_intervals(self):
+        # Вложенные, пересекающиеся и соседние сети сводятся в один интервал.
+        for network in ('10.0.0.0/24', '10.0.0.128/25', '10.0.1.0/24', '10.0.3.0/24', 'bad'):
+            Blocklist.objects.create(network=network)
+        starts, ends = blocklist_index.get_intervals()[4]
+        self.assertEqual(
+            [(str(ipaddress.IPv4Address(start)), str(ipaddress.IPv4Address(end)))
+             for start, end in zip(starts, ends)],
+            [('10.0.0.0', '10.0.1.255'), ('10.0.3.0', '10.0.3.255')]
+        )
+        self.assertFalse(self.allowed('10.0.1.255'))
+        self.assertTrue(self.allowed('10.0.2.0'))
+        self.assertTrue(self.allowed('not an ip'))
+
+    def test_same_as_query(self):
+        # Результат индекса совпадает с запросом к БД по точному адресу.
+        Blocklist.objects.bulk_create(
+            [Blocklist(network=str(ipaddress.IPv4Address(i * 7))) for i in range(1000)]
+        )
+        invalidate_blocklist()
+        addresses = [str(ipaddress.IPv4Address(i * 13)) for i in range(600)]
+        expected = [Blocklist.objects.filter(network=ip).exists() for ip in addresses]
+        self.assertEqual([blocklist_index.is_blocked(ip) for ip in addresses], expected)
+        self.assertIn(True, expected)
+        self.assertIn(False, expected)
+
+    def test_bench_command(self):
+        # Бенчмарк - отдельная команда; записи откатываются после замера.
+        out = io.StringIO()
+        call_command('bench_blocklist', rows=100, lookups=10, stdout=out, stderr=out)
+        self.assertIn('индекс', out.getvalue())
+        self.assertNotIn('не совпадают', out.getvalue())
+        self.assertFalse(Blocklist.objects.exists())
+
+
+import tracemalloc
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+from rest_framework.renderers import JSONRenderer
+from .serializers import UserSerializer
+from .views import UserList2
+
+
+class StreamingListTests(APITestCase):
+    def setUp(self):
+        User.objects.bulk_create([User(username='user%s' % i) for i in range(50)])
+        self.expected = json.loads(JSONRenderer().render(
+            UserSerializer(User.objects.order_by('pk'), many=True).data
+        ))
+
+    def test_json_array(self):
+        for url in ('/api/ListCreateAPIView/', '/api/ViewSet/users/'):
+            response = self.client.get(url)
+            self.assertTrue(response.streaming)
+            self.assertEqual(response['Content-Type'], 'application/json')
+            self.assertEqual(json.loads(b''.join(response.streaming_content)), self.expected)
+
+    def test_ndjson(self):
+        response = self.client.get('/api/ViewSet/users/', HTTP_ACCEPT='application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], self.expected)
+
+    def test_empty(self):
+        User.objects.all().delete()
+        response = self.client.get('/api/ListCreateAPIView/?format=json')
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), [])
+
+    def test_asgi(self):
+        async def fetch():
+            response = await AsyncClient().get('/api/ViewSet/users/')
+            self.assertTrue(response.is_async)
+            return b''.join([chunk async for chunk in response.streaming_content])
+
+        self.assertEqual(json.loads(async_to_sync(fetch)()), self.expected)
+
+    def stream_peak(self, view, factory):
+        tracemalloc.start()
+        response = view(factory.get('/', {'format': 'json'}))
+        size = sum(len(chunk) for chunk in response.streaming_content)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return size, peak
+
+    def test_flat_memory(self):
+        # Пиковая память не должна расти вместе с количеством записей.
+        view = UserList2.as_view(stream_chunk_size=200)
+        factory = APIRequestFactory()
+        User.objects.bulk_create([User(username='bulk%s' % i) for i in range(1000)])
+        for _ in view(factory.get('/', {'format': 'json'})).streaming_content:
+            pass
+        small_size, small_peak = self.stream_peak(view, factory)
+
+        User.objects.bulk_create([User(username='more%s' % i) for i in range(4000)])
+        large_size, large_peak = self.stream_peak(view, factory)
+
+        self.assertGreater(large_size, small_size * 4)
+        self.assertLess(large_peak, small_peak * 2)
@@ -8,17 +8,79 @@ from rest_framework.throttling import (
 import random
 
 
+# Скользящее окно на счетчиках (sliding window counter).
+# SimpleRateThrottle хранит список времени всех запросов на ключ и 
+# перезаписывает его при каждом запросе: память растет вместе с rate, а 
+# одновременные запросы из разных процессов теряют записи друг друга.
+# Здесь на ключ хранится два целых числа: счетчики текущего и предыдущего 
+# окна длиной duration. Кол-во запросов оценивается как
+# previous * (1 - доля прошедшего окна) + current.
+# Счетчик увеличивается атомарно через cache.add() + cache.incr(), поэтому 
+# лимит общий для всех воркеров, если кэш общий (Redis, Memcached, 
+# config.cache.SQLiteCache).
+# Ставится вторым базовым классом, чтобы ScopedRateThrottle.allow_request() 
+# успел определить scope и rate:
+# class CustomScopedRateThrottle(ScopedRateThrottle, SlidingWindowRateThrottle)
+class SlidingWindowRateThrottle(SimpleRateThrottle):
+    cache = caches['throttle']
+    cache_format = 'throttle_%(scope)s_%(ident)s'
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window, offset = divmod(self.now, self.duration)
+        self.elapsed = offset / self.duration
+        current_key = '%s:%d' % (self.key, window)
+        self.previous = self.cache.get('%s:%d' % (self.key, window - 1), 0)
+
+        # Окно живет 2 * duration, чтобы быть предыдущим для следующего окна.
+        self.cache.add(current_key, 0, 2 * self.duration)
+        try:
+            self.current = self.cache.incr(current_key)
+        except ValueError:
+            # Запись истекла между add() и incr().
+            self.cache.add(current_key, 1, 2 * self.duration)
+            self.current = 1
+
+        if self.estimate() > self.num_requests:
+            # Отклоненный запрос не учитывается в лимите.
+            self.cache.decr(current_key)
+            self.current -= 1
+            return self.throttle_failure()
+        return self.throttle_success()
+
+    def estimate(self):
+        return self.previous * (1 - self.elapsed) + self.current
+
+    def throttle_success(self):
+        return True
+
+    def wait(self):
+        # Время, через которое оценка опустится ниже лимита.
+        remaining = self.duration * (1 - self.elapsed)
+        if self.previous and self.current < self.num_requests:
+            needed = 1 - self.elapsed - (self.num_requests - self.current) / self.previous
+            return max(0.0, min(remaining, self.duration * needed))
+        return remaining
+
+
 # Использование кэша, отличного от 'default'.
-class CustomAnonRateThrottle(AnonRateThrottle):
+class CustomAnonRateThrottle(AnonRateThrottle, SlidingWindowRateThrottle):
     # cache = caches['alternate']
     rate = '1/minute'
 
 
-class CustomUserRateThrottle(UserRateThrottle):
+class CustomUserRateThrottle(UserRateThrottle, SlidingWindowRateThrottle):
     rate = '1/hour'
 
 
-class CustomScopedRateThrottle(ScopedRateThrottle):
+class CustomScopedRateThrottle(ScopedRateThrottle, SlidingWindowRateThrottle):
     rate = '1/second'
 
 
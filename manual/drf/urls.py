@@ -20,6 +20,7 @@ urlpatterns = [
     path('htmlrenderer/<int:pk>/', UserDetail.as_view()),
     path('statichtmlrenderer/', simple_html_view),
     path('posts', PostListAPIView.as_view()),
+    path('posts/bulk', PostBulkUpdateAPIView.as_view()),
     path('throttle', ThrottleAPIView.as_view()),
     path('', APIRoot.as_view()),
     path('<int:pk>', CustomListAPIView.as_view(), name='album-detail'),
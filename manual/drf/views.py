@@ -1,5 +1,6 @@
 from rest_framework import (
     views, mixins, generics, authentication, permissions, viewsets, renderers,
+    exceptions,
 )
 from rest_framework.response import Response
 from rest_framework.throttling import (
@@ -12,15 +13,28 @@ from rest_framework.decorators import (
     schema, action, renderer_classes
 )
 
+from rest_framework.utils import encoders
 from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from asgiref.sync import sync_to_async
 
-from .serializers import UserSerializer, PostSerializer, AlbumSerializer7
+import functools
+import itertools
+import json
+
+from .serializers import (
+    UserSerializer, PostSerializer, AlbumSerializer7, PostBulkSerializer,
+    apply_eager_loading
+)
 from .models import Post, Album
 from .pagination import (
     StandardResultsSetPagination, CustomLimitOffsetPagination, 
     CustomCursorPagination, CustomPagination
 )
+from .authentication import CachedTokenAuthentication
+from .renderers import NDJSONRenderer
 from .throttling import (
     CustomAnonRateThrottle, CustomUserRateThrottle, CustomScopedRateThrottle,
     RandomRateThrottle
@@ -29,8 +43,67 @@ from .throttling import (
 from django_filters.rest_framework import DjangoFilterBackend
 
 
+# Применяет select_related/prefetch_related по дереву полей сериализатора, 
+# чтобы вложенные сериализаторы не выполняли запрос на каждый обьект.
+class EagerLoadingViewMixin:
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        return apply_eager_loading(queryset, self.get_serializer())
+
+
+# Потоковый список.
+# Обычный list() строит serializer.data для всего queryset и рендерит его 
+# одним обьектом bytes. stream_list() читает queryset через iterator(chunk_size),
+# сериализует по stream_chunk_size обьектов и отдает StreamingHttpResponse 
+# с фрагментами JSON массива или NDJSON (?format=ndjson, Accept: application/x-ndjson).
+# Под ASGI фрагменты отдает асинхронный итератор, а чтение из БД и сериализация
+# выполняются через sync_to_async в одном потоке, поэтому память не растет.
+class StreamingListMixin:
+    stream_chunk_size = 1000
+    renderer_classes = [renderers.JSONRenderer, NDJSONRenderer, renderers.BrowsableAPIRenderer]
+
+    def iter_json(self, queryset, serializer_class, ndjson):
+        context = {'request': self.request, 'format': self.format_kwarg, 'view': self}
+        dumps = functools.partial(
+            json.dumps, cls=encoders.JSONEncoder, ensure_ascii=False, separators=(',', ':')
+        )
+        if not ndjson:
+            yield b'['
+        first = True
+        serializer = serializer_class(context=context)
+        rows = queryset.iterator(chunk_size=self.stream_chunk_size)
+        while chunk := list(itertools.islice(rows, self.stream_chunk_size)):
+            data = [serializer.to_representation(obj) for obj in chunk]
+            # Кэш prefetch_related ссылается на обьект по кругу, без этого
+            # фрагменты освобождает только сборщик циклов.
+            for obj in chunk:
+                obj.__dict__.pop('_prefetched_objects_cache', None)
+            if ndjson:
+                yield ''.join(dumps(item) + '\n' for item in data).encode()
+            else:
+                yield ((',' if not first else '') + ','.join(map(dumps, data))).encode()
+            first = False
+        if not ndjson:
+            yield b']'
+
+    async def aiter_json(self, iterator):
+        next_chunk = sync_to_async(next, thread_sensitive=True)
+        while (chunk := await next_chunk(iterator, None)) is not None:
+            yield chunk
+
+    def stream_list(self, queryset, serializer_class):
+        ndjson = self.request.accepted_renderer.format == 'ndjson'
+        content = self.iter_json(queryset, serializer_class, ndjson)
+        if isinstance(self.request._request, ASGIRequest):
+            content = self.aiter_json(content)
+        return StreamingHttpResponse(
+            content,
+            content_type=NDJSONRenderer.media_type if ndjson else 'application/json',
+        )
+
+
 class ListUsers(views.APIView):
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAdminUser]
 
     def get(self, request, format=None):
@@ -57,21 +130,25 @@ def api_view_func(request):
     return Response({'ip': ip})
 
 
-class UserList2(generics.ListCreateAPIView):
+class UserList2(StreamingListMixin, EagerLoadingViewMixin, generics.ListCreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
 
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        queryset = self.filter_queryset(self.get_queryset())
+        if request.accepted_renderer.format not in ('json', 'ndjson'):
+            serializer = self.get_serializer(queryset, many=True)
+            return Response(serializer.data)
+        return self.stream_list(queryset, self.get_serializer_class())
 
 
-class UserViewSet(viewsets.ViewSet):
+class UserViewSet(StreamingListMixin, viewsets.ViewSet):
     def list(self, request):
-        queryset = User.objects.all()
-        serializer = UserSerializer(queryset, many=True)
-        return Response(serializer.data)
+        queryset = apply_eager_loading(User.objects.order_by('pk'), UserSerializer())
+        if request.accepted_renderer.format not in ('json', 'ndjson'):
+            serializer = UserSerializer(queryset, many=True)
+            return Response(serializer.data)
+        return self.stream_list(queryset, UserSerializer)
     
     def retrieve(self, request, pk=None):
         queryset = User.objects.all()
@@ -117,12 +194,47 @@ def simple_html_view(request):
 class PostListAPIView(generics.ListAPIView):
     queryset = Post.objects.all()
     serializer_class = PostSerializer
-    # pagination_class = CustomPagination
+    pagination_class = CustomPagination
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['id', 'body']
     throttle_classes = [OncePerDayUserThrottle]
 
 
+# Массовое обновление списка Post одним PUT запросом. Изменяются и создаются 
+# только обьекты из данных: queryset ограничен их id, поэтому отсутствующие 
+# в запросе строки не удаляются. Удаление - отдельным DELETE со списком id.
+# Нужны права drf.change_post (PUT) и drf.delete_post (DELETE), а если в данных
+# есть новые id - еще и drf.add_post (DjangoModelPermissions проверяет для PUT
+# только change).
+# В ответе кол-во строк и время каждой фазы.
+class PostBulkUpdateAPIView(views.APIView):
+    queryset = Post.objects.all()
+    permission_classes = [permissions.IsAuthenticated, permissions.DjangoModelPermissions]
+
+    def put(self, request):
+        serializer = PostBulkSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        ids = [item['id'] for item in serializer.validated_data]
+        instance = list(self.queryset.filter(id__in=ids))
+        new_ids = set(ids) - {post.id for post in instance}
+        opts = self.queryset.model._meta
+        if new_ids and not request.user.has_perm('%s.add_%s' % (opts.app_label, opts.model_name)):
+            self.permission_denied(
+                request, message='Нет права на создание обьектов: %s.' % sorted(new_ids)
+            )
+        serializer.instance = instance
+        serializer.save()
+        return Response(serializer.bulk_stats)
+
+    def delete(self, request):
+        if not isinstance(request.data, list) or not all(
+            isinstance(pk, int) and not isinstance(pk, bool) for pk in request.data
+        ):
+            raise exceptions.ValidationError({'detail': 'Ожидается список id.'})
+        deleted, _ = self.queryset.filter(id__in=request.data).delete()
+        return Response({'delete': {'rows': deleted}})
+
+
 class ThrottleAPIView(views.APIView):
     throttle_classes = [RandomRateThrottle]
     # throttle_scope = 'a'
@@ -130,7 +242,7 @@ class ThrottleAPIView(views.APIView):
         return Response({'ok': 'ok'})
 
 
-class CustomListAPIView(generics.ListAPIView):
+class CustomListAPIView(EagerLoadingViewMixin, generics.ListAPIView):
     queryset = Album.objects.all()
     serializer_class = AlbumSerializer7
 